@@ -1,23 +1,36 @@
-import os
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from typing import Optional
 import jwt
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Depends, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, EmailStr
-import hashlib
-import json
+import logging
 from pathlib import Path
+from coldstart import StartupProfile
+from jwt_auth import ALGORITHM, SECRET_KEY, decode_token
+import metrics
+import passwords
+import user_store
+from user_store import UserExistsError
 
-# Configuration
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
-ALGORITHM = "HS256"
+logger = logging.getLogger(__name__)
+
+# Configuration; the signing key is shared with main.py through jwt_auth
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24  # 30 days
 
-# Database file (simple JSON file for demo)
+# Legacy JSON user file, imported into the SQLite user store on startup
 DATABASE_FILE = Path("users.json")
 
-app = FastAPI(title="Auth Service", version="1.0.0")
+profile = StartupProfile("auth")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup()
+    yield
+    await shutdown()
+
+app = FastAPI(title="Auth Service", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,6 +39,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware, app_name="auth")
 
 # Models
 class SignupRequest(BaseModel):
@@ -54,21 +68,22 @@ class User(BaseModel):
     password_hash: str
 
 # Database helpers
-def load_users():
-    if DATABASE_FILE.exists():
-        with open(DATABASE_FILE, "r") as f:
-            return json.load(f)
-    return {}
-
-def save_users(users):
-    with open(DATABASE_FILE, "w") as f:
-        json.dump(users, f)
-
-def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
+def migrate_legacy_users():
+    """Import users.json once, then rename it so later startups skip it"""
+    if not DATABASE_FILE.exists():
+        return
+    imported = user_store.migrate_from_json(DATABASE_FILE)
+    try:
+        DATABASE_FILE.rename(DATABASE_FILE.with_name(DATABASE_FILE.name + ".migrated"))
+    except FileNotFoundError:
+        pass  # another worker finished the same migration first
+    logger.info("Imported %d users from %s", imported, DATABASE_FILE)
 
-def verify_password(password: str, password_hash: str) -> bool:
-    return hash_password(password) == password_hash
+async def upgrade_password_hash(email: str, password: str):
+    """Re-hash a legacy or outdated password hash with the current KDF parameters"""
+    password_hash, _ = await passwords.hash_password(password)
+    await user_store.update_password_hash(email, password_hash)
+    logger.info("Upgraded password hash for %s", email)
 
 # JWT helpers
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -87,33 +102,52 @@ def verify_token(authorization: str = Header(None)) -> dict:
     
     token = authorization.replace("Bearer ", "")
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         return payload
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+# Lifecycle
+async def _start_user_store():
+    await user_store.open_db()
+    migrate_legacy_users()
+
+async def startup():
+    """Open the user store and start the hash workers concurrently"""
+    await profile.run({
+        "user_db": _start_user_store(),
+        "password_pool": passwords.warm_up(),
+    })
+
+async def shutdown():
+    user_store.close_db()
+    passwords.shutdown()
+
 # Routes
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.post("/auth/signup", response_model=TokenResponse)
-async def signup(request: SignupRequest):
-    users = load_users()
-    
-    if request.email in users:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
+async def signup(request: SignupRequest, response: Response):
     user_id = str(hash(request.email))[:16]
-    password_hash = hash_password(request.password)
+    password_hash, timing = await passwords.hash_password(request.password)
+    response.headers["Server-Timing"] = timing.server_timing()
+    metrics.STAGE_LATENCY.observe(timing.kdf_ms, "password_kdf")
     
-    users[request.email] = {
-        "id": user_id,
-        "email": request.email,
-        "name": request.name,
-        "password_hash": password_hash,
-    }
-    save_users(users)
+    try:
+        await user_store.create_user({
+            "id": user_id,
+            "email": request.email,
+            "name": request.name,
+            "password_hash": password_hash,
+        })
+    except UserExistsError:
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     access_token = create_access_token({"sub": request.email})
     
@@ -128,15 +162,18 @@ async def signup(request: SignupRequest):
     }
 
 @app.post("/auth/login", response_model=TokenResponse)
-async def login(request: LoginRequest):
-    users = load_users()
-    
-    if request.email not in users:
-        raise HTTPException(status_code=401, detail="Invalid email or password")
-    
-    user = users[request.email]
-    if not verify_password(request.password, user["password_hash"]):
+async def login(request: LoginRequest, response: Response, background_tasks: BackgroundTasks):
+    user = await user_store.get_user(request.email)
+    # Unknown emails still pay for a verification, so timing does not reveal which emails have accounts
+    password_hash = user["password_hash"] if user is not None else passwords.dummy_hash()
+    matches, needs_rehash, timing = await passwords.verify_password(request.password, password_hash)
+    metrics.STAGE_LATENCY.observe(timing.kdf_ms, "password_kdf")
+    if user is None or not matches:
         raise HTTPException(status_code=401, detail="Invalid email or password")
+    # Only on success: a 401 never carries it, whichever way the login failed
+    response.headers["Server-Timing"] = timing.server_timing()
+    if needs_rehash:
+        background_tasks.add_task(upgrade_password_hash, request.email, request.password)
     
     access_token = create_access_token({"sub": request.email})
     
@@ -155,17 +192,18 @@ async def get_profile(authorization: str = Header(None)):
     payload = verify_token(authorization)
     email = payload.get("sub")
     
-    users = load_users()
-    if email not in users:
+    user = await user_store.get_user(email)
+    if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
-    user = users[email]
     return {
         "id": user["id"],
         "email": user["email"],
         "name": user["name"],
     }
 
+profile.imported()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
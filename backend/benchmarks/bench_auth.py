@@ -0,0 +1,90 @@
+"""
+Login latency against the SQLite user store.
+
+    python benchmarks/bench_auth.py --users 100000 --logins 2000
+
+Seeds a throwaway user database, then drives POST /auth/login through the
+auth app in-process. Also reports how long one parse of an equivalent
+users.json takes, which is what every auth request used to pay.
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from common import format_row, summarize
+
+import httpx
+
+import auth
+import passwords
+import user_store
+
+
+def seed(users: int, password_hash: str) -> dict:
+    conn = user_store._conn()
+    legacy = {}
+    with conn:
+        conn.executemany(
+            "INSERT INTO users (email, id, name, password_hash, created_at) VALUES (?, ?, ?, ?, ?)",
+            (
+                (f"user{i}@example.com", f"{i:016d}", f"User {i}", password_hash, "2024-01-01T00:00:00")
+                for i in range(users)
+            ),
+        )
+    for i in range(users):
+        legacy[f"user{i}@example.com"] = {
+            "id": f"{i:016d}", "email": f"user{i}@example.com", "name": f"User {i}", "password_hash": password_hash,
+        }
+    return legacy
+
+
+async def drive_logins(count: int, users: int, cold: bool) -> list:
+    rng = random.Random(3)
+    samples = []
+    kdf_samples = []
+    transport = httpx.ASGITransport(app=auth.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://auth") as client:
+        for _ in range(count):
+            if cold:
+                user_store._cache.clear()
+            email = f"user{rng.randrange(users)}@example.com"
+            start = time.perf_counter()
+            response = await client.post("/auth/login", json={"email": email, "password": "hunter2"})
+            samples.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.text
+            kdf = response.headers["Server-Timing"].split(",")[0]
+            kdf_samples.append(float(kdf.split("dur=")[1]))
+    return samples, kdf_samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--logins", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        user_store.configure(Path(tmp) / "bench_users.db")
+        legacy = seed(args.users, passwords.hash_password_sync("hunter2"))
+
+        json_path = Path(tmp) / "users.json"
+        json_path.write_text(json.dumps(legacy))
+        start = time.perf_counter()
+        json.loads(json_path.read_text())
+        print(f"legacy users.json parse at {args.users} users: {(time.perf_counter() - start) * 1000:.1f}ms per request")
+
+        cold, kdf = asyncio.run(drive_logins(args.logins, args.users, cold=True))
+        warm, _ = asyncio.run(drive_logins(args.logins, args.users, cold=False))
+        print(format_row("login (cache miss)", summarize(cold)))
+        print(format_row("login (cache mixed)", summarize(warm)))
+        print(format_row(f"kdf (scrypt n={passwords.SCRYPT_N})", summarize(kdf)))
+
+        user_store.close_db()
+
+
+if __name__ == "__main__":
+    main()
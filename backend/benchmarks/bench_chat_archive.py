@@ -0,0 +1,102 @@
+"""
+Chat archive search latency as one user's history grows.
+
+    python benchmarks/bench_chat_archive.py --sizes 1000,10000,50000 --other-users 20
+
+Grows a throwaway archive in steps. At each step the user under test has
+that many messages, and --other-users users have as many again between them.
+It then times first-page searches for a common word, a rare word, a two-word
+query and an opt-in prefix, plus the first page of conversations. Seeding goes
+through write_batch, so it also reports batched write throughput.
+"""
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+from common import format_row, summarize, time_calls
+
+import chat_archive
+
+WORDS = (
+    "interview resume python kubernetes salary offer recruiter project team design system data "
+    "remote startup manager feedback schedule call review experience role company skills cloud "
+    "backend frontend deploy latency database cache question answer weekly update plan"
+).split()
+RARE_WORD = "zeppelin"
+MESSAGES_PER_CONVERSATION = 20
+
+
+def seed(user_id: str, start: int, count: int, rng: random.Random, batch_size: int) -> float:
+    """Append count messages for user_id and return the seconds spent writing"""
+    base = datetime(2024, 1, 1)
+    batch: List[chat_archive.ArchivedMessage] = []
+    elapsed = 0.0
+    for i in range(start, start + count):
+        words = rng.choices(WORDS, k=rng.randint(8, 40))
+        if rng.random() < 0.002:
+            words.append(RARE_WORD)
+        batch.append(chat_archive.ArchivedMessage(
+            user_id,
+            f"c{i // MESSAGES_PER_CONVERSATION}",
+            "user" if i % 2 == 0 else "assistant",
+            " ".join(words),
+            (base + timedelta(minutes=i)).isoformat(),
+        ))
+        if len(batch) == batch_size:
+            t = time.perf_counter()
+            chat_archive.write_batch(batch)
+            elapsed += time.perf_counter() - t
+            batch = []
+    if batch:
+        t = time.perf_counter()
+        chat_archive.write_batch(batch)
+        elapsed += time.perf_counter() - t
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,50000", help="messages of the user under test at each step")
+    parser.add_argument("--other-users", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--page", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=chat_archive.BATCH_SIZE)
+    args = parser.parse_args()
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+
+    user = "bench_user"
+    others = [f"other_{i}" for i in range(args.other_users)]
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        chat_archive.configure(Path(tmp) / "bench_chat_archive.db")
+        seeded = 0
+        for size in sizes:
+            added = size - seeded
+            per_other = added // len(others) if others else 0
+            written = seed(user, seeded, added, rng, args.batch_size)
+            for other in others:
+                written += seed(other, seeded // len(others), per_other, rng, args.batch_size)
+            total = added + per_other * len(others)
+            print(f"\n{size} messages for the user under test: wrote {total} in {written:.1f}s "
+                  f"({total / written:,.0f} messages/s in batches of {args.batch_size})")
+            seeded = size
+
+            queries = {
+                "search common word": ["python"],
+                "search rare word": [RARE_WORD],
+                "search two words": ["salary", "offer"],
+                "search prefix (opt-in)": ["kuber*"],
+            }
+            for name, terms in queries.items():
+                ms = time_calls(lambda i: chat_archive.search(user, terms, args.page), args.queries)
+                print(format_row(name, summarize(ms)))
+            ms = time_calls(lambda i: chat_archive.list_conversations(user, args.page), args.queries)
+            print(format_row("list conversations", summarize(ms)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Reminder store latency at scale.
+
+    python benchmarks/bench_reminders.py --rows 1000000 --users 10000
+
+Seeds a throwaway SQLite file, then times get_reminders and
+get_due_reminders for random users. Pass --no-index to drop the composite
+index and compare against a full table scan.
+"""
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from common import format_row, summarize, time_calls
+
+import reminders
+
+
+def seed(rows: int, users: int, batch: int = 50_000) -> None:
+    conn = reminders._conn()
+    now = datetime.now()
+    created = now.isoformat()
+    rng = random.Random(42)
+    inserted = 0
+    while inserted < rows:
+        size = min(batch, rows - inserted)
+        conn.executemany(
+            """
+            INSERT INTO reminders (user_id, title, description, reminder_time, created_at, completed)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (
+                (
+                    f"user_{rng.randrange(users)}",
+                    f"Reminder {inserted + i}",
+                    "",
+                    (now + timedelta(minutes=rng.randint(-30 * 24 * 60, 30 * 24 * 60))).isoformat(),
+                    created,
+                    1 if rng.random() < 0.3 else 0,
+                )
+                for i in range(size)
+            ),
+        )
+        conn.commit()
+        inserted += size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--no-index", action="store_true", help="drop the composite index before querying")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        reminders.configure(Path(tmp) / "bench_reminders.db")
+
+        start = time.perf_counter()
+        seed(args.rows, args.users)
+        print(f"seeded {args.rows} rows across {args.users} users in {time.perf_counter() - start:.1f}s")
+
+        if args.no_index:
+            reminders._conn().execute("DROP INDEX IF EXISTS idx_reminders_user_completed_time")
+
+        rng = random.Random(7)
+        users = [f"user_{rng.randrange(args.users)}" for _ in range(args.queries)]
+
+        list_ms = time_calls(lambda i: reminders.get_reminders(users[i]), args.queries)
+        due_ms = time_calls(lambda i: reminders.get_due_reminders(users[i]), args.queries)
+        print(format_row("get_reminders", summarize(list_ms)))
+        print(format_row("get_due_reminders", summarize(due_ms)))
+
+        reminders.close_db()
+
+
+if __name__ == "__main__":
+    main()
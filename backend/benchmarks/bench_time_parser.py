@@ -0,0 +1,51 @@
+"""
+Per-call cost of time_parser.parse_time over a corpus of reminder phrases.
+
+    python benchmarks/bench_time_parser.py --rounds 2000
+"""
+import argparse
+from datetime import datetime
+
+from common import format_row, summarize, time_calls
+
+from time_parser import parse_time
+
+CORPUS = [
+    "remind me to call bob tomorrow at 3pm",
+    "follow up with the recruiter in 2 days",
+    "ping me in 30 minutes about the offer",
+    "schedule the interview for next monday",
+    "set a reminder for january 15 at 3:30pm",
+    "remind me to send the resume on friday at 10am",
+    "prep for the mock interview tonight",
+    "remind me today at 5:45 pm to submit the application",
+    "check in with Sarah next week",
+    "renew the job posting next month",
+    "call the hiring manager at 4",
+    "submit expenses by 2026-03-01",
+    "team sync 2026-03-01 14:00",
+    "remind me on the 3rd of march to update linkedin",
+    "lunch with the candidate at noon",
+    "review 12 resumes before thursday",
+    "remind me to follow up",
+    "draft a cover letter for the product role",
+    "ask about salary range when they reply",
+    "in an hour remind me to stretch",
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=2_000)
+    args = parser.parse_args()
+
+    now = datetime(2026, 1, 5, 10, 0)
+    found = sum(1 for phrase in CORPUS if parse_time(phrase, now))
+    print(f"corpus={len(CORPUS)} phrases, {found} with a time expression")
+
+    samples = time_calls(lambda i: parse_time(CORPUS[i % len(CORPUS)], now), args.rounds * len(CORPUS))
+    print(format_row("parse_time", summarize(samples)))
+
+
+if __name__ == "__main__":
+    main()
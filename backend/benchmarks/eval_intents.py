@@ -0,0 +1,73 @@
+"""
+Accuracy and latency of the keyword and model intent backends.
+
+Every --holdout-th utterance of data/intents.tsv is held out. A fresh model
+is trained on the rest, so the model is scored on utterances it has not seen.
+The keyword matcher is scored on the same held-out set.
+
+    python benchmarks/eval_intents.py
+    python benchmarks/eval_intents.py --holdout 4 --rounds 5000
+"""
+import argparse
+import time
+from collections import Counter
+from typing import Callable, List, Sequence, Tuple
+
+from common import format_row, summarize, time_calls
+
+import intent_model
+import nlu
+
+# Confidence the router needs before it acts on an intent
+from router import MIN_CONFIDENCE
+
+
+def report(name: str, gold: Sequence[str], predicted: Sequence[Tuple[str, float]]) -> None:
+    correct = [label == p for label, (p, _) in zip(gold, predicted)]
+    confident = [(ok, conf) for ok, (_, conf) in zip(correct, predicted) if conf >= MIN_CONFIDENCE]
+    print(f"{name}: accuracy={sum(correct) / len(gold):.3f} ({sum(correct)}/{len(gold)})")
+    if confident:
+        precision = sum(ok for ok, _ in confident) / len(confident)
+        print(f"  confidence>={MIN_CONFIDENCE}: coverage={len(confident) / len(gold):.3f} accuracy={precision:.3f}")
+    totals, hits = Counter(gold), Counter(label for label, ok in zip(gold, correct) if ok)
+    print("  per intent: " + " ".join(f"{label}={hits[label]}/{totals[label]}" for label in sorted(totals)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=str(intent_model.DATA_PATH))
+    parser.add_argument("--holdout", type=int, default=5, help="hold out every Nth utterance")
+    parser.add_argument("--rounds", type=int, default=2_000, help="single-utterance calls timed per backend")
+    args = parser.parse_args()
+
+    examples = intent_model.load_examples(args.data)
+    train = [e for i, e in enumerate(examples) if i % args.holdout]
+    test = [e for i, e in enumerate(examples) if i % args.holdout == 0]
+    gold = [label for label, _ in test]
+    texts = [text for _, text in test]
+
+    start = time.perf_counter()
+    model = intent_model.train(train)
+    print(f"trained on {len(train)} utterances in {(time.perf_counter() - start) * 1000:.0f}ms, "
+          f"testing on {len(test)}\n")
+
+    keyword = [nlu.detect_intent(text, "keyword")[:2] for text in texts]
+    report("keyword", gold, keyword)
+    report("model", gold, [(label, p) for label, p, _ in model.predict(texts)])
+
+    print()
+    n = len(texts)
+    single: List[Tuple[str, Callable[[int], object]]] = [
+        ("keyword (per utterance)", lambda i: nlu.detect_intent(texts[i % n], "keyword")),
+        ("model (per utterance)", lambda i: model.predict([texts[i % n]])),
+    ]
+    for name, func in single:
+        print(format_row(name, summarize(time_calls(func, args.rounds))))
+
+    batch_ms = sorted(time_calls(lambda i: model.predict(texts), max(1, args.rounds // n)))
+    per_utterance = summarize([ms / n for ms in batch_ms])
+    print(format_row(f"model (batch of {n}, per utterance)", per_utterance))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Local OpenAI-compatible stub server for load testing without network access.
+
+Run it and point the backend at it:
+
+    python benchmarks/fake_openai.py --port 8010 --latency-ms 800
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8010/v1 python main.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+LATENCY_MS = float(os.getenv("FAKE_OPENAI_LATENCY_MS", "500"))
+JITTER_MS = float(os.getenv("FAKE_OPENAI_JITTER_MS", "0"))
+# Fraction of calls that take SLOW_MS instead, to model a provider's latency tail
+SLOW_RATE = float(os.getenv("FAKE_OPENAI_SLOW_RATE", "0"))
+SLOW_MS = float(os.getenv("FAKE_OPENAI_SLOW_MS", "5000"))
+# Delay between streamed chunks when the client sets stream=true
+TOKEN_MS = float(os.getenv("FAKE_OPENAI_TOKEN_MS", "20"))
+REPLY_TEXT = os.getenv(
+    "FAKE_OPENAI_REPLY",
+    "This is a stubbed completion from the local fake OpenAI server. "
+    "It echoes a fixed reply so load tests measure the backend, not the model.",
+)
+
+app = FastAPI(title="Fake OpenAI", version="1.0.0")
+app.state.in_flight = 0
+app.state.max_in_flight = 0
+app.state.requests = 0
+
+
+async def _simulate_latency() -> None:
+    delay = LATENCY_MS + random.uniform(-JITTER_MS, JITTER_MS)
+    if SLOW_RATE and random.random() < SLOW_RATE:
+        delay = SLOW_MS
+    await asyncio.sleep(max(0.0, delay) / 1000)
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "requests": app.state.requests,
+        "in_flight": app.state.in_flight,
+        "max_in_flight": app.state.max_in_flight,
+    }
+
+
+async def _stream_chunks(completion_id: str, model: str):
+    app.state.in_flight += 1
+    app.state.max_in_flight = max(app.state.max_in_flight, app.state.in_flight)
+    try:
+        await _simulate_latency()
+        words = REPLY_TEXT.split(" ")
+        for i, word in enumerate(words):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": word if i == 0 else " " + word},
+                        "finish_reason": "stop" if i == len(words) - 1 else None,
+                    }
+                ],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(TOKEN_MS / 1000)
+        yield "data: [DONE]\n\n"
+    finally:
+        app.state.in_flight -= 1
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    app.state.requests += 1
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    if body.get("stream"):
+        return StreamingResponse(
+            _stream_chunks(completion_id, body.get("model", "fake-model")),
+            media_type="text/event-stream",
+        )
+
+    app.state.in_flight += 1
+    app.state.max_in_flight = max(app.state.max_in_flight, app.state.in_flight)
+    try:
+        await _simulate_latency()
+    finally:
+        app.state.in_flight -= 1
+
+    prompt_tokens = sum(len(m.get("content", "")) // 4 for m in body.get("messages", []))
+    completion_tokens = len(REPLY_TEXT) // 4
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake-model"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": REPLY_TEXT},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS)
+    parser.add_argument("--jitter-ms", type=float, default=JITTER_MS)
+    parser.add_argument("--token-ms", type=float, default=TOKEN_MS)
+    parser.add_argument("--slow-rate", type=float, default=SLOW_RATE)
+    parser.add_argument("--slow-ms", type=float, default=SLOW_MS)
+    args = parser.parse_args()
+
+    LATENCY_MS = args.latency_ms
+    JITTER_MS = args.jitter_ms
+    TOKEN_MS = args.token_ms
+    SLOW_RATE = args.slow_rate
+    SLOW_MS = args.slow_ms
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
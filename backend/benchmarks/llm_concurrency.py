@@ -0,0 +1,87 @@
+"""
+Fire concurrent generate_reply calls at the local fake OpenAI server.
+
+    python benchmarks/llm_concurrency.py --requests 200 --latency-ms 500
+
+With a non-blocking client the wall time is roughly
+requests / llm_max_concurrency * latency, not requests * latency.
+
+To see hedging cut the tail, give the stub a slow tail and a second backend:
+
+    python benchmarks/llm_concurrency.py --requests 400 --slow-rate 0.05 --slow-ms 3000 --backends 2
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import uvicorn  # noqa: E402
+
+import fake_openai  # noqa: E402
+from llm import generate_reply, close_client  # noqa: E402
+from models import LLMBackend, Settings  # noqa: E402
+
+
+async def main(args) -> None:
+    fake_openai.LATENCY_MS = args.latency_ms
+    fake_openai.SLOW_RATE = args.slow_rate
+    fake_openai.SLOW_MS = args.slow_ms
+    # The same stub on one port per backend; each call draws its own latency
+    ports = [args.port + i for i in range(args.backends)]
+    servers = [
+        uvicorn.Server(uvicorn.Config(fake_openai.app, host="127.0.0.1", port=port, log_level="warning"))
+        for port in ports
+    ]
+    server_tasks = [asyncio.create_task(server.serve()) for server in servers]
+    while not all(server.started for server in servers):
+        await asyncio.sleep(0.01)
+
+    settings = Settings(
+        openai_api_key="stub",
+        openai_base_url=f"http://127.0.0.1:{ports[0]}/v1",
+        llm_backends=[
+            LLMBackend(name=f"stub{i}", base_url=f"http://127.0.0.1:{port}/v1") for i, port in enumerate(ports[1:], 1)
+        ],
+        llm_hedge_initial_delay_ms=args.hedge_initial_ms,
+        llm_max_concurrency=args.concurrency,
+        # Measure the concurrency cap alone: queue every call, shed none
+        llm_max_queue=args.requests,
+        llm_max_queue_wait_s=3600,
+    )
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(generate_reply(f"question {i}", [], True, settings) for i in range(args.requests))
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    errors = sum(1 for _, _, trace in results if any(t.startswith("llm:error") for t in trace))
+    latencies = sorted(ms for _, ms, _ in results)
+    print(f"requests={args.requests} concurrency={args.concurrency} stub_latency_ms={args.latency_ms:.0f}")
+    print(f"wall_ms={wall_ms:.0f} serial_ms={args.requests * args.latency_ms:.0f} errors={errors}")
+    hedged = sum(1 for _, _, trace in results if any(t.startswith("llm:hedge_delay_ms") for t in trace))
+    p99 = latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)]
+    print(f"p50_ms={latencies[len(latencies) // 2]} p99_ms={p99} max_ms={latencies[-1]}")
+    print(f"backends={args.backends} hedged={hedged} stub_calls={fake_openai.app.state.requests}")
+    print(f"stub_max_in_flight={fake_openai.app.state.max_in_flight}")
+
+    await close_client()
+    for server in servers:
+        server.should_exit = True
+    await asyncio.gather(*server_tasks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of stub calls that are slow")
+    parser.add_argument("--slow-ms", type=float, default=5000)
+    parser.add_argument("--backends", type=int, default=1, help="stub backends, on consecutive ports")
+    parser.add_argument("--hedge-initial-ms", type=float, default=2000, help="hedge delay before latencies are known")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,386 @@
+"""
+Backend benchmark suite with saved baselines and regression checks.
+
+    python benchmarks/run.py micro --sizes 1000 100000
+    python benchmarks/run.py load --requests 500 --concurrency 32 --latency-ms 200
+    python benchmarks/run.py coldstart --cold-starts 10
+    python benchmarks/run.py all --save       # record baselines
+    python benchmarks/run.py all --compare    # exit 1 if anything regressed
+
+micro times nlu.run_nlu, time_parser.parse_natural_time and the reminders.py
+CRUD functions at each table size. load serves main.py and auth.py with
+uvicorn next to the fake OpenAI server and drives every endpoint with
+concurrent clients, reporting throughput and p50/p95/p99. coldstart starts
+each app in a fresh interpreter, runs its startup hook and collects the
+coldstart report: process start to imported, each warm-up phase, and ready.
+It also lists the slowest imports from one run under -X importtime.
+
+Each run writes benchmarks/results/<mode>.json. --save copies it to
+benchmarks/baselines/<mode>.json; --compare flags a benchmark whose p95 grew,
+or whose throughput fell, by more than --threshold against that baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from common import BACKEND_DIR, format_row, summarize, time_calls
+
+# Keep every database the suite touches out of the working tree. This has to
+# happen before the backend modules are imported, since they read it at import.
+WORK_DIR = Path(tempfile.mkdtemp(prefix="talk-bench-"))
+os.environ.setdefault("REMINDERS_DB_PATH", str(WORK_DIR / "reminders.db"))
+os.environ.setdefault("CHAT_ARCHIVE_DB_PATH", str(WORK_DIR / "chat_archive.db"))
+os.environ.setdefault("JOBS_DB_PATH", str(WORK_DIR / "jobs.db"))
+os.environ.setdefault("USERS_DB_PATH", str(WORK_DIR / "users.db"))
+
+from bench_reminders import seed  # noqa: E402
+from bench_time_parser import CORPUS  # noqa: E402
+
+BENCH_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = BENCH_DIR / "results"
+BASELINES_DIR = BENCH_DIR / "baselines"
+
+# Differences below these are noise, whatever the relative change
+MIN_DELTA_MS = {"micro": 0.05, "load": 2.0, "coldstart": 25.0}
+
+# Run in a fresh interpreter per cold start; prints the app's coldstart report
+COLD_START_SCRIPT = """
+import asyncio, json
+import {app} as service
+
+async def cycle():
+    await service.startup()
+    await service.shutdown()
+
+asyncio.run(cycle())
+print(json.dumps(service.profile.report()))
+"""
+
+Result = Dict[str, float]
+
+
+def run_micro(args) -> Dict[str, Result]:
+    import reminders
+    from nlu import run_nlu
+    from time_parser import parse_natural_time
+
+    results: Dict[str, Result] = {}
+    now = datetime.now()
+    n = len(CORPUS)
+
+    results["nlu.run_nlu"] = summarize(time_calls(lambda i: run_nlu(CORPUS[i % n]), args.iterations))
+    results["nlu.run_nlu[keyword]"] = summarize(
+        time_calls(lambda i: run_nlu(CORPUS[i % n], "keyword"), args.iterations)
+    )
+    results["time_parser.parse_natural_time"] = summarize(
+        time_calls(lambda i: parse_natural_time(CORPUS[i % n], now), args.iterations)
+    )
+
+    for size in args.sizes:
+        reminders.configure(WORK_DIR / f"micro_{size}.db")
+        users = max(1, size // 100)
+        seed(size, users)
+
+        rng = random.Random(size)
+        user_ids = [f"user_{rng.randrange(users)}" for _ in range(args.iterations)]
+        created: List[int] = []
+
+        def create(i: int) -> None:
+            created.append(reminders.create_reminder(user_ids[i], f"Bench {i}", now + timedelta(hours=1)))
+
+        timings = {
+            "create_reminder": time_calls(create, args.iterations),
+            "get_reminders": time_calls(lambda i: reminders.get_reminders(user_ids[i]), args.iterations),
+            "get_due_reminders": time_calls(lambda i: reminders.get_due_reminders(user_ids[i]), args.iterations),
+            "complete_reminder": time_calls(
+                lambda i: reminders.complete_reminder(created[i], user_ids[i]), args.iterations
+            ),
+            "delete_reminder": time_calls(
+                lambda i: reminders.delete_reminder(created[i], user_ids[i]), args.iterations
+            ),
+        }
+        for name, samples in timings.items():
+            results[f"reminders.{name}@{size}"] = summarize(samples)
+
+    reminders.close_db()
+    return results
+
+
+async def _drive(send: Callable[[int], Awaitable], requests: int, concurrency: int) -> Result:
+    """Issue requests through a fixed number of concurrent clients"""
+    import asyncio
+    import httpx
+
+    pending = iter(range(requests))
+    samples: List[float] = []
+    errors = 0
+
+    async def client() -> None:
+        nonlocal errors
+        for i in pending:
+            start = time.perf_counter()
+            try:
+                response = await send(i)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            samples.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    wall_s = time.perf_counter() - start
+
+    stats = summarize(samples)
+    stats["throughput_rps"] = requests / wall_s
+    stats["errors"] = errors
+    return stats
+
+
+async def _load(args) -> Dict[str, Result]:
+    import asyncio
+    import httpx
+    import uvicorn
+
+    llm_port, main_port, auth_port = args.port, args.port + 1, args.port + 2
+    os.environ.update({
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        # Every request should reach the fake model, not the reply cache
+        "RESPONSE_CACHE_ENABLED": "false",
+        # All load clients share one address; don't let the per-user quota shed them
+        "LLM_USER_BURST": "0",
+        "LLM_MAX_QUEUE": str(args.requests),
+    })
+
+    import fake_openai
+    import auth
+    import main
+
+    fake_openai.LATENCY_MS = args.latency_ms
+    fake_openai.JITTER_MS = args.jitter_ms
+    fake_openai.TOKEN_MS = args.token_ms
+    auth.DATABASE_FILE = WORK_DIR / "users.json"
+
+    servers = [
+        uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        for app, port in ((fake_openai.app, llm_port), (main.app, main_port), (auth.app, auth_port))
+    ]
+    tasks = [asyncio.create_task(server.serve()) for server in servers]
+    while not all(server.started for server in servers):
+        await asyncio.sleep(0.01)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results: Dict[str, Result] = {}
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{main_port}", limits=limits, timeout=60
+        ) as api, httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{auth_port}", limits=limits, timeout=60
+        ) as auth_api:
+            reminder_time = (datetime.now() + timedelta(days=1)).isoformat()
+            signup = await auth_api.post(
+                "/auth/signup", json={"email": "bench@example.com", "password": "hunter2", "name": "Bench"}
+            )
+            token = signup.json()["access_token"]
+
+            scenarios: Dict[str, Callable[[int], Awaitable]] = {
+                "POST /api/respond [llm]": lambda i: api.post(
+                    "/api/respond", json={"text": f"explain how to debug race condition #{i}"}
+                ),
+                "POST /api/respond [fast_path]": lambda i: api.post(
+                    "/api/respond", json={"text": f"remind me to call candidate {i} tomorrow at 3pm"}
+                ),
+                "POST /api/respond/stream": lambda i: api.post(
+                    "/api/respond/stream", json={"text": f"explain how to debug race condition #{i}"}
+                ),
+                "POST /api/reminders": lambda i: api.post(
+                    "/api/reminders",
+                    params={"user_id": f"load_user_{i % 50}"},
+                    json={"title": f"Load {i}", "reminder_time": reminder_time},
+                ),
+                "GET /api/reminders": lambda i: api.get("/api/reminders", params={"user_id": f"load_user_{i % 50}"}),
+                "GET /api/reminders/due": lambda i: api.get(
+                    "/api/reminders/due", params={"user_id": f"load_user_{i % 50}"}
+                ),
+                "POST /auth/login": lambda i: auth_api.post(
+                    "/auth/login", json={"email": "bench@example.com", "password": "hunter2"}
+                ),
+                "GET /auth/profile": lambda i: auth_api.get(
+                    "/auth/profile", headers={"Authorization": f"Bearer {token}"}
+                ),
+            }
+            for name, send in scenarios.items():
+                if args.only and not any(part in name for part in args.only):
+                    continue
+                results[name] = await _drive(send, args.requests, args.concurrency)
+    finally:
+        for server in reversed(servers):
+            server.should_exit = True
+        await asyncio.gather(*tasks)
+    return results
+
+
+def run_load(args) -> Dict[str, Result]:
+    import asyncio
+
+    return asyncio.run(_load(args))
+
+
+def _slowest_imports(app: str, env: Dict[str, str], count: int) -> List[str]:
+    """The app's direct imports in one cold start, by cumulative time"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {app}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    # Children are printed before their parent, indented two spaces per level
+    children: List[Tuple[float, str]] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            if name.strip() == app:
+                break
+            children = []
+        elif depth == 1:
+            children.append((int(cumulative) / 1000, name.strip()))
+    return [f"{name:<36} {ms:8.1f}ms" for ms, name in sorted(children, reverse=True)[:count]]
+
+
+def run_coldstart(args) -> Dict[str, Result]:
+    # A stub key makes main warm the LLM client too; warming never calls the API
+    env = dict(os.environ, OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "stub"))
+    samples: Dict[str, List[float]] = {}
+    for app in ("main", "auth"):
+        script = COLD_START_SCRIPT.format(app=app)
+        # One unrecorded start so bytecode compilation isn't counted
+        for i in range(args.cold_starts + 1):
+            proc = subprocess.run(
+                [sys.executable, "-c", script], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+            )
+            if i == 0:
+                continue
+            report = json.loads(proc.stdout.strip().splitlines()[-1])
+            for key in ("import", "startup", "ready"):
+                samples.setdefault(f"{app}.{key}", []).append(report[f"{key}_ms"])
+            for phase, ms in report["phases"].items():
+                samples.setdefault(f"{app}.startup.{phase}", []).append(ms)
+
+        print(f"\nslowest imports ({app}):")
+        for line in _slowest_imports(app, env, args.imports):
+            print(f"  {line}")
+    return {name: summarize(values) for name, values in samples.items()}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _report(mode: str, results: Dict[str, Result], args) -> Dict:
+    return {
+        "mode": mode,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "params": {key: value for key, value in vars(args).items() if key not in ("mode", "save", "compare")},
+        "results": results,
+    }
+
+
+def find_regressions(mode: str, results: Dict[str, Result], baseline: Dict, threshold: float) -> List[str]:
+    """Describe every benchmark that is slower than its baseline by more than threshold"""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        p95, base_p95 = current["p95_ms"], base["p95_ms"]
+        if p95 > base_p95 * (1 + threshold) and p95 - base_p95 > MIN_DELTA_MS[mode]:
+            regressions.append(f"{name}: p95 {base_p95:.3f}ms -> {p95:.3f}ms")
+        if "throughput_rps" in current and "throughput_rps" in base:
+            rps, base_rps = current["throughput_rps"], base["throughput_rps"]
+            if rps < base_rps * (1 - threshold):
+                regressions.append(f"{name}: throughput {base_rps:.1f}/s -> {rps:.1f}/s")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=["micro", "load", "coldstart", "all"])
+    parser.add_argument("--iterations", type=int, default=2_000, help="calls per micro-benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000], help="reminder rows per size")
+    parser.add_argument("--requests", type=int, default=300, help="requests per load scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=200, help="fake OpenAI time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--token-ms", type=float, default=5)
+    parser.add_argument("--port", type=int, default=8010, help="first of three ports for the load servers")
+    parser.add_argument("--only", nargs="+", help="load scenarios whose name contains any of these")
+    parser.add_argument("--cold-starts", type=int, default=10, help="fresh processes per app in coldstart mode")
+    parser.add_argument("--imports", type=int, default=8, help="slowest imports to list in coldstart mode")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baselines")
+    parser.add_argument("--compare", action="store_true", help="exit 1 if results regress against the baselines")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    modes = ["micro", "load", "coldstart"] if args.mode == "all" else [args.mode]
+    runners = {"micro": run_micro, "load": run_load, "coldstart": run_coldstart}
+    regressions: List[str] = []
+
+    try:
+        for mode in modes:
+            results = runners[mode](args)
+            report = _report(mode, results, args)
+
+            print(f"\n== {mode} ==")
+            for name, stats in results.items():
+                line = format_row(name, stats)
+                if "throughput_rps" in stats:
+                    line += f" rps={stats['throughput_rps']:.1f} errors={stats['errors']}"
+                print(line)
+
+            RESULTS_DIR.mkdir(exist_ok=True)
+            (RESULTS_DIR / f"{mode}.json").write_text(json.dumps(report, indent=2))
+
+            baseline_path = BASELINES_DIR / f"{mode}.json"
+            if args.compare:
+                if baseline_path.exists():
+                    found = find_regressions(mode, results, json.loads(baseline_path.read_text()), args.threshold)
+                    for regression in found:
+                        print(f"REGRESSION {regression}")
+                    regressions.extend(found)
+                else:
+                    print(f"no baseline at {baseline_path}; run with --save first")
+            if args.save:
+                BASELINES_DIR.mkdir(exist_ok=True)
+                baseline_path.write_text(json.dumps(report, indent=2))
+                print(f"saved baseline {baseline_path}")
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
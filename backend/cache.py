@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from models import Message, Settings
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Expired rows are pruned from the disk tier once every this many writes
+PRUNE_EVERY = 256
+
+
+def normalize_prompt(text: str) -> str:
+    return _WHITESPACE.sub(" ", text.strip().lower())
+
+
+def history_digest(history: List[Message]) -> str:
+    payload = json.dumps([[m.role, m.content] for m in history], separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def make_key(
+    text: str,
+    history: List[Message],
+    recruiter_mode: bool,
+    task: Optional[str],
+    model_name: str,
+) -> str:
+    """Cache key over everything that changes the model's answer"""
+    parts = [
+        normalize_prompt(text),
+        task or "",
+        "1" if recruiter_mode else "0",
+        history_digest(history),
+        model_name,
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier reply cache: a bounded in-memory LRU with TTL, optionally
+    backed by a SQLite table so entries survive restarts.
+    """
+
+    def __init__(self, max_entries: int, ttl_s: float, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    reply TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            self._db.commit()
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, reply = entry
+        if expires_at < time.time():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return reply
+
+    def _set_memory(self, key: str, reply: str, expires_at: float) -> None:
+        self._entries[key] = (expires_at, reply)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get_disk(self, key: str) -> Optional[Tuple[float, str]]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT expires_at, reply FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[0] < time.time():
+            return None
+        return row
+
+    def _set_disk(self, key: str, reply: str, expires_at: float) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO response_cache (key, reply, expires_at) VALUES (?, ?, ?)",
+                (key, reply, expires_at),
+            )
+            self._writes += 1
+            if self._writes % PRUNE_EVERY == 0:
+                self._db.execute("DELETE FROM response_cache WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    async def lookup(self, key: str) -> Tuple[Optional[str], Optional[str]]:
+        """Return (reply, tier) where tier is "memory", "disk" or None on a miss"""
+        reply = self._get_memory(key)
+        if reply is not None:
+            return reply, "memory"
+        if self._db is None:
+            return None, None
+        row = await asyncio.to_thread(self._get_disk, key)
+        if row is None:
+            return None, None
+        expires_at, reply = row
+        self._set_memory(key, reply, expires_at)
+        return reply, "disk"
+
+    async def store(self, key: str, reply: str) -> None:
+        expires_at = time.time() + self.ttl_s
+        self._set_memory(key, reply, expires_at)
+        if self._db is not None:
+            await asyncio.to_thread(self._set_disk, key, reply, expires_at)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM response_cache")
+                self._db.commit()
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_cache(settings: Settings) -> ResponseCache:
+    """Return the process-wide response cache, creating it on first use"""
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache(
+            settings.response_cache_size,
+            settings.response_cache_ttl_s,
+            settings.response_cache_db,
+        )
+    return _cache
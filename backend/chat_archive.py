@@ -0,0 +1,446 @@
+"""
+Server-side archive of chat messages with full-text search.
+
+Every turn of a conversation that has a conversation_id is appended here, so
+a user's history survives cleared browser storage and can be searched from
+any device. Messages are append-only. They are queued in memory and a single
+writer task commits them in batches (CHAT_ARCHIVE_BATCH_SIZE messages, or
+whatever arrived within CHAT_ARCHIVE_FLUSH_MS), so a chat turn never waits on
+the disk.
+
+Messages longer than CHAT_ARCHIVE_COMPRESS_MIN_BYTES are stored as
+zlib-compressed BLOBs; shorter ones stay TEXT. The FTS5 index is contentless:
+it keeps only the index, not a second copy of the text. Search hits are read
+back from messages, and their snippets are cut in Python.
+
+Each indexed message carries an owner token for its user, and a search
+matches that token together with the query terms. Hits come newest first and
+are paged by message id. FTS5 walks the matches in rowid order and stops once
+the page is full, so a page costs about the same whether a user has a hundred
+messages or tens of thousands. Words are matched after porter stemming.
+Prefix words ("kube*") are opt-in, because FTS5 merges the full match lists
+of every word sharing the prefix, and that cost grows with the archive.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(os.getenv("CHAT_ARCHIVE_DB_PATH", Path(__file__).parent / "chat_archive.db"))
+# Reader threads, each with its own connection; writes go through one more thread
+DB_WORKERS = int(os.getenv("CHAT_ARCHIVE_DB_WORKERS", "2"))
+BATCH_SIZE = int(os.getenv("CHAT_ARCHIVE_BATCH_SIZE", "256"))
+FLUSH_MS = float(os.getenv("CHAT_ARCHIVE_FLUSH_MS", "200"))
+COMPRESS_MIN_BYTES = int(os.getenv("CHAT_ARCHIVE_COMPRESS_MIN_BYTES", "512"))
+
+# Titles are the first user message, clipped
+TITLE_CHARS = 80
+# Query words beyond this are ignored
+MAX_QUERY_TERMS = 8
+SNIPPET_CHARS = 160
+
+_local = threading.local()
+_executor: Optional[ThreadPoolExecutor] = None
+_write_executor: Optional[ThreadPoolExecutor] = None
+# Bumped by configure() so threads reopen their connection against the new path
+_generation = 0
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, cached_statements=64)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def _conn() -> sqlite3.Connection:
+    """Return this thread's connection, opening it on first use"""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.generation != _generation:
+        if conn is not None:
+            conn.close()
+        conn = _connect()
+        _local.conn = conn
+        _local.generation = _generation
+    return conn
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="archive-db")
+    return _executor
+
+
+def _get_write_executor() -> ThreadPoolExecutor:
+    # One thread, so batches commit in order and never contend for the write lock
+    global _write_executor
+    if _write_executor is None:
+        _write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="archive-writer")
+    return _write_executor
+
+
+async def run_db(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run an archive query on the reader pool instead of the event loop"""
+    loop = asyncio.get_running_loop()
+    with metrics.STAGE_LATENCY.time("archive_db"):
+        return await loop.run_in_executor(_get_executor(), partial(func, *args, **kwargs))
+
+
+def init_db() -> None:
+    """Create the archive tables"""
+    conn = _conn()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS conversations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            conversation_id TEXT NOT NULL,
+            title TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (user_id, conversation_id)
+        )
+    """)
+    # Keyset pages of a user's conversations, most recently active first
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_conversations_user_updated
+        ON conversations (user_id, updated_at, id)
+    """)
+    # content is TEXT, or a zlib-compressed BLOB for long messages
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation INTEGER NOT NULL REFERENCES conversations (id),
+            role TEXT NOT NULL,
+            content NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages (conversation, id)")
+    # rowid is messages.id; owner is the user's token from _owner_token
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts
+        USING fts5(owner, body, content='', tokenize='porter unicode61')
+    """)
+    conn.commit()
+
+
+async def open_db() -> None:
+    """Create the schema and start the batch writer"""
+    global _writer
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(_get_write_executor(), init_db)
+    if _writer is None:
+        _writer = ArchiveWriter(BATCH_SIZE, FLUSH_MS / 1000)
+        _writer.start()
+
+
+async def close_db() -> None:
+    """Flush queued messages, then stop the writer and the thread pools"""
+    global _writer, _executor, _write_executor, _generation
+    if _writer is not None:
+        await _writer.stop()
+        _writer = None
+    for executor in (_executor, _write_executor):
+        if executor is not None:
+            executor.shutdown(wait=True)
+    _executor = _write_executor = None
+    _generation += 1
+
+
+def configure(db_path: Path) -> None:
+    """Point the archive at a different database file (used by benchmarks)"""
+    global DB_PATH, _generation
+    DB_PATH = Path(db_path)
+    _generation += 1
+    init_db()
+
+
+def _owner_token(user_id: str) -> str:
+    # A single word the tokenizer keeps whole, whatever characters the user id has
+    return "u" + hashlib.sha1(user_id.encode()).hexdigest()[:20]
+
+
+def _pack(content: str) -> Any:
+    raw = content.encode()
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return content
+    return zlib.compress(raw, 6)
+
+
+def _unpack(content: Any) -> str:
+    if isinstance(content, bytes):
+        return zlib.decompress(content).decode()
+    return content
+
+
+@dataclass
+class ArchivedMessage:
+    user_id: str
+    conversation_id: str
+    role: str
+    content: str
+    created_at: str
+    # Used only when this message starts the conversation
+    title: Optional[str] = None
+
+
+def write_batch(messages: Sequence[ArchivedMessage]) -> None:
+    """Append messages, creating their conversations as needed, in one transaction"""
+    conversations: Dict[Tuple[str, str], List[ArchivedMessage]] = {}
+    for message in messages:
+        conversations.setdefault((message.user_id, message.conversation_id), []).append(message)
+
+    conn = _conn()
+    with conn:
+        for (user_id, conversation_id), items in conversations.items():
+            first_user = next((m.content for m in items if m.role == "user"), items[0].content)
+            title = items[0].title or " ".join(first_user.split())[:TITLE_CHARS]
+            pk = conn.execute(
+                """
+                INSERT INTO conversations (user_id, conversation_id, title, created_at, updated_at, message_count)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (user_id, conversation_id) DO UPDATE SET
+                    updated_at = max(updated_at, excluded.updated_at),
+                    message_count = message_count + excluded.message_count
+                RETURNING id
+                """,
+                (user_id, conversation_id, title, items[0].created_at, items[-1].created_at, len(items)),
+            ).fetchone()[0]
+            owner = _owner_token(user_id)
+            for m in items:
+                message_id = conn.execute(
+                    "INSERT INTO messages (conversation, role, content, created_at) VALUES (?, ?, ?, ?)",
+                    (pk, m.role, _pack(m.content), m.created_at),
+                ).lastrowid
+                conn.execute(
+                    "INSERT INTO messages_fts (rowid, owner, body) VALUES (?, ?, ?)", (message_id, owner, m.content)
+                )
+
+
+class ArchiveWriter:
+    """Queues messages on the event loop and commits them in batches on the writer thread"""
+
+    def __init__(self, batch_size: int, flush_interval_s: float):
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self._pending: List[Tuple[ArchivedMessage, Optional[asyncio.Future]]] = []
+        self._has_pending = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flushing: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    def append(self, messages: Sequence[ArchivedMessage], wait: bool = False) -> Optional[asyncio.Future]:
+        """Queue messages; with wait, the returned future resolves once they are committed"""
+        future = asyncio.get_running_loop().create_future() if wait else None
+        for i, message in enumerate(messages):
+            # Only the last message carries the future: batches commit in order
+            self._pending.append((message, future if i == len(messages) - 1 else None))
+        self._has_pending.set()
+        if len(self._pending) >= self.batch_size:
+            self._batch_full.set()
+        return future
+
+    async def _run(self) -> None:
+        while True:
+            await self._has_pending.wait()
+            # Give the rest of the batch a moment to arrive
+            try:
+                await asyncio.wait_for(self._batch_full.wait(), self.flush_interval_s)
+            except asyncio.TimeoutError:
+                pass
+            # Shielded, so stop() lets a batch already on the writer thread finish and resolve its futures
+            self._flushing = asyncio.ensure_future(self.flush())
+            await asyncio.shield(self._flushing)
+
+    async def flush(self) -> None:
+        """Commit everything queued so far"""
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            batch, self._pending = self._pending[: self.batch_size], self._pending[self.batch_size:]
+            if not self._pending:
+                self._has_pending.clear()
+            if len(self._pending) < self.batch_size:
+                self._batch_full.clear()
+            futures = [future for _, future in batch if future is not None]
+            try:
+                with metrics.STAGE_LATENCY.time("archive_db"):
+                    await loop.run_in_executor(_get_write_executor(), write_batch, [m for m, _ in batch])
+            except Exception as e:
+                logger.exception("Failed to archive %d messages", len(batch))
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for future in futures:
+                if not future.done():
+                    future.set_result(len(batch))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._flushing is not None:
+            await self._flushing
+        await self.flush()
+
+
+_writer: Optional[ArchiveWriter] = None
+
+
+def get_writer() -> Optional[ArchiveWriter]:
+    """The running writer, or None before open_db()"""
+    return _writer
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+def append_turn(user_id: str, conversation_id: str, text: str, reply: str) -> None:
+    """Queue a user message and its reply without waiting for the commit"""
+    if _writer is None:
+        return
+    now = _now()
+    _writer.append([
+        ArchivedMessage(user_id, conversation_id, "user", text, now),
+        ArchivedMessage(user_id, conversation_id, "assistant", reply, now),
+    ])
+
+
+async def append_messages(
+    user_id: str, conversation_id: str, messages: Sequence[Tuple[str, str]], title: Optional[str] = None
+) -> int:
+    """Append (role, content) pairs and wait until they are committed"""
+    if _writer is None:
+        raise RuntimeError("chat archive is not open")
+    now = _now()
+    items = [ArchivedMessage(user_id, conversation_id, role, content, now, title) for role, content in messages]
+    future = _writer.append(items, wait=True)
+    await future
+    return len(items)
+
+
+def list_conversations(user_id: str, limit: int, before: Optional[Tuple[str, int]] = None) -> List[Dict]:
+    """
+    A user's conversations, ordered by (updated_at, id) descending.
+    Pass the (updated_at, id) of the last row seen as before to get the next page.
+    """
+    params: list = [user_id]
+    where = ""
+    if before is not None:
+        where = " AND (updated_at, id) < (?, ?)"
+        params.extend(before)
+    params.append(limit)
+    rows = _conn().execute(
+        f"""
+        SELECT id, conversation_id, title, created_at, updated_at, message_count FROM conversations
+        WHERE user_id = ?{where} ORDER BY updated_at DESC, id DESC LIMIT ?
+        """,
+        params,
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def get_messages(user_id: str, conversation_id: str, limit: int, after: Optional[int] = None) -> Optional[List[Dict]]:
+    """Messages of one conversation, oldest first after message id after; None if it does not exist"""
+    conn = _conn()
+    found = conn.execute(
+        "SELECT id FROM conversations WHERE user_id = ? AND conversation_id = ?", (user_id, conversation_id)
+    ).fetchone()
+    if found is None:
+        return None
+    rows = conn.execute(
+        "SELECT id, role, content, created_at FROM messages WHERE conversation = ? AND id > ? ORDER BY id LIMIT ?",
+        (found["id"], after or 0, limit),
+    ).fetchall()
+    return [{**dict(row), "content": _unpack(row["content"])} for row in rows]
+
+
+def query_terms(query: str) -> List[str]:
+    """Lowercased words of a search query; a word ending in * is a prefix"""
+    return re.findall(r"\w+\*?", query.lower())[:MAX_QUERY_TERMS]
+
+
+def _match_expression(user_id: str, terms: List[str]) -> str:
+    # Every term must match. Quoting keeps FTS5 operators in the query literal.
+    words = [f'"{term.rstrip("*")}"' + ("*" if term.endswith("*") else "") for term in terms]
+    return f'owner:"{_owner_token(user_id)}" AND body:({" ".join(words)})'
+
+
+def _snippet(content: str, terms: List[str]) -> str:
+    """The part of content around the first query term, or its start"""
+    # Match on a short prefix, so stemmed hits ("interviewing" for "interviews") are found too
+    pattern = "|".join(re.escape(term.rstrip("*")[:5]) for term in terms)
+    found = re.search(rf"\b(?:{pattern})", content, re.IGNORECASE)
+    start = max(0, found.start() - SNIPPET_CHARS // 3) if found else 0
+    end = start + SNIPPET_CHARS
+    snippet = " ".join(content[start:end].split())
+    return ("…" if start else "") + snippet + ("…" if end < len(content) else "")
+
+
+def search(user_id: str, terms: List[str], limit: int, before: Optional[int] = None) -> List[Dict]:
+    """Messages of a user matching every term, newest first, with message ids below before"""
+    conn = _conn()
+    params: list = [_match_expression(user_id, terms)]
+    where = ""
+    if before is not None:
+        where = " AND rowid < ?"
+        params.append(before)
+    params.append(limit)
+    ids = [
+        row[0]
+        for row in conn.execute(
+            f"SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?{where} ORDER BY rowid DESC LIMIT ?", params
+        )
+    ]
+    if not ids:
+        return []
+    rows = conn.execute(
+        f"""
+        SELECT m.id, m.role, m.content, m.created_at, c.conversation_id, c.title
+        FROM messages m JOIN conversations c ON c.id = m.conversation
+        WHERE m.id IN ({",".join("?" * len(ids))}) ORDER BY m.id DESC
+        """,
+        ids,
+    ).fetchall()
+    return [
+        {
+            "message_id": row["id"],
+            "conversation_id": row["conversation_id"],
+            "title": row["title"],
+            "role": row["role"],
+            "created_at": row["created_at"],
+            "snippet": _snippet(_unpack(row["content"]), terms),
+        }
+        for row in rows
+    ]
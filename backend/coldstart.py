@@ -0,0 +1,94 @@
+"""
+Cold-start profiling for the services.
+
+Each app creates a StartupProfile at import and calls imported() once its
+module body has run. Its startup hook then runs the warm-up phases through
+run(), which starts them concurrently and times each one. The report is
+logged, exported as startup_duration_ms and printed by
+`python benchmarks/run.py coldstart`.
+
+Times are measured from process start, read from /proc on Linux, so import_ms
+includes the interpreter and server imports. Without /proc it falls back to
+the time since this module was imported.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Dict, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+_IMPORTED_AT = time.perf_counter()
+
+
+def _process_age_ms() -> Optional[float]:
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the parenthesised command name; starttime is field 22 overall
+            fields = f.read().rpartition(")")[2].split()
+        with open("/proc/uptime") as f:
+            uptime_s = float(f.read().split()[0])
+        started_s = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+    return (uptime_s - started_s) * 1000
+
+
+# Offset that turns perf_counter readings into milliseconds since process start
+_age = _process_age_ms()
+_ORIGIN_MS = (_age if _age is not None else 0.0) - _IMPORTED_AT * 1000
+
+
+def since_process_start_ms() -> float:
+    return time.perf_counter() * 1000 + _ORIGIN_MS
+
+
+class StartupProfile:
+    def __init__(self, app_name: str):
+        self.app_name = app_name
+        self.import_ms: Optional[float] = None
+        self.phases: Dict[str, float] = {}
+        self.startup_ms: Optional[float] = None
+        self.ready_ms: Optional[float] = None
+
+    def imported(self) -> None:
+        """Call at the end of the app module"""
+        self.import_ms = since_process_start_ms()
+        metrics.STARTUP_DURATION.set(round(self.import_ms, 1), self.app_name, "import")
+
+    async def _timed(self, name: str, phase: Awaitable) -> None:
+        start = time.perf_counter()
+        await phase
+        self.phases[name] = (time.perf_counter() - start) * 1000
+
+    async def run(self, phases: Dict[str, Awaitable]) -> None:
+        """Run the warm-up phases concurrently; the first failure fails startup"""
+        start = time.perf_counter()
+        await asyncio.gather(*(self._timed(name, phase) for name, phase in phases.items()))
+        self.startup_ms = (time.perf_counter() - start) * 1000
+        self.ready_ms = since_process_start_ms()
+
+        for name, ms in self.phases.items():
+            metrics.STARTUP_DURATION.set(round(ms, 1), self.app_name, name)
+        metrics.STARTUP_DURATION.set(round(self.startup_ms, 1), self.app_name, "startup")
+        metrics.STARTUP_DURATION.set(round(self.ready_ms, 1), self.app_name, "ready")
+        logger.info(
+            "%s ready %.0fms after process start (imports %.0fms, startup %.0fms: %s)",
+            self.app_name,
+            self.ready_ms,
+            self.import_ms or 0,
+            self.startup_ms,
+            ", ".join(f"{name} {ms:.0f}ms" for name, ms in self.phases.items()),
+        )
+
+    def report(self) -> Dict:
+        return {
+            "app": self.app_name,
+            "import_ms": self.import_ms,
+            "startup_ms": self.startup_ms,
+            "ready_ms": self.ready_ms,
+            "phases": dict(self.phases),
+        }
@@ -0,0 +1,174 @@
+"""
+Server-side conversation history with a token budget.
+
+Clients send only the new turn plus a conversation_id; the server keeps the
+turns and, before each model call, fits them into a token budget: recent
+turns stay verbatim and older ones are folded into a short rolling summary.
+"""
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+from models import Message, Settings
+
+# Rough tokenizer-free estimate; English averages about 4 characters per token
+CHARS_PER_TOKEN = 4
+# Chat formatting overhead per message (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Longest excerpt of a turn kept in the summary
+SUMMARY_EXCERPT_CHARS = 160
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_messages_tokens(messages: Iterable[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def _message_tokens(message: Message) -> int:
+    return estimate_tokens(message.content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _summary_line(message: Message) -> str:
+    """First sentence of a turn, clipped, e.g. 'User: How do I prep for ...'"""
+    content = " ".join(message.content.split())
+    excerpt = _SENTENCE_END.split(content, 1)[0]
+    if len(excerpt) > SUMMARY_EXCERPT_CHARS:
+        excerpt = excerpt[:SUMMARY_EXCERPT_CHARS].rstrip() + "..."
+    return f"{message.role.capitalize()}: {excerpt}"
+
+
+def _fold(summary: str, folded: List[Message], summary_tokens: int) -> str:
+    """Append folded turns to the summary, dropping its oldest lines past the budget"""
+    lines = [line for line in summary.split("\n") if line] + [_summary_line(m) for m in folded]
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > summary_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+@dataclass
+class CompactedHistory:
+    history: List[Message]
+    summary: str
+    # Turns moved from history into the summary by this call
+    folded: int
+    trace: List[str] = field(default_factory=list)
+
+
+def compact_history(
+    history: List[Message],
+    summary: str,
+    budget_tokens: int,
+    summary_tokens: int,
+    min_turns: int,
+) -> CompactedHistory:
+    """
+    Keep the most recent turns that fit in budget_tokens and fold everything
+    older into the summary, itself capped at summary_tokens. The last
+    min_turns are always kept verbatim, even over budget.
+    """
+    kept_tokens = 0
+    keep_from = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        cost = _message_tokens(history[i])
+        if len(history) - i > min_turns and kept_tokens + cost > budget_tokens:
+            break
+        kept_tokens += cost
+        keep_from = i
+
+    folded = history[:keep_from]
+    if folded:
+        summary = _fold(summary, folded, summary_tokens)
+    kept = history[keep_from:]
+
+    trace = [f"history:turns={len(kept)}", f"history:tokens={kept_tokens}"]
+    if folded:
+        trace.append(f"history:folded={len(folded)}")
+    if summary:
+        trace.append(f"history:summary_tokens={estimate_tokens(summary)}")
+    return CompactedHistory(kept, summary, len(folded), trace)
+
+
+@dataclass
+class Conversation:
+    id: str
+    user_id: str
+    turns: List[Message] = field(default_factory=list)
+    summary: str = ""
+    updated_at: float = field(default_factory=time.monotonic)
+
+
+class ConversationStore:
+    """
+    In-process conversations, least recently used evicted first and idle
+    ones expired after ttl_s. Like the reminder scheduler, this assumes a
+    single worker process.
+
+    Conversations are keyed by (user_id, conversation_id), so a user only
+    ever sees their own: the same id sent by another user is another
+    conversation.
+    """
+
+    def __init__(self, max_conversations: int, ttl_s: float):
+        self.max_conversations = max_conversations
+        self.ttl_s = ttl_s
+        self._conversations: "OrderedDict[Tuple[str, str], Conversation]" = OrderedDict()
+
+    def get(self, user_id: str, conversation_id: str) -> Optional[Conversation]:
+        key = (user_id, conversation_id)
+        conversation = self._conversations.get(key)
+        if conversation is None:
+            return None
+        if time.monotonic() - conversation.updated_at > self.ttl_s:
+            del self._conversations[key]
+            return None
+        self._conversations.move_to_end(key)
+        return conversation
+
+    def get_or_create(
+        self, user_id: str, conversation_id: str, seed: Optional[List[Message]] = None
+    ) -> Conversation:
+        """Return the conversation, starting it from seed (client-sent history) if new"""
+        conversation = self.get(user_id, conversation_id)
+        if conversation is None:
+            conversation = Conversation(conversation_id, user_id, list(seed or []))
+            self._conversations[(user_id, conversation_id)] = conversation
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+        return conversation
+
+    def compact(
+        self,
+        conversation: Conversation,
+        budget_tokens: int,
+        summary_tokens: int,
+        min_turns: int,
+    ) -> CompactedHistory:
+        """Fit the conversation into the budget, folding old turns into its summary for good"""
+        compacted = compact_history(conversation.turns, conversation.summary, budget_tokens, summary_tokens, min_turns)
+        conversation.turns = compacted.history
+        conversation.summary = compacted.summary
+        return compacted
+
+    def append(self, conversation: Conversation, user_text: str, reply: str) -> None:
+        conversation.turns.append(Message(role="user", content=user_text))
+        conversation.turns.append(Message(role="assistant", content=reply))
+        conversation.updated_at = time.monotonic()
+
+    def delete(self, user_id: str, conversation_id: str) -> bool:
+        return self._conversations.pop((user_id, conversation_id), None) is not None
+
+
+_store: Optional[ConversationStore] = None
+
+
+def get_store(settings: Settings) -> ConversationStore:
+    global _store
+    if _store is None:
+        _store = ConversationStore(settings.conversation_max_count, settings.conversation_ttl_s)
+    return _store
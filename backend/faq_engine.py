@@ -0,0 +1,253 @@
+"""
+Local answers for common recruiter questions.
+
+The questions in data/faq.json are turned into TF-IDF vectors over hashed
+word and character n-grams (text_features.py). A query is vectorised the
+same way and scored against every question with one small matrix product.
+That takes tens of microseconds, so near-duplicates of a known question skip
+the LLM entirely (FAQ_MIN_SCORE). A looser match (FAQ_FALLBACK_MIN_SCORE)
+stands in for the canned reply when the LLM is offline, failing or shedding
+load.
+
+The index is built in one batch and saved next to the corpus. Workers load
+it with np.load(mmap_mode="r"), so they share one copy through the page
+cache. A worker that finds the index missing, or built from an older corpus,
+rebuilds and saves it. To rebuild ahead of a deploy:
+
+    python faq_engine.py build
+
+NumPy is imported on first use, keeping it off the service's import path.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+from text_features import hashed_ngrams
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FAQ_ENABLED = os.getenv("FAQ_ENABLED", "true").lower() in ("1", "true", "yes")
+CORPUS_PATH = Path(os.getenv("FAQ_CORPUS_PATH", Path(__file__).parent / "data" / "faq.json"))
+# Defaults to the corpus folder
+INDEX_DIR = Path(os.getenv("FAQ_INDEX_DIR", "")) if os.getenv("FAQ_INDEX_DIR") else CORPUS_PATH.parent
+# Cosine similarity needed to answer instead of calling the LLM, and to answer in place of a fallback
+MIN_SCORE = float(os.getenv("FAQ_MIN_SCORE", "0.8"))
+FALLBACK_MIN_SCORE = float(os.getenv("FAQ_FALLBACK_MIN_SCORE", "0.45"))
+
+HASH_DIM = 1 << 14
+INDEX_VERSION = 1
+MATRIX_FILE = "faq_matrix.npy"
+IDF_FILE = "faq_idf.npy"
+META_FILE = "faq_meta.json"
+
+# Left out of unigrams and trigrams
+STOPWORDS = frozenset(
+    "a an and are can could do does for i in is it me my of on or please the to what whats "
+    "with would you your".split()
+)
+
+
+def _features(text: str) -> Dict[int, int]:
+    return hashed_ngrams(text, HASH_DIM, STOPWORDS)
+
+
+@dataclass
+class FAQMatch:
+    id: str
+    answer: str
+    score: float
+
+
+class FAQEngine:
+    def __init__(self, matrix: "np.ndarray", idf: "np.ndarray", ids: List[str], answers: List[str], row_entry: List[int]):
+        # (HASH_DIM, questions): one L2-normalised column per question, so a query gathers only its own rows
+        self.matrix = matrix
+        self.idf = idf
+        self.ids = ids
+        self.answers = answers
+        self.row_entry = row_entry
+
+    @property
+    def questions(self) -> int:
+        return self.matrix.shape[1]
+
+    def match(self, text: str, min_score: float) -> Optional[FAQMatch]:
+        """The best answer for text, or None when no question scores at least min_score"""
+        import numpy as np
+
+        counts = _features(text)
+        if not counts:
+            return None
+        buckets = np.fromiter(counts, dtype=np.intp, count=len(counts))
+        weights = np.fromiter((1 + math.log(c) for c in counts.values()), dtype=np.float32, count=len(counts))
+        weights *= self.idf[buckets]
+        norm = float(np.linalg.norm(weights))
+        if norm == 0:
+            return None
+        scores = (weights / norm) @ self.matrix[buckets]
+        row = int(scores.argmax())
+        score = float(scores[row])
+        if score < min_score:
+            return None
+        entry = self.row_entry[row]
+        return FAQMatch(self.ids[entry], self.answers[entry], score)
+
+
+def _corpus_digest(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+def build(entries: List[Dict]) -> FAQEngine:
+    """Vectorise every question of the corpus entries in one pass"""
+    import numpy as np
+
+    ids, answers, row_entry, rows = [], [], [], []
+    for i, entry in enumerate(entries):
+        ids.append(str(entry["id"]))
+        answers.append(entry["answer"])
+        for question in entry["questions"]:
+            row_entry.append(i)
+            rows.append(_features(question))
+
+    df = np.zeros(HASH_DIM, dtype=np.float32)
+    for counts in rows:
+        df[list(counts)] += 1
+    idf = (np.log((1 + len(rows)) / (1 + df)) + 1).astype(np.float32)
+
+    matrix = np.zeros((HASH_DIM, len(rows)), dtype=np.float32)
+    for j, counts in enumerate(rows):
+        buckets = np.fromiter(counts, dtype=np.intp, count=len(counts))
+        weights = np.fromiter((1 + math.log(c) for c in counts.values()), dtype=np.float32, count=len(counts))
+        weights *= idf[buckets]
+        norm = float(np.linalg.norm(weights))
+        if norm:
+            matrix[buckets, j] = weights / norm
+    return FAQEngine(matrix, idf, ids, answers, row_entry)
+
+
+def _replace(path: Path, write) -> None:
+    """Write through a temporary file so readers never see a partial file"""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def save(engine: FAQEngine, index_dir: Path, digest: str) -> None:
+    """Write the index; the metadata goes last, so it only names complete arrays"""
+    import numpy as np
+
+    index_dir.mkdir(parents=True, exist_ok=True)
+    # np.save appends .npy to names without it, so write through open files
+    for name, array in ((MATRIX_FILE, engine.matrix), (IDF_FILE, engine.idf)):
+        def write(tmp: Path, array=array) -> None:
+            with open(tmp, "wb") as f:
+                np.save(f, array)
+        _replace(index_dir / name, write)
+    meta = {
+        "version": INDEX_VERSION,
+        "hash_dim": HASH_DIM,
+        "corpus_sha256": digest,
+        "ids": engine.ids,
+        "answers": engine.answers,
+        "row_entry": engine.row_entry,
+    }
+    _replace(index_dir / META_FILE, lambda tmp: tmp.write_text(json.dumps(meta)))
+
+
+def load_index(index_dir: Path, digest: str) -> Optional[FAQEngine]:
+    """Memory-map a saved index, or None when it is missing or was built from another corpus"""
+    import numpy as np
+
+    try:
+        meta = json.loads((index_dir / META_FILE).read_text())
+        if (meta.get("version"), meta.get("hash_dim"), meta.get("corpus_sha256")) != (INDEX_VERSION, HASH_DIM, digest):
+            return None
+        matrix = np.load(index_dir / MATRIX_FILE, mmap_mode="r")
+        idf = np.load(index_dir / IDF_FILE, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if matrix.shape != (HASH_DIM, len(meta["row_entry"])) or idf.shape != (HASH_DIM,):
+        return None
+    return FAQEngine(matrix, idf, meta["ids"], meta["answers"], meta["row_entry"])
+
+
+def rebuild(corpus_path: Path = CORPUS_PATH, index_dir: Path = INDEX_DIR) -> FAQEngine:
+    """Build the index from the corpus and save it"""
+    raw = corpus_path.read_bytes()
+    engine = build(json.loads(raw))
+    save(engine, index_dir, _corpus_digest(raw))
+    return engine
+
+
+_engine: Optional[FAQEngine] = None
+
+
+def get_engine() -> Optional[FAQEngine]:
+    """The loaded engine, or None before load() or when the FAQ is disabled or missing"""
+    return _engine
+
+
+def load(corpus_path: Path = CORPUS_PATH, index_dir: Path = INDEX_DIR) -> Optional[FAQEngine]:
+    """Map the saved index, rebuilding it first if it is missing or stale"""
+    global _engine
+    if not FAQ_ENABLED:
+        return None
+    try:
+        raw = corpus_path.read_bytes()
+    except OSError:
+        logger.warning("FAQ corpus %s not found; local answers disabled", corpus_path)
+        return None
+    digest = _corpus_digest(raw)
+    engine = load_index(index_dir, digest)
+    if engine is None:
+        engine = build(json.loads(raw))
+        try:
+            save(engine, index_dir, digest)
+            # Map the saved copy so this worker shares pages with the others
+            engine = load_index(index_dir, digest) or engine
+        except OSError as e:
+            logger.warning("Could not save FAQ index to %s (%s); using an in-memory copy", index_dir, e)
+    _engine = engine
+    logger.info("FAQ engine ready: %d answers, %d questions", len(engine.ids), engine.questions)
+    return engine
+
+
+def answer(text: str, min_score: float) -> Optional[FAQMatch]:
+    """Shorthand for get_engine().match that is None while no engine is loaded"""
+    if _engine is None:
+        return None
+    return _engine.match(text, min_score)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["build", "query"])
+    parser.add_argument("text", nargs="?", help="question to look up (query)")
+    parser.add_argument("--corpus", type=Path, default=CORPUS_PATH)
+    parser.add_argument("--index-dir", type=Path, default=None, help="default: the corpus folder")
+    args = parser.parse_args()
+    index_dir = args.index_dir or args.corpus.parent
+
+    if args.command == "build":
+        start = time.perf_counter()
+        built = rebuild(args.corpus, index_dir)
+        print(f"{len(built.ids)} answers, {built.questions} questions -> {index_dir} "
+              f"in {(time.perf_counter() - start) * 1000:.0f}ms")
+    else:
+        loaded = load(args.corpus, index_dir)
+        if loaded is None:
+            parser.error("FAQ index unavailable")
+        start = time.perf_counter()
+        found = loaded.match(args.text or "", 0.0)
+        elapsed_us = (time.perf_counter() - start) * 1e6
+        print(json.dumps({"match": found.__dict__ if found else None, "elapsed_us": round(elapsed_us, 1)}))
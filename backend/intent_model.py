@@ -0,0 +1,155 @@
+"""
+Linear intent classifier over hashed word and character n-grams.
+
+A softmax regression trained offline from the labelled utterances in
+data/intents.tsv, so its confidences are probabilities and the router can
+threshold them. The weights are one (HASH_DIM, intents) matrix, loaded once
+at startup. predict() vectorises a whole batch into one matrix and scores it
+with a single matrix product.
+
+    python intent_model.py train          # data/intents.tsv -> data/intent_model.npz
+
+benchmarks/eval_intents.py reports accuracy and latency against the keyword matcher.
+"""
+import os
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from text_features import hashed_ngrams
+
+HASH_DIM = 1 << 13
+DATA_PATH = Path(__file__).parent / "data" / "intents.tsv"
+MODEL_PATH = Path(os.getenv("INTENT_MODEL_PATH", Path(__file__).parent / "data" / "intent_model.npz"))
+
+# Training defaults: full-batch gradient descent with L2 regularisation
+EPOCHS = 400
+LEARNING_RATE = 5.0
+L2 = 1e-4
+
+
+def load_examples(path: Path = DATA_PATH) -> List[Tuple[str, str]]:
+    """(label, utterance) pairs from a label<TAB>utterance file; # starts a comment line"""
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            label, _, text = line.partition("\t")
+            if not text:
+                raise ValueError(f"{path}: expected label<TAB>utterance, got {line!r}")
+            examples.append((label.strip(), text.strip()))
+    return examples
+
+
+def _sparse(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Buckets and L2-normalised log-scaled counts of one text"""
+    counts = hashed_ngrams(text, HASH_DIM)
+    buckets = np.fromiter(counts, dtype=np.intp, count=len(counts))
+    values = np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    norm = np.linalg.norm(values)
+    if norm:
+        values /= norm
+    return buckets, values
+
+
+def vectorize(texts: Sequence[str]) -> np.ndarray:
+    """One feature row per text"""
+    matrix = np.zeros((len(texts), HASH_DIM), dtype=np.float32)
+    for i, text in enumerate(texts):
+        buckets, values = _sparse(text)
+        matrix[i, buckets] = values
+    return matrix
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    np.exp(logits, out=logits)
+    logits /= logits.sum(axis=1, keepdims=True)
+    return logits
+
+
+class IntentModel:
+    def __init__(self, labels: List[str], weights: np.ndarray, bias: np.ndarray):
+        self.labels = labels
+        self.weights = weights
+        self.bias = bias
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        """(texts, labels) probabilities"""
+        if len(texts) == 1:
+            # A single text only needs the weight rows of its own features
+            buckets, values = _sparse(texts[0])
+            return _softmax((values @ self.weights[buckets] + self.bias)[np.newaxis])
+        return _softmax(vectorize(texts) @ self.weights + self.bias)
+
+    def predict(self, texts: Sequence[str]) -> List[Tuple[str, float, List[Tuple[str, float]]]]:
+        """(label, probability, top two (label, probability)) per text"""
+        proba = self.predict_proba(texts)
+        top = np.argsort(-proba, axis=1)[:, :2]
+        results = []
+        for row, best in zip(proba, top):
+            ranked = [(self.labels[j], float(row[j])) for j in best]
+            results.append((ranked[0][0], ranked[0][1], ranked))
+        return results
+
+    def save(self, path: Path = MODEL_PATH) -> None:
+        # Through an open file, as np.savez appends .npz to names without it
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, labels=np.array(self.labels), weights=self.weights, bias=self.bias)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path = MODEL_PATH) -> "IntentModel":
+        """Raises OSError when the file is missing and ValueError when it does not fit HASH_DIM"""
+        with np.load(path) as data:
+            weights = data["weights"].astype(np.float32)
+            bias = data["bias"].astype(np.float32)
+            labels = [str(label) for label in data["labels"]]
+        if weights.shape != (HASH_DIM, len(labels)) or bias.shape != (len(labels),):
+            raise ValueError(f"{path}: weights do not match HASH_DIM={HASH_DIM}; retrain the model")
+        return cls(labels, weights, bias)
+
+
+def train(
+    examples: Sequence[Tuple[str, str]],
+    epochs: int = EPOCHS,
+    learning_rate: float = LEARNING_RATE,
+    l2: float = L2,
+) -> IntentModel:
+    """Fit the softmax regression on (label, utterance) pairs"""
+    labels = sorted({label for label, _ in examples})
+    index = {label: i for i, label in enumerate(labels)}
+    x = vectorize([text for _, text in examples])
+    y = np.zeros((len(examples), len(labels)), dtype=np.float32)
+    y[np.arange(len(examples)), [index[label] for label, _ in examples]] = 1
+
+    weights = np.zeros((HASH_DIM, len(labels)), dtype=np.float32)
+    bias = np.zeros(len(labels), dtype=np.float32)
+    for _ in range(epochs):
+        error = _softmax(x @ weights + bias) - y
+        weights -= learning_rate * (x.T @ error / len(examples) + l2 * weights)
+        bias -= learning_rate * error.mean(axis=0)
+    return IntentModel(labels, weights, bias)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["train"])
+    parser.add_argument("--data", type=Path, default=DATA_PATH)
+    parser.add_argument("--out", type=Path, default=MODEL_PATH)
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    examples = load_examples(args.data)
+    model = train(examples, epochs=args.epochs)
+    model.save(args.out)
+    print(f"{len(examples)} utterances, {len(model.labels)} intents -> {args.out} "
+          f"in {(time.perf_counter() - start) * 1000:.0f}ms")
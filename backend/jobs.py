@@ -0,0 +1,426 @@
+"""
+SQLite-backed queue for long-form generation jobs.
+
+POST /api/jobs stores a job and returns its id at once. JOBS_WORKERS worker
+tasks per process claim queued jobs and run them, so a cover letter or resume
+review no longer holds an HTTP request open for the whole generation.
+
+A claim is a single UPDATE ... RETURNING, so several processes can share one
+file. The claiming worker holds a lease of JOBS_LEASE_S and renews it while
+the job runs. The attempt number fences every later write, so a worker whose
+lease lapsed cannot overwrite the job after someone else claimed it. On a
+clean shutdown, running jobs go back to the queue. If the process dies
+instead, their leases lapse and the next worker to poll picks them up. A job
+that raises is retried with exponential backoff, up to JOBS_MAX_ATTEMPTS runs.
+
+Subscribers in this process hear about a job the moment its state changes.
+Jobs finished by another process are noticed on the next poll (JOBS_POLL_S).
+Finished jobs are deleted after JOBS_RESULT_TTL_S.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(os.getenv("JOBS_DB_PATH", Path(__file__).parent / "jobs.db"))
+# Concurrent jobs per process; each one still takes an LLM slot at bulk priority
+WORKERS = int(os.getenv("JOBS_WORKERS", "4"))
+LEASE_S = float(os.getenv("JOBS_LEASE_S", "60"))
+MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "5"))
+# How often idle workers look for jobs submitted to other processes or left by a dead one
+POLL_S = float(os.getenv("JOBS_POLL_S", "2"))
+RESULT_TTL_S = float(os.getenv("JOBS_RESULT_TTL_S", str(7 * 24 * 3600)))
+# Queued plus running jobs one user may have
+MAX_ACTIVE_PER_USER = int(os.getenv("JOBS_MAX_ACTIVE_PER_USER", "10"))
+
+RETRY_BASE_S = 5.0
+RETRY_MAX_S = 300.0
+CLEANUP_INTERVAL_S = 600.0
+
+FINISHED = ("succeeded", "failed")
+
+_local = threading.local()
+_executor: Optional[ThreadPoolExecutor] = None
+# Bumped by configure() so threads reopen their connection against the new path
+_generation = 0
+
+
+class TooManyJobs(Exception):
+    """Raised by create_job when the user already has MAX_ACTIVE_PER_USER active jobs"""
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, cached_statements=64)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+def _conn() -> sqlite3.Connection:
+    """Return this thread's connection, opening it on first use"""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.generation != _generation:
+        if conn is not None:
+            conn.close()
+        conn = _connect()
+        _local.conn = conn
+        _local.generation = _generation
+    return conn
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="jobs-db")
+    return _executor
+
+
+async def run_db(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a job query on the DB thread pool instead of the event loop"""
+    loop = asyncio.get_running_loop()
+    with metrics.STAGE_LATENCY.time("jobs_db"):
+        return await loop.run_in_executor(_get_executor(), partial(func, *args, **kwargs))
+
+
+def configure(db_path: Path) -> None:
+    """Point the queue at a different database file (used by benchmarks)"""
+    global DB_PATH, _generation
+    DB_PATH = Path(db_path)
+    _generation += 1
+    init_db()
+
+
+def init_db() -> None:
+    """Create the jobs table"""
+    conn = _conn()
+    # run_after is epoch seconds: when a queued job may next run, or when a running job's lease lapses
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            task TEXT NOT NULL,
+            request TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            run_after REAL NOT NULL,
+            result TEXT,
+            error TEXT,
+            tool_trace TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, run_after)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_user_created ON jobs (user_id, created_at, id)")
+    conn.commit()
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+def _public(row: sqlite3.Row) -> Dict:
+    """The fields of a job the API returns"""
+    return {
+        "id": row["id"],
+        "task": row["task"],
+        "status": row["status"],
+        "attempts": row["attempts"],
+        "result": row["result"],
+        "error": row["error"],
+        "tool_trace": json.loads(row["tool_trace"]) if row["tool_trace"] else [],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+
+
+def create_job(user_id: str, task: str, request: Dict) -> Dict:
+    """Queue a job; raises TooManyJobs when the user is at MAX_ACTIVE_PER_USER"""
+    conn = _conn()
+    now = _now()
+    with conn:
+        # Take the write lock first, so two submissions cannot both pass the limit
+        conn.execute("BEGIN IMMEDIATE")
+        active = conn.execute(
+            "SELECT count(*) FROM jobs WHERE user_id = ? AND status IN ('queued', 'running')", (user_id,)
+        ).fetchone()[0]
+        if active >= MAX_ACTIVE_PER_USER:
+            raise TooManyJobs(user_id)
+        row = conn.execute(
+            """
+            INSERT INTO jobs (id, user_id, task, request, status, run_after, created_at, updated_at)
+            VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)
+            RETURNING *
+            """,
+            (uuid.uuid4().hex, user_id, task, json.dumps(request), time.time(), now, now),
+        ).fetchone()
+    return _public(row)
+
+
+def get_job(job_id: str, user_id: str) -> Optional[Dict]:
+    row = _conn().execute("SELECT * FROM jobs WHERE id = ? AND user_id = ?", (job_id, user_id)).fetchone()
+    return _public(row) if row else None
+
+
+def list_jobs(user_id: str, limit: int, before: Optional[Tuple[str, str]] = None) -> List[Dict]:
+    """
+    A user's jobs, newest first, ordered by (created_at, id) descending.
+    Pass the (created_at, id) of the last job seen as before to get the next page.
+    """
+    params: list = [user_id]
+    where = ""
+    if before is not None:
+        where = " AND (created_at, id) < (?, ?)"
+        params.extend(before)
+    params.append(limit)
+    rows = _conn().execute(
+        f"SELECT * FROM jobs WHERE user_id = ?{where} ORDER BY created_at DESC, id DESC LIMIT ?", params
+    ).fetchall()
+    return [_public(row) for row in rows]
+
+
+def claim_job(lease_s: float = LEASE_S, max_attempts: int = MAX_ATTEMPTS) -> Optional[sqlite3.Row]:
+    """Take the oldest runnable job, or one whose worker's lease lapsed, and lease it"""
+    conn = _conn()
+    now = time.time()
+    with conn:
+        # A lapsed job that has used up its attempts is failed rather than run again
+        conn.execute(
+            """
+            UPDATE jobs SET status = 'failed', error = 'worker lost', updated_at = ?
+            WHERE status = 'running' AND run_after <= ? AND attempts >= ?
+            """,
+            (_now(), now, max_attempts),
+        )
+        return conn.execute(
+            """
+            UPDATE jobs SET status = 'running', attempts = attempts + 1, run_after = ?, updated_at = ?
+            WHERE id = (
+                SELECT id FROM jobs WHERE status IN ('queued', 'running') AND run_after <= ?
+                ORDER BY run_after LIMIT 1
+            )
+            RETURNING *
+            """,
+            (now + lease_s, _now(), now),
+        ).fetchone()
+
+
+def renew_lease(job_id: str, attempt: int, lease_s: float = LEASE_S) -> bool:
+    """Extend a running job's lease; False when this attempt no longer owns the job"""
+    conn = _conn()
+    with conn:
+        cursor = conn.execute(
+            "UPDATE jobs SET run_after = ? WHERE id = ? AND status = 'running' AND attempts = ?",
+            (time.time() + lease_s, job_id, attempt),
+        )
+    return cursor.rowcount == 1
+
+
+def finish_job(
+    job_id: str, attempt: int, status: str, result: Optional[str], error: Optional[str], tool_trace: List[str]
+) -> Optional[Dict]:
+    """Record the outcome of an attempt; None when the attempt no longer owns the job"""
+    conn = _conn()
+    with conn:
+        row = conn.execute(
+            """
+            UPDATE jobs SET status = ?, result = ?, error = ?, tool_trace = ?, updated_at = ?
+            WHERE id = ? AND status = 'running' AND attempts = ?
+            RETURNING *
+            """,
+            (status, result, error, json.dumps(tool_trace), _now(), job_id, attempt),
+        ).fetchone()
+    return _public(row) if row else None
+
+
+def requeue_job(job_id: str, attempt: int, delay_s: float, error: Optional[str], refund: bool = False) -> Optional[Dict]:
+    """Put a running job back in the queue; refund gives back the attempt (used on shutdown)"""
+    conn = _conn()
+    with conn:
+        row = conn.execute(
+            """
+            UPDATE jobs SET status = 'queued', run_after = ?, error = ?, updated_at = ?,
+                attempts = attempts - ?
+            WHERE id = ? AND status = 'running' AND attempts = ?
+            RETURNING *
+            """,
+            (time.time() + delay_s, error, _now(), int(refund), job_id, attempt),
+        ).fetchone()
+    return _public(row) if row else None
+
+
+def delete_finished(older_than_s: float = RESULT_TTL_S) -> int:
+    """Drop finished jobs last updated more than older_than_s ago"""
+    cutoff = datetime.fromtimestamp(time.time() - older_than_s).isoformat()
+    conn = _conn()
+    with conn:
+        return conn.execute(
+            "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?", (cutoff,)
+        ).rowcount
+
+
+def retry_delay(attempt: int) -> float:
+    return min(RETRY_MAX_S, RETRY_BASE_S * 2 ** (attempt - 1))
+
+
+# Runs one job: (task, request, user_id) -> (result, tool_trace). Raise to fail the attempt.
+Runner = Callable[[str, Dict, str], Awaitable[Tuple[str, List[str]]]]
+
+
+class JobQueue:
+    """Worker pool that runs queued jobs and tells subscribers when they change"""
+
+    def __init__(self, workers: int = WORKERS, poll_s: float = POLL_S):
+        self.workers = workers
+        self.poll_s = poll_s
+        self._runner: Optional[Runner] = None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        # job id -> attempt, for the jobs this process is running
+        self._running: Dict[str, int] = {}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    async def start(self, runner: Runner) -> None:
+        self._runner = runner
+        await run_db(init_db)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._clean_up()))
+
+    async def stop(self) -> None:
+        """Stop the workers and put the jobs they were running back in the queue"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job_id, attempt in list(self._running.items()):
+            await run_db(requeue_job, job_id, attempt, 0, None, refund=True)
+        self._running.clear()
+
+    async def submit(self, user_id: str, task: str, request: Dict) -> Dict:
+        """Queue a job and wake an idle worker; raises TooManyJobs"""
+        job = await run_db(create_job, user_id, task, request)
+        self._wakeup.set()
+        return job
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(job_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[job_id]
+
+    def _publish(self, job: Optional[Dict]) -> None:
+        if job is None:
+            return
+        for queue in self._subscribers.get(job["id"], ()):
+            queue.put_nowait(job)
+
+    async def _work(self) -> None:
+        while True:
+            # Cleared before claiming, so a job submitted during the claim still wakes this worker
+            self._wakeup.clear()
+            try:
+                row = await run_db(claim_job)
+            except Exception:
+                logger.exception("Failed to claim a job")
+                row = None
+            if row is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_s)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(row)
+
+    async def _run(self, row: sqlite3.Row) -> None:
+        job_id, attempt, task = row["id"], row["attempts"], row["task"]
+        self._running[job_id] = attempt
+        self._publish(_public(row))
+        heartbeat = asyncio.create_task(self._renew(job_id, attempt))
+        try:
+            result, tool_trace = await self._runner(task, json.loads(row["request"]), row["user_id"])
+        except asyncio.CancelledError:
+            # stop() requeues the job
+            heartbeat.cancel()
+            raise
+        except Exception as e:
+            heartbeat.cancel()
+            del self._running[job_id]
+            error = str(e) or type(e).__name__
+            if attempt < MAX_ATTEMPTS:
+                logger.warning("Job %s attempt %d failed (%s); retrying", job_id, attempt, error)
+                metrics.JOBS.inc(task, "retried")
+                self._publish(await run_db(requeue_job, job_id, attempt, retry_delay(attempt), error))
+            else:
+                logger.warning("Job %s failed after %d attempts: %s", job_id, attempt, error)
+                metrics.JOBS.inc(task, "failed")
+                self._publish(await run_db(finish_job, job_id, attempt, "failed", None, error, []))
+            return
+        heartbeat.cancel()
+        del self._running[job_id]
+        metrics.JOBS.inc(task, "succeeded")
+        self._publish(await run_db(finish_job, job_id, attempt, "succeeded", result, None, tool_trace))
+
+    async def _renew(self, job_id: str, attempt: int) -> None:
+        while True:
+            await asyncio.sleep(LEASE_S / 3)
+            try:
+                if not await run_db(renew_lease, job_id, attempt):
+                    logger.warning("Job %s attempt %d lost its lease", job_id, attempt)
+                    return
+            except Exception:
+                logger.exception("Failed to renew the lease of job %s", job_id)
+
+    async def _clean_up(self) -> None:
+        while True:
+            try:
+                deleted = await run_db(delete_finished)
+                if deleted:
+                    logger.info("Deleted %d finished jobs", deleted)
+            except Exception:
+                logger.exception("Failed to delete finished jobs")
+            await asyncio.sleep(CLEANUP_INTERVAL_S)
+
+
+_queue: Optional[JobQueue] = None
+
+
+def get_queue() -> JobQueue:
+    global _queue
+    if _queue is None:
+        _queue = JobQueue()
+    return _queue
+
+
+def close_db() -> None:
+    """Stop the DB thread pool; connections are reopened on next use"""
+    global _executor, _generation
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+    _generation += 1
@@ -0,0 +1,125 @@
+"""
+In-process verification of the access tokens issued by auth.py.
+
+main.py resolves the caller through current_user_id instead of calling the
+auth service. Verified tokens are kept in a bounded LRU cache until their own
+exp, so a client reusing its token pays for the signature check once.
+
+A token that is sent but does not verify is always a 401. Requests with no
+token act as default_user, or get a 401 with JWT_AUTH_REQUIRED. The legacy
+user_id query parameter is honoured only with ALLOW_USER_ID_PARAM, which is
+meant for local development: it lets any caller act as any user.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import jwt
+from fastapi import Depends, Header, HTTPException, Query
+import metrics
+
+# Shared with auth.py, which signs the tokens
+SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
+ALGORITHM = "HS256"
+
+JWT_AUTH_REQUIRED = os.getenv("JWT_AUTH_REQUIRED", "false").lower() in ("1", "true", "yes")
+# Dev only: trust ?user_id= from callers that send no token
+ALLOW_USER_ID_PARAM = os.getenv("ALLOW_USER_ID_PARAM", "false").lower() in ("1", "true", "yes")
+# Verified tokens remembered at most; least recently used dropped first. 0 disables the cache.
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+
+DEFAULT_USER_ID = "default_user"
+
+# token -> (exp as a unix timestamp, claims)
+_cache: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+
+
+def decode_token(token: str) -> Dict:
+    """
+    Return the claims of a valid token, verifying its signature only on a cache miss.
+    Raises jwt.InvalidTokenError for a bad or expired token.
+    """
+    entry = _cache.get(token)
+    if entry is not None:
+        expires_at, claims = entry
+        if time.time() < expires_at:
+            _cache.move_to_end(token)
+            metrics.JWT_VERIFICATIONS.inc("cache_hit")
+            return claims
+        del _cache[token]
+        metrics.JWT_VERIFICATIONS.inc("expired")
+        raise jwt.ExpiredSignatureError("Signature has expired")
+
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        metrics.JWT_VERIFICATIONS.inc("expired")
+        raise
+    except jwt.InvalidTokenError:
+        metrics.JWT_VERIFICATIONS.inc("invalid")
+        raise
+    metrics.JWT_VERIFICATIONS.inc("verified")
+
+    # Only tokens that expire are cached; auth.py always sets exp
+    exp = claims.get("exp")
+    if JWT_CACHE_SIZE > 0 and isinstance(exp, (int, float)):
+        _cache[token] = (float(exp), claims)
+        if len(_cache) > JWT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return claims
+
+
+def clear_cache() -> None:
+    _cache.clear()
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+async def token_subject(
+    authorization: Optional[str] = Header(None),
+    access_token: Optional[str] = Query(None, description="For EventSource, which cannot send headers"),
+) -> Optional[str]:
+    """The sub claim of the caller's token, None when none is sent, 401 when it does not verify"""
+    token = access_token
+    if authorization and authorization.startswith("Bearer "):
+        token = authorization[len("Bearer "):]
+    if not token:
+        if JWT_AUTH_REQUIRED:
+            raise _unauthorized("Missing bearer token")
+        return None
+    try:
+        subject = decode_token(token).get("sub")
+    except jwt.InvalidTokenError:
+        raise _unauthorized("Invalid token")
+    if not subject:
+        raise _unauthorized("Token has no subject")
+    return subject
+
+
+def _dev_user_id(user_id: Optional[str]) -> Optional[str]:
+    return user_id if ALLOW_USER_ID_PARAM and user_id else None
+
+
+async def current_user_id(
+    user_id: Optional[str] = Query(None, description="Dev only (ALLOW_USER_ID_PARAM), when no token is sent"),
+    subject: Optional[str] = Depends(token_subject),
+) -> str:
+    """The verified token subject, else default_user (or user_id with ALLOW_USER_ID_PARAM)"""
+    return subject or _dev_user_id(user_id) or DEFAULT_USER_ID
+
+
+async def optional_user_id(
+    user_id: Optional[str] = Query(None, description="Dev only (ALLOW_USER_ID_PARAM), when no token is sent"),
+    subject: Optional[str] = Depends(token_subject),
+) -> Optional[str]:
+    """Like current_user_id, but None for an anonymous caller"""
+    return subject or _dev_user_id(user_id)
+
+
+async def verified_user_id(subject: Optional[str] = Depends(token_subject)) -> str:
+    """The verified token subject, else 401 in every mode; for data that must never be shared"""
+    if not subject:
+        raise _unauthorized("Missing bearer token")
+    return subject
@@ -1,12 +1,42 @@
 import time
-from typing import List, Tuple, Optional
-from openai import OpenAI, OpenAIError
+from contextlib import asynccontextmanager
+from types import ModuleType
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterator, List, Tuple, Optional
+from cache import get_cache, make_key
+import faq_engine
+from conversations import estimate_messages_tokens
+from llm_backends import Backend, get_pool
+from llm_scheduler import AdmissionRejected, get_scheduler, task_priority
+import metrics
 from models import Message, Settings
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
 SYSTEM_PROMPT = """You are a concise, helpful AI assistant for recruiters. \
 Keep replies to 1-3 short paragraphs. If asked for steps, keep them concise. \
 When explaining technical topics, use approachable language."""
 
+RECRUITER_MODE_PROMPT = "You are in recruiter mode: keep it outcome-focused and non-technical."
+
+OFFLINE_REPLY = (
+    "(Offline demo) I understood your request. I can summarize, set reminders, "
+    "or explain topics simply. Ask me about scheduling an interview or clarifying a concept."
+)
+
+ERROR_REPLY = (
+    "LLM unavailable right now. Here's a quick fallback: "
+    "I can summarize requests, draft outreach, and answer tech questions in plain language."
+)
+
+BUSY_REPLY = (
+    "I'm handling a lot of requests right now. Please try again in a moment."
+)
+
+QUOTA_REPLY = (
+    "You're sending messages faster than I can answer. Please wait a few seconds and try again."
+)
+
 TASK_PROMPTS = {
     "mock_interview": (
         "You are conducting a mock interview. Ask one question at a time, wait for an answer, then provide brief feedback (2-3 bullets) and the next question. Maintain a professional tone."
@@ -22,6 +52,167 @@ TASK_PROMPTS = {
     ),
 }
 
+# One client (and HTTP connection pool) per backend, reused across requests
+_clients: Dict[Tuple[Optional[str], Optional[str]], "AsyncOpenAI"] = {}
+
+
+def _openai() -> ModuleType:
+    """
+    The OpenAI SDK, imported on first use: it is the slowest import in the
+    service and unused when no API key is set. Except clauses name
+    _openai().OpenAIError, which is only evaluated once an exception is raised,
+    by which point get_client has imported the SDK.
+    """
+    import openai
+
+    return openai
+
+
+def get_client(settings: Settings, backend: Optional[Backend] = None) -> "AsyncOpenAI":
+    """Return the shared async client for a backend (the primary by default), creating it on first use"""
+    if backend is None:
+        key = (settings.openai_api_key, settings.openai_base_url)
+    else:
+        key = (backend.api_key, backend.base_url)
+    client = _clients.get(key)
+    if client is None:
+        import httpx
+
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_keepalive_connections,
+                keepalive_expiry=settings.llm_keepalive_expiry_s,
+            ),
+            timeout=httpx.Timeout(settings.llm_timeout_s, connect=settings.llm_connect_timeout_s),
+        )
+        client = _clients[key] = _openai().AsyncOpenAI(
+            api_key=key[0],
+            base_url=key[1],
+            max_retries=settings.llm_max_retries,
+            http_client=http_client,
+        )
+    return client
+
+
+@asynccontextmanager
+async def _llm_slot(
+    settings: Settings,
+    task: Optional[str],
+    user_id: Optional[str],
+    stage_ms: Dict[str, float],
+):
+    """
+    Hold one of the llm_max_concurrency slots, admitted by the scheduler.
+    Raises AdmissionRejected when the call is shed; queue time goes to stage_ms["queue"].
+    """
+    scheduler = get_scheduler(settings)
+    try:
+        queue_ms = await scheduler.acquire(task_priority(task), user_id)
+    except AdmissionRejected as e:
+        stage_ms["queue"] = e.waited_ms
+        metrics.STAGE_LATENCY.observe(e.waited_ms, "llm_queue")
+        raise
+    stage_ms["queue"] = queue_ms
+    metrics.STAGE_LATENCY.observe(queue_ms, "llm_queue")
+    try:
+        yield
+    finally:
+        scheduler.release()
+
+
+def _shed_reply(e: AdmissionRejected, tool_trace: List[str]) -> str:
+    tool_trace.append(f"llm:shed={e.reason}")
+    if e.reason != "evicted":  # the scheduler counts evictions itself
+        metrics.LLM_SHED.inc(e.reason)
+    return QUOTA_REPLY if e.reason == "quota" else BUSY_REPLY
+
+
+def _fallback(text: str, canned: str, tool_trace: List[str]) -> str:
+    """A close FAQ answer when there is one, else the canned reply"""
+    match = faq_engine.answer(text, faq_engine.FALLBACK_MIN_SCORE)
+    if match is None:
+        return canned
+    tool_trace.append(f"faq:id={match.id}")
+    tool_trace.append(f"faq:score={match.score:.2f}")
+    return match.answer
+
+
+def warm_up(settings: Settings) -> None:
+    """Import the SDK and build the shared clients ahead of the first request"""
+    if settings.openai_api_key:
+        for backend in get_pool(settings).backends:
+            get_client(settings, backend)
+
+
+async def close_client() -> None:
+    """Close the shared clients and their connection pools"""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.close()
+
+
+def build_messages(
+    text: str,
+    history: List[Message],
+    recruiter_mode: bool,
+    task: Optional[str] = None,
+    summary: Optional[str] = None,
+) -> List[Dict[str, str]]:
+    msgs = [{"role": "system", "content": SYSTEM_PROMPT}]
+    if task and task in TASK_PROMPTS:
+        msgs.append({"role": "system", "content": TASK_PROMPTS[task]})
+    if summary:
+        msgs.append({"role": "system", "content": f"Summary of earlier conversation:\n{summary}"})
+    for m in history:
+        msgs.append({"role": m.role, "content": m.content})
+    msgs.append({"role": "user", "content": text})
+
+    if recruiter_mode:
+        msgs.append({"role": "system", "content": RECRUITER_MODE_PROMPT})
+    return msgs
+
+
+async def _store_reply(
+    settings: Settings, cache_key: Optional[str], reply: str, backend: Backend, tool_trace: List[str]
+) -> None:
+    """
+    Cache a reply. Keys name the primary model, so a reply from a fallback
+    backend with another model is not cached.
+    """
+    if not cache_key or not reply:
+        return
+    if backend.model != settings.model_name:
+        tool_trace.append("cache:skip=model")
+        metrics.CACHE_OUTCOMES.inc("skip")
+        return
+    await get_cache(settings).store(cache_key, reply)
+
+
+def _cache_key(
+    text: str,
+    history: List[Message],
+    recruiter_mode: bool,
+    settings: Settings,
+    task: Optional[str],
+    use_cache: bool,
+    tool_trace: List[str],
+    summary: Optional[str] = None,
+) -> Optional[str]:
+    """Return the cache key for this prompt, or None when the cache should not be used"""
+    if not settings.response_cache_enabled:
+        return None
+    if not use_cache:
+        tool_trace.append("cache:bypass")
+        metrics.CACHE_OUTCOMES.inc("bypass")
+        return None
+    if summary or len(history) > settings.response_cache_max_history:
+        tool_trace.append("cache:skip=history")
+        metrics.CACHE_OUTCOMES.inc("skip")
+        return None
+    return make_key(text, history, recruiter_mode, task, settings.model_name)
+
 
 async def generate_reply(
     text: str,
@@ -29,49 +220,166 @@ async def generate_reply(
     recruiter_mode: bool,
     settings: Settings,
     task: Optional[str] = None,
+    use_cache: bool = True,
+    summary: Optional[str] = None,
+    user_id: Optional[str] = None,
+    stage_ms: Optional[Dict[str, float]] = None,
 ) -> Tuple[str, int, List[str]]:
+    """
+    Return (reply, llm_ms, tool_trace). user_id is the admission quota key;
+    time spent queued for a slot is reported in stage_ms["queue"], not llm_ms.
+    """
     start = time.perf_counter()
     tool_trace: List[str] = []
+    stage_ms = {} if stage_ms is None else stage_ms
     model_used = "fallback"
 
     if settings.openai_api_key:
-        client = OpenAI(api_key=settings.openai_api_key)
-        msgs = [{"role": "system", "content": SYSTEM_PROMPT}]
-        if task and task in TASK_PROMPTS:
-            msgs.append({"role": "system", "content": TASK_PROMPTS[task]})
-        for m in history:
-            msgs.append({"role": m.role, "content": m.content})
-        msgs.append({"role": "user", "content": text})
+        cache_key = _cache_key(text, history, recruiter_mode, settings, task, use_cache, tool_trace, summary)
+        if cache_key:
+            cached, tier = await get_cache(settings).lookup(cache_key)
+            if cached is not None:
+                tool_trace.append(f"cache:hit={tier}")
+                metrics.CACHE_OUTCOMES.inc(f"hit_{tier}")
+                llm_ms = int((time.perf_counter() - start) * 1000)
+                tool_trace.append(f"latency_llm_ms={llm_ms}")
+                tool_trace.append(f"model_used={settings.model_name}")
+                return cached, llm_ms, tool_trace
+            tool_trace.append("cache:miss")
+            metrics.CACHE_OUTCOMES.inc("miss")
 
-        if recruiter_mode:
-            msgs.append({"role": "system", "content": "You are in recruiter mode: keep it outcome-focused and non-technical."})
+        msgs = build_messages(text, history, recruiter_mode, task, summary)
+        tool_trace.append(f"prompt_tokens={estimate_messages_tokens(msgs)}")
 
-        try:
-            resp = client.chat.completions.create(
-                model=settings.model_name,
+        async def complete(backend: Backend):
+            return await get_client(settings, backend).chat.completions.create(
+                model=backend.model,
                 messages=msgs,
                 max_tokens=settings.max_tokens,
                 temperature=0.6,
+                timeout=settings.llm_timeout_s,
             )
+
+        try:
+            # The first request uses the admission slot; a hedge needs a free slot of its own
+            scheduler = get_scheduler(settings)
+            async with _llm_slot(settings, task, user_id, stage_ms):
+                backend, resp = await get_pool(settings).call(
+                    complete, tool_trace, scheduler.try_acquire, scheduler.release
+                )
             reply = resp.choices[0].message.content or ""
-            model_used = settings.model_name
+            model_used = backend.model
             tool_trace.append(f"llm:model={model_used}")
             if task:
                 tool_trace.append(f"task={task}")
-        except OpenAIError as e:
-            reply = (
-                "LLM unavailable right now. Here's a quick fallback: "
-                "I can summarize requests, draft outreach, and answer tech questions in plain language."
-            )
+            await _store_reply(settings, cache_key, reply.strip(), backend, tool_trace)
+        except AdmissionRejected as e:
+            reply = _fallback(text, _shed_reply(e, tool_trace), tool_trace)
+        except _openai().OpenAIError as e:
+            reply = _fallback(text, ERROR_REPLY, tool_trace)
             tool_trace.append(f"llm:error={type(e).__name__}")
+            metrics.LLM_ERRORS.inc(type(e).__name__)
     else:
-        reply = (
-            "(Offline demo) I understood your request. I can summarize, set reminders, "
-            "or explain topics simply. Ask me about scheduling an interview or clarifying a concept."
-        )
         tool_trace.append("llm:fallback=offline")
+        reply = _fallback(text, OFFLINE_REPLY, tool_trace)
 
-    llm_ms = int((time.perf_counter() - start) * 1000)
+    llm_ms = int((time.perf_counter() - start) * 1000 - stage_ms.get("queue", 0))
     tool_trace.append(f"latency_llm_ms={llm_ms}")
     tool_trace.append(f"model_used={model_used}")
     return reply.strip(), llm_ms, tool_trace
+
+
+def _chunk_words(reply: str) -> Iterator[str]:
+    """Split a canned reply into word-sized deltas so fallbacks stream like the model"""
+    words = reply.split(" ")
+    for i, word in enumerate(words):
+        yield word if i == 0 else " " + word
+
+
+async def stream_reply(
+    text: str,
+    history: List[Message],
+    recruiter_mode: bool,
+    settings: Settings,
+    tool_trace: List[str],
+    task: Optional[str] = None,
+    use_cache: bool = True,
+    summary: Optional[str] = None,
+    user_id: Optional[str] = None,
+    stage_ms: Optional[Dict[str, float]] = None,
+) -> AsyncIterator[str]:
+    """
+    Yield reply text deltas as the model produces them.
+    Trace entries are appended to tool_trace as the stream progresses.
+    """
+    start = time.perf_counter()
+    stage_ms = {} if stage_ms is None else stage_ms
+    model_used = "fallback"
+
+    if settings.openai_api_key:
+        cache_key = _cache_key(text, history, recruiter_mode, settings, task, use_cache, tool_trace, summary)
+        if cache_key:
+            cached, tier = await get_cache(settings).lookup(cache_key)
+            if cached is not None:
+                tool_trace.append(f"cache:hit={tier}")
+                metrics.CACHE_OUTCOMES.inc(f"hit_{tier}")
+                yield cached
+                llm_ms = int((time.perf_counter() - start) * 1000)
+                tool_trace.append(f"latency_llm_ms={llm_ms}")
+                tool_trace.append(f"model_used={settings.model_name}")
+                return
+            tool_trace.append("cache:miss")
+            metrics.CACHE_OUTCOMES.inc("miss")
+
+        # Streams are not hedged: they go to the first healthy backend
+        pool = get_pool(settings)
+        backend = pool.candidates(tool_trace)[0]
+        client = get_client(settings, backend)
+        msgs = build_messages(text, history, recruiter_mode, task, summary)
+        tool_trace.append(f"prompt_tokens={estimate_messages_tokens(msgs)}")
+        emitted = False
+        parts: List[str] = []
+
+        try:
+            async with _llm_slot(settings, task, user_id, stage_ms):
+                stream = await client.chat.completions.create(
+                    model=backend.model,
+                    messages=msgs,
+                    max_tokens=settings.max_tokens,
+                    temperature=0.6,
+                    timeout=settings.llm_timeout_s,
+                    stream=True,
+                )
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        emitted = True
+                        parts.append(delta)
+                        yield delta
+            pool.record_success(backend)
+            model_used = backend.model
+            tool_trace.append(f"llm:backend={backend.name}")
+            tool_trace.append(f"llm:model={model_used}")
+            if task:
+                tool_trace.append(f"task={task}")
+            await _store_reply(settings, cache_key, "".join(parts).strip(), backend, tool_trace)
+        except AdmissionRejected as e:
+            for delta in _chunk_words(_fallback(text, _shed_reply(e, tool_trace), tool_trace)):
+                yield delta
+        except _openai().OpenAIError as e:
+            pool.record_failure(backend)
+            tool_trace.append(f"llm:error={type(e).__name__}")
+            metrics.LLM_ERRORS.inc(type(e).__name__)
+            if not emitted:
+                for delta in _chunk_words(_fallback(text, ERROR_REPLY, tool_trace)):
+                    yield delta
+    else:
+        tool_trace.append("llm:fallback=offline")
+        for delta in _chunk_words(_fallback(text, OFFLINE_REPLY, tool_trace)):
+            yield delta
+
+    llm_ms = int((time.perf_counter() - start) * 1000 - stage_ms.get("queue", 0))
+    tool_trace.append(f"latency_llm_ms={llm_ms}")
+    tool_trace.append(f"model_used={model_used}")
@@ -0,0 +1,220 @@
+"""
+Ordered OpenAI-compatible providers with hedged requests.
+
+The primary backend is openai_api_key / openai_base_url / model_name, followed
+by the llm_backends fallbacks. A reply is requested from the first healthy
+backend; if it has not answered within llm_hedge_percentile of that backend's
+recent latencies, the same request also goes to the next one. The first
+successful answer wins and the rest are cancelled. An error fails over to the
+next backend at once, without waiting for the hedge delay. A hedge is a second
+provider call in flight, so it needs a concurrency slot of its own; when none
+is free, the call waits on the backends it already has.
+
+A backend that fails llm_backend_failure_threshold times in a row is skipped
+for llm_backend_cooldown_s. It then gets traffic again, and a single further
+failure takes it out for another cooldown.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+import metrics
+from models import Settings
+
+T = TypeVar("T")
+
+PRIMARY = "primary"
+
+# Recent latencies kept per backend for the hedge percentile
+LATENCY_WINDOW = 200
+# Samples needed before the percentile replaces llm_hedge_initial_delay_ms
+MIN_LATENCY_SAMPLES = 20
+
+
+class Backend:
+    def __init__(self, name: str, base_url: Optional[str], api_key: Optional[str], model: str):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.latencies_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.failures = 0
+        self.down_until = 0.0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.down_until
+
+
+class BackendPool:
+    def __init__(
+        self,
+        backends: List[Backend],
+        hedge_percentile: float,
+        initial_delay_ms: float,
+        min_delay_ms: float,
+        failure_threshold: int,
+        cooldown_s: float,
+    ):
+        self.backends = backends
+        self.hedge_percentile = hedge_percentile
+        self.initial_delay_ms = initial_delay_ms
+        self.min_delay_ms = min_delay_ms
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        for backend in backends:
+            metrics.LLM_BACKEND_HEALTHY.set(1, backend.name)
+
+    def candidates(self, tool_trace: List[str]) -> List[Backend]:
+        """Healthy backends in order; every backend when none is healthy"""
+        now = time.monotonic()
+        healthy = []
+        for backend in self.backends:
+            if backend.healthy(now):
+                healthy.append(backend)
+            else:
+                tool_trace.append(f"llm:skip={backend.name}")
+        # With all of them marked down, trying them beats failing without a call
+        return healthy or list(self.backends)
+
+    def hedge_delay_ms(self, backend: Backend) -> float:
+        samples = backend.latencies_ms
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return self.initial_delay_ms
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))
+        return max(self.min_delay_ms, ordered[index])
+
+    def record_success(self, backend: Backend, latency_ms: Optional[float] = None) -> None:
+        if latency_ms is not None:
+            backend.latencies_ms.append(latency_ms)
+        if backend.failures:
+            backend.failures = 0
+            backend.down_until = 0.0
+            metrics.LLM_BACKEND_HEALTHY.set(1, backend.name)
+
+    def record_failure(self, backend: Backend) -> None:
+        backend.failures += 1
+        if backend.failures >= self.failure_threshold:
+            backend.down_until = time.monotonic() + self.cooldown_s
+            metrics.LLM_BACKEND_HEALTHY.set(0, backend.name)
+
+    async def call(
+        self,
+        request: Callable[[Backend], Awaitable[T]],
+        tool_trace: List[str],
+        acquire_slot: Optional[Callable[[], bool]] = None,
+        release_slot: Optional[Callable[[], None]] = None,
+    ) -> Tuple[Backend, T]:
+        """
+        Run request against the backends, hedging and failing over as described above.
+        Returns the winning backend (its name and model) and its result; raises the
+        last error if every backend fails. The caller holds one slot for the first
+        request; acquire_slot takes one more for each hedge without waiting, and
+        release_slot gives it back once fewer requests are in flight.
+        """
+        candidates = self.candidates(tool_trace)
+        # task -> (backend, perf_counter at launch)
+        running: Dict[asyncio.Future, Tuple[Backend, float]] = {}
+        launched = 0
+        # Slots taken for hedges, on top of the caller's
+        extra_slots = 0
+        can_hedge = True
+
+        def release_extra() -> None:
+            nonlocal extra_slots
+            while extra_slots and len(running) < 1 + extra_slots:
+                extra_slots -= 1
+                if release_slot is not None:
+                    release_slot()
+
+        def launch() -> Tuple[Backend, float]:
+            nonlocal launched
+            backend = candidates[launched]
+            launched += 1
+            started = time.perf_counter()
+            running[asyncio.ensure_future(request(backend))] = (backend, started)
+            return backend, started
+
+        latest, latest_start = launch()
+        error: Optional[BaseException] = None
+        try:
+            while running:
+                timeout = None
+                if can_hedge and launched < len(candidates):
+                    hedge_ms = self.hedge_delay_ms(latest)
+                    timeout = max(0.0, hedge_ms / 1000 - (time.perf_counter() - latest_start))
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    if acquire_slot is not None and not acquire_slot():
+                        tool_trace.append("llm:hedge_skipped=busy")
+                        can_hedge = False
+                        continue
+                    extra_slots += 1
+                    tool_trace.append(f"llm:hedge_delay_ms={int(hedge_ms)}")
+                    metrics.LLM_HEDGES.inc(latest.name)
+                    latest, latest_start = launch()
+                    continue
+
+                winner: Optional[Tuple[Backend, T]] = None
+                for task in done:
+                    backend, started = running.pop(task)
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    if task.exception() is not None:
+                        error = task.exception()
+                        self.record_failure(backend)
+                        metrics.LLM_BACKEND_CALLS.inc(backend.name, "error")
+                        tool_trace.append(f"llm:backend_error={backend.name}:{type(error).__name__}")
+                        continue
+                    self.record_success(backend, elapsed_ms)
+                    if winner is None:
+                        winner = (backend, task.result())
+                        metrics.LLM_BACKEND_CALLS.inc(backend.name, "won")
+                    else:
+                        metrics.LLM_BACKEND_CALLS.inc(backend.name, "lost")
+                if winner is not None:
+                    tool_trace.append(f"llm:backend={winner[0].name}")
+                    return winner
+
+                release_extra()
+                if not running and launched < len(candidates):
+                    latest, latest_start = launch()
+                    can_hedge = True
+            raise error
+        finally:
+            for task, (backend, started) in running.items():
+                task.cancel()
+                # A lower bound on the loser's latency, so a slow backend's tail stays in its window
+                backend.latencies_ms.append((time.perf_counter() - started) * 1000)
+                metrics.LLM_BACKEND_CALLS.inc(backend.name, "lost")
+            running.clear()
+            release_extra()
+
+
+_pool: Optional[BackendPool] = None
+
+
+def get_pool(settings: Settings) -> BackendPool:
+    """Return the process-wide backend pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        backends = [Backend(PRIMARY, settings.openai_base_url, settings.openai_api_key, settings.model_name)]
+        for extra in settings.llm_backends:
+            backends.append(
+                Backend(
+                    extra.name,
+                    extra.base_url or settings.openai_base_url,
+                    extra.api_key or settings.openai_api_key,
+                    extra.model or settings.model_name,
+                )
+            )
+        _pool = BackendPool(
+            backends,
+            settings.llm_hedge_percentile,
+            settings.llm_hedge_initial_delay_ms,
+            settings.llm_hedge_min_delay_ms,
+            settings.llm_backend_failure_threshold,
+            settings.llm_backend_cooldown_s,
+        )
+    return _pool
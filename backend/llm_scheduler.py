@@ -0,0 +1,164 @@
+"""
+Admission control in front of the LLM provider.
+
+Every model call takes a slot from a global concurrency limit. When all slots
+are busy, calls wait in a bounded priority queue, so quick chat turns are
+served before long generations (cover letters, resume reviews). Each user
+draws from a token bucket, so one client cannot use up the provider's rate
+limit. Calls that cannot be served soon are rejected immediately with
+AdmissionRejected, so the caller can answer with a fast fallback instead of
+timing out.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import metrics
+from models import Settings
+
+# Lower value is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_STANDARD = 1
+PRIORITY_BULK = 2
+
+TASK_PRIORITIES = {
+    None: PRIORITY_INTERACTIVE,
+    "mock_interview": PRIORITY_INTERACTIVE,
+    "message_templates": PRIORITY_STANDARD,
+    "cover_letter": PRIORITY_BULK,
+    "resume_review": PRIORITY_BULK,
+}
+
+# Token buckets kept for at most this many users, least recently seen dropped first
+MAX_TRACKED_USERS = 10_000
+
+
+def task_priority(task: Optional[str]) -> int:
+    return TASK_PRIORITIES.get(task, PRIORITY_STANDARD)
+
+
+class AdmissionRejected(Exception):
+    """Raised instead of queueing; reason is quota, queue_full, evicted or queue_timeout"""
+
+    def __init__(self, reason: str, waited_ms: float = 0.0):
+        super().__init__(reason)
+        self.reason = reason
+        self.waited_ms = waited_ms
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int,
+        max_wait_s: float,
+        user_rate_per_min: float,
+        user_burst: int,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait_s = max_wait_s
+        self.user_rate_per_s = user_rate_per_min / 60
+        self.user_burst = user_burst
+        self.active = 0
+        self.queued = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        # user -> [tokens, last refill time]
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def _take_token(self, user_key: str) -> bool:
+        if self.user_burst <= 0:
+            return True
+        now = time.monotonic()
+        bucket = self._buckets.get(user_key)
+        if bucket is None:
+            bucket = self._buckets[user_key] = [float(self.user_burst), now]
+            if len(self._buckets) > MAX_TRACKED_USERS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_key)
+            bucket[0] = min(self.user_burst, bucket[0] + (now - bucket[1]) * self.user_rate_per_s)
+            bucket[1] = now
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    def _make_room(self, priority: int) -> None:
+        """With the queue full, evict the newest waiter of a lower priority, or reject this call"""
+        live = [entry for entry in self._waiters if not entry[2].done()]
+        worst = max(live, key=lambda entry: (entry[0], entry[1]), default=None)
+        if worst is None or worst[0] <= priority:
+            raise AdmissionRejected("queue_full")
+        worst[2].set_exception(AdmissionRejected("evicted"))
+        self.queued -= 1
+        metrics.LLM_SHED.inc("evicted")
+
+    async def acquire(self, priority: int, user_key: Optional[str]) -> float:
+        """Wait for a slot; returns the milliseconds spent queued"""
+        if user_key is not None and not self._take_token(user_key):
+            raise AdmissionRejected("quota")
+        if self.active < self.max_concurrency and self.queued == 0:
+            self.active += 1
+            return 0.0
+        if self.queued >= self.max_queue:
+            self._make_room(priority)
+
+        start = time.perf_counter()
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        self.queued += 1
+        try:
+            # release() hands its slot over by resolving the future
+            await asyncio.wait_for(fut, self.max_wait_s)
+        except asyncio.TimeoutError:
+            self.queued -= 1
+            raise AdmissionRejected("queue_timeout", (time.perf_counter() - start) * 1000) from None
+        except AdmissionRejected as e:
+            e.waited_ms = (time.perf_counter() - start) * 1000
+            raise
+        except asyncio.CancelledError:
+            if fut.cancelled():
+                self.queued -= 1
+            elif fut.exception() is None:
+                self.release()  # the slot was handed over just as the caller went away
+            raise
+        return (time.perf_counter() - start) * 1000
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free right now, without queueing or charging a quota token"""
+        if self.active < self.max_concurrency and self.queued == 0:
+            self.active += 1
+            return True
+        return False
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                self.queued -= 1
+                fut.set_result(None)
+                return
+        self.active -= 1
+
+
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_scheduler(settings: Settings) -> LLMScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler(
+            settings.llm_max_concurrency,
+            settings.llm_max_queue,
+            settings.llm_max_queue_wait_s,
+            settings.llm_user_rate_per_min,
+            settings.llm_user_burst,
+        )
+        metrics.LLM_IN_FLIGHT.set_function(lambda: _scheduler.active)
+        metrics.LLM_QUEUE_DEPTH.set_function(lambda: _scheduler.queued)
+    return _scheduler
@@ -1,19 +1,52 @@
+import asyncio
+import base64
+import json
+import re
 import time
-from typing import List
-from fastapi import FastAPI, HTTPException, Header
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from fastapi import Depends, FastAPI, HTTPException, Header, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from models import RespondRequest, RespondResponse, Settings, Latency, Reminder, CreateReminderRequest
-from nlu import run_nlu
-from llm import generate_reply
+from fastapi.responses import StreamingResponse
+from models import (
+    RespondRequest, RespondResponse, Settings, Latency, Reminder, CreateReminderRequest,
+    CreateRemindersRequest, ReminderIdsRequest, BatchReminderResult, ConversationSummary, ConversationMessage,
+    SearchHit, AppendMessagesRequest, JobRequest, Job,
+)
+from conversations import CompactedHistory, Conversation, compact_history, get_store
+from nlu import run_nlu, warm_up as warm_up_nlu
+from cache import get_cache
+from coldstart import StartupProfile
+from jwt_auth import DEFAULT_USER_ID, current_user_id, optional_user_id, token_subject, verified_user_id
+from llm import TASK_PROMPTS, generate_reply, stream_reply, close_client, warm_up as warm_up_llm
 from reminders import (
-    create_reminder, get_reminders, get_due_reminders,
-    complete_reminder, delete_reminder
+    create_reminder, create_reminder_row, create_reminders, get_reminders, get_due_reminders, get_occurrences,
+    complete_reminder_rows, delete_reminder, delete_reminders, run_db, open_db, close_db
 )
-from time_parser import parse_natural_time
+import chat_archive
+import faq_engine
+import jobs
+import metrics
+import nlu_batch
+from reminder_scheduler import scheduler
+from router import LLM_ROUTE, RouteResult, register_route, route
+from recurrence import describe, parse_rule
+from time_parser import parse_recurrence, parse_time
 
 settings = Settings()
+profile = StartupProfile("main")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup()
+    yield
+    await shutdown()
 
-app = FastAPI(title="Talk to My AI", version="1.0.0")
+
+app = FastAPI(title="Talk to My AI", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,7 +54,62 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
+app.add_middleware(metrics.MetricsMiddleware, app_name="main")
+
+
+REMIND_PREFIX = re.compile(r"^\s*(?:please\s+)?(?:set\s+a\s+reminder\s+(?:to|for)|remind\s+me\s+(?:to|about)?)\s*", re.IGNORECASE)
+
+# Idle SSE connections get a comment line this often so proxies keep them open
+SSE_KEEPALIVE_S = 15
+
+MAX_PAGE_SIZE = 500
+# Widest window /api/reminders/occurrences will expand
+MAX_OCCURRENCE_WINDOW = timedelta(days=366)
+# Reminder list ETags embed this so versions from a previous process never match
+ETAG_EPOCH = uuid.uuid4().hex[:8]
+
+
+async def _start_reminders() -> None:
+    await open_db()
+    await scheduler.start()
+    metrics.REMINDERS_PENDING.set_function(lambda: scheduler.pending)
+
+
+async def _start_chat_archive() -> None:
+    await chat_archive.open_db()
+    metrics.CHAT_ARCHIVE_PENDING.set_function(lambda: chat_archive.get_writer().pending if chat_archive.get_writer() else 0)
+
+
+async def _start_jobs() -> None:
+    queue = jobs.get_queue()
+    await queue.start(_run_job)
+    metrics.JOBS_RUNNING.set_function(lambda: queue.running)
+
+
+async def startup():
+    """Warm everything the first request needs, concurrently"""
+    await profile.run({
+        "reminder_db": _start_reminders(),
+        "llm_client": asyncio.to_thread(warm_up_llm, settings),
+        "response_cache": asyncio.to_thread(get_cache, settings),
+        "nlu": asyncio.to_thread(warm_up_nlu),
+        "faq": asyncio.to_thread(faq_engine.load),
+        "chat_archive": _start_chat_archive(),
+        "jobs": _start_jobs(),
+    })
+
+
+async def shutdown():
+    # Jobs still running go back to the queue before the LLM client closes
+    await jobs.get_queue().stop()
+    jobs.close_db()
+    await scheduler.stop()
+    await close_client()
+    close_db()
+    await chat_archive.close_db()
+    nlu_batch.shutdown()
 
 
 @app.get("/health")
@@ -29,8 +117,127 @@ async def health():
     return {"status": "ok", "model": settings.model_name, "llm": bool(settings.openai_api_key)}
 
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+async def _create_reminder_from_text(text: str, user_id: str) -> Tuple[Optional[int], Optional[str]]:
+    """Create a reminder from a reminder-intent message, returning its id and a confirmation"""
+    with metrics.STAGE_LATENCY.time("time_parse"):
+        recurring = parse_recurrence(text)
+        parsed = recurring or parse_time(text)
+    if not parsed:
+        return None, None
+    reminder_time = recurring.first if recurring else parsed.when
+    recurrence = str(recurring.rule) if recurring else None
+
+    # Title is the message without the time phrase and the "remind me" prefix
+    start, end = parsed.span
+    title = " ".join((text[:start] + text[end:]).split())
+    title = REMIND_PREFIX.sub("", title).strip() or text
+
+    reminder_id = await run_db(create_reminder, user_id, title, reminder_time, description=text, recurrence=recurrence)
+    _notify_created(reminder_id, user_id, reminder_time)
+    when = reminder_time.strftime('%B %d at %I:%M %p')
+    if recurring:
+        return reminder_id, f"✓ Reminder set {describe(recurring.rule)}, starting {when}: {title}"
+    return reminder_id, f"✓ Reminder set for {when}: {title}"
+
+
+async def _reminder_route(text: str, entities: Dict[str, str], user_id: str) -> Optional[RouteResult]:
+    reminder_id, confirmation = await _create_reminder_from_text(text, user_id)
+    if not reminder_id:
+        return None
+    return RouteResult("reminder", confirmation, reminder_id=reminder_id)
+
+
+register_route("reminder", _reminder_route)
+
+
+def _notify_created(reminder_id: int, user_id: str, reminder_time: datetime) -> None:
+    scheduler.schedule(reminder_id, user_id, reminder_time)
+    scheduler.publish(user_id, "changed", {"id": reminder_id, "action": "created"})
+
+
+def _notify_removed(reminder_id: int, user_id: str, action: str) -> None:
+    scheduler.cancel(reminder_id)
+    scheduler.publish(user_id, "changed", {"id": reminder_id, "action": action})
+
+
+def _build_tool_trace(
+    payload: RespondRequest,
+    nlu_trace: List[str],
+    llm_trace: List[str],
+    entities: Dict[str, str],
+    reminder_id: Optional[int],
+    route_name: str = LLM_ROUTE,
+) -> List[str]:
+    tool_trace = []
+    tool_trace.extend(nlu_trace)
+    tool_trace.append(f"route={route_name}")
+    tool_trace.extend(llm_trace)
+    tool_trace.append(f"recruiter_mode={payload.recruiter_mode}")
+    if payload.task:
+        tool_trace.append(f"task={payload.task}")
+    tool_trace.append(f"entities={entities}")
+    if reminder_id:
+        tool_trace.append(f"reminder_created={reminder_id}")
+    return tool_trace
+
+
+def _prepare_history(
+    payload: RespondRequest, owner: Optional[str]
+) -> Tuple[Optional[Conversation], CompactedHistory]:
+    """
+    Load the owner's server-side conversation (or the client's history) and fit it
+    into the token budget. Server-side history needs a verified owner: without one,
+    conversation_id is ignored, so anonymous callers never share a conversation.
+    """
+    budget = (settings.history_token_budget, settings.history_summary_tokens, settings.history_min_turns)
+    if payload.conversation_id and owner:
+        store = get_store(settings)
+        conversation = store.get_or_create(owner, payload.conversation_id, seed=payload.history)
+        return conversation, store.compact(conversation, *budget)
+    return None, compact_history(payload.history or [], "", *budget)
+
+
+def _ms_since(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
+
+
+def _record_stages(nlu_ms: float, router_ms: float, llm_ms: Optional[float]) -> None:
+    metrics.STAGE_LATENCY.observe(nlu_ms, "nlu")
+    metrics.STAGE_LATENCY.observe(router_ms, "router")
+    if llm_ms is not None:
+        metrics.STAGE_LATENCY.observe(llm_ms, "llm")
+
+
+def _quota_key(request: Request, user_id: Optional[str]) -> str:
+    """Key for the per-user LLM quota: the signed-in user, else the client address"""
+    if user_id:
+        return user_id
+    return f"ip:{request.client.host}" if request.client else "anonymous"
+
+
+def _record_counts(payload: RespondRequest, intent_label: str, route_name: str) -> None:
+    metrics.INTENTS.inc(intent_label)
+    metrics.TASKS.inc(payload.task or "none")
+    metrics.ROUTES.inc(route_name)
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @app.post("/api/respond", response_model=RespondResponse)
-async def respond(payload: RespondRequest):
+async def respond(
+    payload: RespondRequest,
+    request: Request,
+    user_id: Optional[str] = Depends(optional_user_id),
+    subject: Optional[str] = Depends(token_subject),
+):
     total_start = time.perf_counter()
 
     text = payload.text.strip()
@@ -40,107 +247,655 @@ async def respond(payload: RespondRequest):
     # NLU
     nlu_start = time.perf_counter()
     intent, entities, nlu_trace = run_nlu(text)
-    nlu_ms = int((time.perf_counter() - nlu_start) * 1000)
+    nlu_elapsed = _ms_since(nlu_start)
+
+    conversation, compacted = _prepare_history(payload, subject)
+
+    # Fast path: intents answered locally never reach the LLM
+    router_start = time.perf_counter()
+    routed = await route(text, intent, entities, task=payload.task, user_id=user_id or DEFAULT_USER_ID)
+    router_elapsed = _ms_since(router_start)
+
+    reminder_id = None
+    llm_elapsed = None
+    stage_ms: Dict[str, float] = {}
+    if routed:
+        reply, llm_ms, llm_trace = routed.reply, 0, routed.trace + [f"llm:skipped={routed.route}"]
+        reminder_id = routed.reminder_id
+    else:
+        llm_start = time.perf_counter()
+        reply, llm_ms, llm_trace = await generate_reply(
+            text,
+            compacted.history,
+            payload.recruiter_mode,
+            settings,
+            task=payload.task,
+            use_cache=not payload.bypass_cache,
+            summary=compacted.summary,
+            user_id=_quota_key(request, user_id),
+            stage_ms=stage_ms,
+        )
+        llm_elapsed = _ms_since(llm_start) - stage_ms.get("queue", 0)
+    route_name = routed.route if routed else LLM_ROUTE
+    if conversation:
+        get_store(settings).append(conversation, text, reply)
+        chat_archive.append_turn(conversation.user_id, conversation.id, text, reply)
+
+    total_ms = int((time.perf_counter() - total_start) * 1000)
+
+    tool_trace = _build_tool_trace(payload, nlu_trace, compacted.trace + llm_trace, entities, reminder_id, route_name)
+    latency = Latency(
+        nlu=int(nlu_elapsed), llm=llm_ms, total=total_ms, router=int(router_elapsed), route=route_name,
+        queue=int(stage_ms.get("queue", 0)),
+    )
+
+    # Serialize here rather than through response_model so the stage can be timed
+    with metrics.STAGE_LATENCY.time("serialization"):
+        body = RespondResponse(
+            reply=reply,
+            intent=intent,
+            entities=entities,
+            tool_trace=tool_trace,
+            latency_ms=latency,
+            reminder_id=reminder_id,
+            conversation_id=payload.conversation_id,
+        ).model_dump_json()
+    _record_stages(nlu_elapsed, router_elapsed, llm_elapsed)
+    _record_counts(payload, intent.label, route_name)
+    return Response(content=body, media_type="application/json")
+
+
+@app.post("/api/respond/stream")
+async def respond_stream(
+    payload: RespondRequest,
+    request: Request,
+    user_id: Optional[str] = Depends(optional_user_id),
+    subject: Optional[str] = Depends(token_subject),
+):
+    """
+    Server-Sent Events variant of /api/respond.
+    Emits an `nlu` event immediately, `token` events as the reply is generated,
+    and a final `done` event carrying latency and tool_trace.
+    """
+    total_start = time.perf_counter()
+
+    text = payload.text.strip()
+    if not text:
+        raise HTTPException(status_code=400, detail="Empty text provided")
+
+    async def events():
+        nlu_start = time.perf_counter()
+        intent, entities, nlu_trace = run_nlu(text)
+        nlu_elapsed = _ms_since(nlu_start)
+        yield _sse("nlu", {"intent": intent.model_dump(), "entities": entities})
+
+        reply_parts: List[str] = []
+        llm_trace: List[str] = []
+        first_token_ms = None
+        llm_ms = 0
+        llm_elapsed = None
+        stage_ms: Dict[str, float] = {}
+
+        conversation, compacted = _prepare_history(payload, subject)
+
+        # Fast path: intents answered locally never reach the LLM
+        router_start = time.perf_counter()
+        routed = await route(text, intent, entities, task=payload.task, user_id=user_id or DEFAULT_USER_ID)
+        router_elapsed = _ms_since(router_start)
+
+        reminder_id = None
+        if routed:
+            reminder_id = routed.reminder_id
+            llm_trace.extend(routed.trace)
+            llm_trace.append(f"llm:skipped={routed.route}")
+            first_token_ms = int((time.perf_counter() - total_start) * 1000)
+            reply_parts.append(routed.reply)
+            yield _sse("token", {"text": routed.reply})
+        else:
+            llm_start = time.perf_counter()
+            async for delta in stream_reply(
+                text,
+                compacted.history,
+                payload.recruiter_mode,
+                settings,
+                llm_trace,
+                task=payload.task,
+                use_cache=not payload.bypass_cache,
+                summary=compacted.summary,
+                user_id=_quota_key(request, user_id),
+                stage_ms=stage_ms,
+            ):
+                if first_token_ms is None:
+                    first_token_ms = int((time.perf_counter() - total_start) * 1000)
+                reply_parts.append(delta)
+                yield _sse("token", {"text": delta})
+            llm_elapsed = _ms_since(llm_start) - stage_ms.get("queue", 0)
+            llm_ms = int(llm_elapsed)
+        route_name = routed.route if routed else LLM_ROUTE
+        reply = "".join(reply_parts).strip()
+        if conversation:
+            get_store(settings).append(conversation, text, reply)
+            chat_archive.append_turn(conversation.user_id, conversation.id, text, reply)
+
+        total_ms = int((time.perf_counter() - total_start) * 1000)
+        tool_trace = _build_tool_trace(payload, nlu_trace, compacted.trace + llm_trace, entities, reminder_id, route_name)
+        latency = Latency(
+            nlu=int(nlu_elapsed), llm=llm_ms, total=total_ms, first_token=first_token_ms,
+            router=int(router_elapsed), route=route_name, queue=int(stage_ms.get("queue", 0)),
+        )
+
+        with metrics.STAGE_LATENCY.time("serialization"):
+            done = _sse("done", {
+                "reply": reply,
+                "tool_trace": tool_trace,
+                "latency_ms": latency.model_dump(),
+                "reminder_id": reminder_id,
+                "conversation_id": payload.conversation_id,
+            })
+        _record_stages(nlu_elapsed, router_elapsed, llm_elapsed)
+        _record_counts(payload, intent.label, route_name)
+        yield done
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/conversations", response_model=List[ConversationSummary])
+async def list_archived_conversations(
+    user_id: str = Depends(verified_user_id),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """The current user's archived conversations, most recently active first"""
+    before = _decode_key(cursor, (str, int))
+    rows = await chat_archive.run_db(chat_archive.list_conversations, user_id, limit + 1, before)
+    next_cursor = _encode_key([rows[limit - 1]["updated_at"], rows[limit - 1]["id"]]) if len(rows) > limit else None
+    return _json_page([{k: v for k, v in row.items() if k != "id"} for row in rows[:limit]], next_cursor)
+
 
-    # LLM
-    reply, llm_ms, llm_trace = await generate_reply(
-        text,
-        payload.history or [],
+@app.get("/api/conversations/search", response_model=List[SearchHit])
+async def search_archived_messages(
+    q: str,
+    user_id: str = Depends(verified_user_id),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+):
+    """
+    Full-text search over the current user's archived messages, newest first.
+    Every word must match, after stemming; a word ending in * matches as a prefix.
+    """
+    terms = chat_archive.query_terms(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Empty search query")
+    before = _decode_key(cursor, (int,))
+    hits = await chat_archive.run_db(chat_archive.search, user_id, terms, limit + 1, before and before[0])
+    next_cursor = _encode_key([hits[limit - 1]["message_id"]]) if len(hits) > limit else None
+    return _json_page(hits[:limit], next_cursor)
+
+
+@app.get("/api/conversations/{conversation_id}/messages", response_model=List[ConversationMessage])
+async def list_archived_messages(
+    conversation_id: str,
+    user_id: str = Depends(verified_user_id),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """The archived messages of one conversation, oldest first"""
+    after = _decode_key(cursor, (int,))
+    rows = await chat_archive.run_db(chat_archive.get_messages, user_id, conversation_id, limit + 1, after and after[0])
+    if rows is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    next_cursor = _encode_key([rows[limit - 1]["id"]]) if len(rows) > limit else None
+    return _json_page(rows[:limit], next_cursor)
+
+
+@app.post("/api/conversations/{conversation_id}/messages")
+async def append_archived_messages(
+    conversation_id: str, request: AppendMessagesRequest, user_id: str = Depends(verified_user_id)
+):
+    """Append messages to the archive, e.g. history kept in the browser; returns once they are stored"""
+    if len(conversation_id) > 128:
+        raise HTTPException(status_code=400, detail="conversation_id is too long")
+    appended = await chat_archive.append_messages(
+        user_id, conversation_id, [(m.role, m.content) for m in request.messages], title=request.title
+    )
+    return {"conversation_id": conversation_id, "appended": appended}
+
+
+def _json_page(rows: List[Dict], next_cursor: Optional[str]) -> Response:
+    """A JSON list, with the cursor for the next page in X-Next-Cursor when there is one"""
+    headers = {"Cache-Control": "no-cache"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(content=json.dumps(rows), media_type="application/json", headers=headers)
+
+
+# The live history of a conversation_id sent to /api/respond. It is kept apart
+# from /api/conversations, the archive, which outlives it and is append-only.
+@app.get("/api/sessions/{conversation_id}")
+async def get_session(conversation_id: str, user_id: str = Depends(verified_user_id)):
+    """Get the turns and summary the server holds for one of the user's conversations"""
+    conversation = get_store(settings).get(user_id, conversation_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return {
+        "conversation_id": conversation.id,
+        "summary": conversation.summary,
+        "turns": [m.model_dump() for m in conversation.turns],
+    }
+
+
+@app.delete("/api/sessions/{conversation_id}")
+async def delete_session(conversation_id: str, user_id: str = Depends(verified_user_id)):
+    """Forget the server-side history of one of the user's conversations; the archive keeps it"""
+    if not get_store(settings).delete(user_id, conversation_id):
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return {"success": True}
+
+
+async def _ndjson_texts(request: Request):
+    """Yield the text of each NDJSON line in the request body as it arrives"""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _batch_text(line)
+    if buffer.strip():
+        yield _batch_text(buffer)
+
+
+def _batch_text(line: bytes) -> str:
+    try:
+        item = json.loads(line)
+    except ValueError:
+        return line.decode("utf-8", errors="replace")
+    if isinstance(item, dict):
+        return str(item.get("text", ""))
+    return str(item)
+
+
+class _BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that leaves receive() to the request body reader.
+    The stock class listens for a disconnect on receive(), which would swallow
+    body chunks that the response generator has not read yet.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+@app.post("/api/nlu/batch")
+async def nlu_batch_endpoint(request: Request):
+    """
+    Run intent, entity and time extraction over many texts without calling the LLM.
+    The body is NDJSON, one {"text": ...} object (or JSON string) per line,
+    and results stream back as NDJSON in the same order.
+    """
+    async def results():
+        async for result in nlu_batch.aiter_batch_nlu(_ndjson_texts(request)):
+            yield json.dumps(result) + "\n"
+
+    return _BodyStreamingResponse(results(), media_type="application/x-ndjson")
+
+
+async def _run_job(task: str, request: Dict, user_id: str) -> Tuple[str, List[str]]:
+    """
+    Generate the reply for a background job. A failed or shed LLM call raises,
+    so the queue retries the job later instead of storing the fallback reply.
+    """
+    payload = RespondRequest(task=task, **request)
+    _, compacted = _prepare_history(payload, user_id)
+    reply, _, llm_trace = await generate_reply(
+        payload.text,
+        compacted.history,
         payload.recruiter_mode,
         settings,
-        task=payload.task,
+        task=task,
+        summary=compacted.summary,
+        user_id=request.get("quota_key", user_id),
     )
+    failure = next((entry for entry in llm_trace if entry.startswith(("llm:error=", "llm:shed="))), None)
+    if failure:
+        raise RuntimeError(failure)
+    return reply, compacted.trace + llm_trace
 
-    # Handle reminder creation if intent is reminder
-    reminder_id = None
-    if intent.label == "reminder":
-        # Extract time from entities or parse from text
-        time_str = entities.get("time", text)
-        reminder_time = parse_natural_time(time_str)
-        
-        if reminder_time:
-            # Extract title from text (remove time phrases)
-            title = text
-            for time_phrase in ["tomorrow", "today", "next week", "next month"]:
-                title = title.replace(time_phrase, "")
-            title = title.replace("remind me to", "").replace("remind me", "").strip()
-            
-            # Use a default user_id for now (in production, get from auth)
-            user_id = "default_user"
-            reminder_id = create_reminder(user_id, title, reminder_time, description=text)
-            reply = f"✓ Reminder set for {reminder_time.strftime('%B %d at %I:%M %p')}: {title}"
 
-    total_ms = int((time.perf_counter() - total_start) * 1000)
+@app.post("/api/jobs", response_model=Job, status_code=202)
+async def submit_job(payload: JobRequest, request: Request, user_id: str = Depends(verified_user_id)):
+    """
+    Queue a long-form generation (cover letter, resume review, ...) and return
+    its id at once. Fetch the result from /api/jobs/{job_id} or follow
+    /api/jobs/{job_id}/events.
+    """
+    if payload.task not in TASK_PROMPTS:
+        raise HTTPException(status_code=400, detail=f"Unknown task: {payload.task}")
+    body = payload.model_dump(exclude={"task"})
+    body["quota_key"] = _quota_key(request, user_id)
+    try:
+        return await jobs.get_queue().submit(user_id, payload.task, body)
+    except jobs.TooManyJobs:
+        raise HTTPException(status_code=429, detail=f"At most {jobs.MAX_ACTIVE_PER_USER} jobs can be queued or running")
 
-    tool_trace = []
-    tool_trace.extend(nlu_trace)
-    tool_trace.extend(llm_trace)
-    tool_trace.append(f"recruiter_mode={payload.recruiter_mode}")
-    if payload.task:
-        tool_trace.append(f"task={payload.task}")
-    tool_trace.append(f"entities={entities}")
-    if reminder_id:
-        tool_trace.append(f"reminder_created={reminder_id}")
 
-    latency = Latency(nlu=nlu_ms, llm=llm_ms, total=total_ms)
+@app.get("/api/jobs", response_model=List[Job])
+async def list_jobs_endpoint(
+    user_id: str = Depends(verified_user_id),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """The current user's jobs, newest first"""
+    rows = await jobs.run_db(jobs.list_jobs, user_id, limit + 1, _decode_key(cursor, (str, str)))
+    next_cursor = _encode_key([rows[limit - 1]["created_at"], rows[limit - 1]["id"]]) if len(rows) > limit else None
+    return _json_page(rows[:limit], next_cursor)
+
 
-    return RespondResponse(
-        reply=reply,
-        intent=intent,
-        entities=entities,
-        tool_trace=tool_trace,
-        latency_ms=latency,
-        reminder_id=reminder_id,
+@app.get("/api/jobs/{job_id}", response_model=Job)
+async def get_job_endpoint(job_id: str, user_id: str = Depends(verified_user_id)):
+    job = await jobs.run_db(jobs.get_job, job_id, user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str, user_id: str = Depends(verified_user_id)):
+    """
+    Server-Sent Events stream of one job. Sends a `job` event with its current
+    state on connect and on each change, then a `done` event with the finished
+    job, and closes.
+    """
+    queue = jobs.get_queue()
+    updates = queue.subscribe(job_id)
+    job = await jobs.run_db(jobs.get_job, job_id, user_id)
+    if job is None:
+        queue.unsubscribe(job_id, updates)
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        current = job
+        try:
+            if current["status"] not in jobs.FINISHED:
+                yield _sse("job", current)
+            while current["status"] not in jobs.FINISHED:
+                try:
+                    latest = await asyncio.wait_for(updates.get(), timeout=jobs.POLL_S)
+                except asyncio.TimeoutError:
+                    # Another process may be running the job; read its state from the database
+                    latest = await jobs.run_db(jobs.get_job, job_id, user_id)
+                    if latest is None:
+                        return
+                    if latest["updated_at"] == current["updated_at"]:
+                        yield ": keepalive\n\n"
+                        continue
+                current = latest
+                if current["status"] not in jobs.FINISHED:
+                    yield _sse("job", current)
+            yield _sse("done", current)
+        finally:
+            queue.unsubscribe(job_id, updates)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+def _reminders_etag(user_id: str) -> str:
+    return f'W/"{ETAG_EPOCH}-{scheduler.version(user_id)}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" are the same validator
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def _encode_key(values: list) -> str:
+    """Opaque page cursor holding the sort key of the last row sent"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def _decode_key(cursor: Optional[str], types: tuple) -> Optional[tuple]:
+    """The sort key in a cursor, converted to types; a 400 when it does not fit them"""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(cursor)
+        return tuple(t(v) for t, v in zip(types, values))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _encode_cursor(row: Dict) -> str:
+    return _encode_key([row["reminder_time"], row["id"]])
+
+
+def _decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, int]]:
+    return _decode_key(cursor, (str, int))
+
+
+async def _reminder_page(query, user_id: str, limit: Optional[int], cursor: Optional[str], etag: str) -> Response:
+    """
+    Run a keyset-paged reminder query. The body stays a plain list; when more
+    rows exist, the cursor for the next page is sent in X-Next-Cursor.
+    """
+    after = _decode_cursor(cursor)
+    rows = await run_db(query, user_id, limit=limit + 1 if limit else None, after=after)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = _encode_cursor(rows[-1])
+    return Response(content=json.dumps(rows), media_type="application/json", headers=headers)
+
+
 @app.get("/api/reminders", response_model=List[Reminder])
-async def list_reminders(user_id: str = "default_user"):
-    """Get all reminders for the current user"""
-    reminders = get_reminders(user_id)
-    return reminders
+async def list_reminders(
+    user_id: str = Depends(current_user_id),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    """Get reminders for the current user, a page at a time when limit is set"""
+    # Read the version before querying, so a concurrent change can only make the ETag stale, never the body
+    etag = _reminders_etag(user_id)
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return await _reminder_page(get_reminders, user_id, limit, cursor, etag)
 
 
 @app.get("/api/reminders/due", response_model=List[Reminder])
-async def list_due_reminders(user_id: str = "default_user"):
+async def list_due_reminders(
+    user_id: str = Depends(current_user_id),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
     """Get reminders that are currently due"""
-    reminders = get_due_reminders(user_id)
-    return reminders
+    # Reminders coming due bump the version too, via the scheduler's due event
+    etag = _reminders_etag(user_id)
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return await _reminder_page(get_due_reminders, user_id, limit, cursor, etag)
+
+
+@app.get("/api/reminders/occurrences", response_model=List[Reminder])
+async def list_reminder_occurrences(
+    start: str,
+    end: str,
+    user_id: str = Depends(current_user_id),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Get every reminder occurrence between start and end, with recurring
+    reminders expanded. Each item's reminder_time is the occurrence time.
+    """
+    window_start, window_end = _parse_reminder_time(start, "start"), _parse_reminder_time(end, "end")
+    if window_end < window_start or window_end - window_start > MAX_OCCURRENCE_WINDOW:
+        raise HTTPException(status_code=400, detail="end must follow start by at most 366 days")
+    etag = _reminders_etag(user_id)
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    rows = await run_db(get_occurrences, user_id, window_start, window_end, limit)
+    return Response(
+        content=json.dumps(rows), media_type="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"}
+    )
+
+
+@app.get("/api/reminders/events")
+async def reminder_events(user_id: str = Depends(current_user_id)):
+    """
+    Server-Sent Events stream of reminder activity for the current user.
+    Sends the currently due reminders on connect, then a `due` event as each
+    reminder comes due and a `changed` event when reminders are created,
+    completed or deleted.
+    """
+    queue = scheduler.subscribe(user_id)
+
+    async def events():
+        try:
+            due = await run_db(get_due_reminders, user_id)
+            yield _sse("due", due)
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(event, data)
+        finally:
+            scheduler.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _parse_reminder_time(value: str, field: str = "reminder_time") -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {field}: {value}")
+
+
+def _parse_recurrence(value: Optional[str]) -> Optional[str]:
+    """Validate a recurrence rule and return its normalized form"""
+    if not value:
+        return None
+    try:
+        return str(parse_rule(value))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid recurrence: {e}")
 
 
 @app.post("/api/reminders", response_model=Reminder)
-async def create_reminder_endpoint(reminder: CreateReminderRequest, user_id: str = "default_user"):
+async def create_reminder_endpoint(reminder: CreateReminderRequest, user_id: str = Depends(current_user_id)):
     """Create a new reminder manually"""
-    from datetime import datetime
-    reminder_time = datetime.fromisoformat(reminder.reminder_time)
-    reminder_id = create_reminder(user_id, reminder.title, reminder_time, reminder.description)
-    
-    reminders = get_reminders(user_id)
-    created = next((r for r in reminders if r["id"] == reminder_id), None)
-    if not created:
-        raise HTTPException(status_code=500, detail="Failed to create reminder")
-    
+    reminder_time = _parse_reminder_time(reminder.reminder_time)
+    recurrence = _parse_recurrence(reminder.recurrence)
+    created = await run_db(
+        create_reminder_row, user_id, reminder.title, reminder_time, reminder.description, recurrence
+    )
+    _notify_created(created["id"], user_id, reminder_time)
     return created
 
 
+@app.post("/api/reminders/batch", response_model=List[Reminder])
+async def create_reminders_endpoint(request: CreateRemindersRequest, user_id: str = Depends(current_user_id)):
+    """Create many reminders in a single transaction"""
+    items = [
+        (r.title, _parse_reminder_time(r.reminder_time), r.description, _parse_recurrence(r.recurrence))
+        for r in request.reminders
+    ]
+    created = await run_db(create_reminders, user_id, items)
+    for row, (_, reminder_time, _, _) in zip(created, items):
+        scheduler.schedule(row["id"], user_id, reminder_time)
+    scheduler.publish(user_id, "changed", {"ids": [row["id"] for row in created], "action": "created"})
+    return created
+
+
+def _track_completed(rows: List[Dict], user_id: str) -> None:
+    """Drop completed reminders from the scheduler and move recurring ones to their next occurrence"""
+    for row in rows:
+        if row["recurrence"]:
+            scheduler.reschedule(row["id"], user_id, datetime.fromisoformat(row["reminder_time"]))
+        else:
+            scheduler.cancel(row["id"])
+
+
+def _batch_result(requested: List[int], updated: List[int]) -> BatchReminderResult:
+    found = set(updated)
+    return BatchReminderResult(
+        updated=sorted(found),
+        not_found=sorted({i for i in requested if i not in found}),
+    )
+
+
+@app.post("/api/reminders/batch/complete", response_model=BatchReminderResult)
+async def complete_reminders_endpoint(request: ReminderIdsRequest, user_id: str = Depends(current_user_id)):
+    """Mark many reminders completed in a single transaction"""
+    rows = await run_db(complete_reminder_rows, request.ids, user_id)
+    _track_completed(rows, user_id)
+    completed = [row["id"] for row in rows]
+    if completed:
+        scheduler.publish(user_id, "changed", {"ids": completed, "action": "completed"})
+    return _batch_result(request.ids, completed)
+
+
+@app.post("/api/reminders/batch/delete", response_model=BatchReminderResult)
+async def delete_reminders_endpoint(request: ReminderIdsRequest, user_id: str = Depends(current_user_id)):
+    """Delete many reminders in a single transaction"""
+    deleted = await run_db(delete_reminders, request.ids, user_id)
+    for reminder_id in deleted:
+        scheduler.cancel(reminder_id)
+    if deleted:
+        scheduler.publish(user_id, "changed", {"ids": deleted, "action": "deleted"})
+    return _batch_result(request.ids, deleted)
+
+
 @app.patch("/api/reminders/{reminder_id}/complete")
-async def complete_reminder_endpoint(reminder_id: int, user_id: str = "default_user"):
-    """Mark a reminder as completed"""
-    success = complete_reminder(reminder_id, user_id)
-    if not success:
+async def complete_reminder_endpoint(reminder_id: int, user_id: str = Depends(current_user_id)):
+    """Mark a reminder as completed; a recurring one moves on to its next occurrence"""
+    rows = await run_db(complete_reminder_rows, [reminder_id], user_id)
+    if not rows:
         raise HTTPException(status_code=404, detail="Reminder not found")
+    _track_completed(rows, user_id)
+    scheduler.publish(user_id, "changed", {"id": reminder_id, "action": "completed"})
+    if rows[0]["recurrence"]:
+        return {"success": True, "next_reminder_time": rows[0]["reminder_time"]}
     return {"success": True}
 
 
 @app.delete("/api/reminders/{reminder_id}")
-async def delete_reminder_endpoint(reminder_id: int, user_id: str = "default_user"):
+async def delete_reminder_endpoint(reminder_id: int, user_id: str = Depends(current_user_id)):
     """Delete a reminder"""
-    success = delete_reminder(reminder_id, user_id)
+    success = await run_db(delete_reminder, reminder_id, user_id)
     if not success:
         raise HTTPException(status_code=404, detail="Reminder not found")
+    _notify_removed(reminder_id, user_id, "deleted")
     return {"success": True}
 
 
+profile.imported()
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,236 @@
+"""
+Minimal in-process metrics in the Prometheus text exposition format.
+
+Updates are plain integer and float arithmetic with no locks: every series is
+updated from the event loop thread only (DB and hashing pools are timed by the
+coroutine awaiting them), so increments cannot interleave. Histograms use
+fixed bucket bounds, so an observation is one bisect and two additions.
+"""
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds in milliseconds, from sub-millisecond NLU up to slow LLM calls
+DEFAULT_BUCKETS_MS = (0.1, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _num(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_label_str(self.labelnames, labels)} {_num(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """A settable value per label set, or a single unlabelled value read from func at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        func: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {} if labelnames else {(): 0.0}
+        self._func = func
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set_function(self, func: Callable[[], float]) -> None:
+        self._func = func
+
+    def samples(self) -> List[str]:
+        if self._func is not None:
+            return [f"{self.name} {_num(self._func())}"]
+        return [
+            f"{self.name}{_label_str(self.labelnames, labels)} {_num(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS_MS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def time(self, *labels: str) -> "_Timer":
+        """Context manager observing the elapsed milliseconds of its block"""
+        return _Timer(self, labels)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _num(bound)
+                le_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, labels, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, labels)} {_num(total)}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, labels)} {count}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe((time.perf_counter() - self.start) * 1000, *self.labels)
+
+
+def render() -> str:
+    """All registered series in the Prometheus text format"""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+STAGE_LATENCY = Histogram(
+    "stage_latency_ms",
+    "Time spent in each request stage (nlu, time_parse, router, reminder_db, archive_db, jobs_db, llm_queue, llm, serialization, user_db, password_kdf)",
+    ["stage"],
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_ms",
+    "End-to-end HTTP request time by route",
+    ["app", "method", "route", "status"],
+)
+INTENTS = Counter("nlu_intent_total", "Messages by detected intent", ["intent"])
+TASKS = Counter("respond_task_total", "Messages by task mode", ["task"])
+ROUTES = Counter("respond_route_total", "Messages by the path that answered them", ["route"])
+CACHE_OUTCOMES = Counter("llm_cache_total", "Reply cache lookups by outcome", ["outcome"])
+LLM_ERRORS = Counter("llm_errors_total", "Failed LLM calls by error type", ["error"])
+JWT_VERIFICATIONS = Counter(
+    "jwt_verifications_total", "Access token checks: cache_hit, verified, invalid, expired", ["outcome"]
+)
+LLM_SHED = Counter("llm_shed_total", "LLM calls answered with a fallback by admission control", ["reason"])
+LLM_BACKEND_CALLS = Counter(
+    "llm_backend_calls_total", "LLM provider calls by backend and outcome: won, lost (hedge cancelled or beaten), error",
+    ["backend", "outcome"],
+)
+LLM_HEDGES = Counter("llm_hedges_total", "Hedged requests sent because this backend ran past its hedge delay", ["backend"])
+LLM_BACKEND_HEALTHY = Gauge("llm_backend_healthy", "0 after a backend is marked down for repeated failures, 1 again once it answers", ["backend"])
+LLM_IN_FLIGHT = Gauge("llm_in_flight", "LLM calls currently holding a concurrency slot")
+LLM_QUEUE_DEPTH = Gauge("llm_queue_depth", "LLM calls waiting for a concurrency slot")
+REMINDERS_PENDING = Gauge("reminders_pending", "Upcoming reminders held by the in-process scheduler")
+JOBS = Counter("jobs_total", "Background job attempts by task and outcome: succeeded, retried, failed", ["task", "outcome"])
+JOBS_RUNNING = Gauge("jobs_running", "Background jobs this process is running")
+CHAT_ARCHIVE_PENDING = Gauge("chat_archive_pending", "Chat messages queued for the next archive batch")
+STARTUP_DURATION = Gauge(
+    "startup_duration_ms",
+    "Cold-start timings: import (process start to app imported), each warm-up phase, startup and ready",
+    ["app", "phase"],
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording http_request_duration_ms for every request"""
+
+    def __init__(self, app, app_name: str):
+        self.app = app
+        self.app_name = app_name
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Label by route template, not raw path, to keep cardinality bounded
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_LATENCY.observe(
+                (time.perf_counter() - start) * 1000, self.app_name, scope["method"], path, str(status[0])
+            )
@@ -13,6 +13,9 @@ class RespondRequest(BaseModel):
     history: Optional[List[Message]] = Field(default_factory=list)
     recruiter_mode: bool = True
     task: Optional[str] = None
+    bypass_cache: bool = False
+    # Server-side history: send only the new turn; history seeds a new conversation
+    conversation_id: Optional[str] = Field(None, max_length=128)
 
 
 class Intent(BaseModel):
@@ -24,6 +27,12 @@ class Latency(BaseModel):
     nlu: int
     llm: int
     total: int
+    first_token: Optional[int] = None
+    # Time spent in the fast-path router, and which path answered ("llm" or a local route)
+    router: int = 0
+    route: str = "llm"
+    # Time spent waiting for an LLM slot; not included in llm
+    queue: int = 0
 
 
 class RespondResponse(BaseModel):
@@ -33,6 +42,7 @@ class RespondResponse(BaseModel):
     tool_trace: List[str]
     latency_ms: Latency
     reminder_id: Optional[int] = None
+    conversation_id: Optional[str] = None
 
 
 class Reminder(BaseModel):
@@ -43,12 +53,94 @@ class Reminder(BaseModel):
     reminder_time: str
     created_at: str
     completed: int
+    # Recurrence rule such as "FREQ=WEEKLY;BYDAY=MO"; reminder_time is then the next occurrence
+    recurrence: Optional[str] = None
 
 
 class CreateReminderRequest(BaseModel):
     title: str
     description: Optional[str] = ""
     reminder_time: str
+    recurrence: Optional[str] = None
+
+
+# Upper bound on items per batch request, well under SQLite's bound-parameter limit
+MAX_BATCH_SIZE = 500
+
+
+class CreateRemindersRequest(BaseModel):
+    reminders: List[CreateReminderRequest] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class ReminderIdsRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class BatchReminderResult(BaseModel):
+    # Ids that were changed, and requested ids that do not exist for this user
+    updated: List[int]
+    not_found: List[int]
+
+
+class ConversationSummary(BaseModel):
+    conversation_id: str
+    title: str
+    created_at: str
+    updated_at: str
+    message_count: int
+
+
+class ConversationMessage(BaseModel):
+    id: int
+    role: Literal["user", "assistant"]
+    content: str
+    created_at: str
+
+
+class SearchHit(BaseModel):
+    message_id: int
+    conversation_id: str
+    title: str
+    role: Literal["user", "assistant"]
+    created_at: str
+    # Text around the first matching term
+    snippet: str
+
+
+class AppendMessagesRequest(BaseModel):
+    messages: List[Message] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+    # Title for a conversation these messages start; defaults to the first user message
+    title: Optional[str] = Field(None, max_length=200)
+
+
+class JobRequest(BaseModel):
+    # A key of llm.TASK_PROMPTS
+    task: str
+    text: str = Field(..., min_length=1)
+    history: List[Message] = Field(default_factory=list)
+    recruiter_mode: bool = True
+
+
+class Job(BaseModel):
+    id: str
+    task: str
+    # queued, running, succeeded or failed
+    status: str
+    attempts: int
+    result: Optional[str] = None
+    # Why the last attempt failed; kept while a retry is queued
+    error: Optional[str] = None
+    tool_trace: List[str] = Field(default_factory=list)
+    created_at: str
+    updated_at: str
+
+
+class LLMBackend(BaseModel):
+    """An extra OpenAI-compatible provider; unset fields use the primary's values"""
+    name: str
+    base_url: Optional[str] = None
+    api_key: Optional[str] = None
+    model: Optional[str] = None
 
 
 class Settings(BaseSettings):
@@ -61,6 +153,45 @@ class Settings(BaseSettings):
     ]
     model_name: str = "gpt-4o-mini"
     max_tokens: int = 350
+    # OpenAI-compatible endpoint, e.g. the local stub in benchmarks/fake_openai.py
+    openai_base_url: Optional[str] = None
+    # Shared HTTP pool and per-call limits for the async LLM client
+    llm_timeout_s: float = 30.0
+    llm_connect_timeout_s: float = 5.0
+    llm_max_retries: int = 1
+    llm_max_connections: int = 50
+    llm_max_keepalive_connections: int = 20
+    llm_keepalive_expiry_s: float = 30.0
+    llm_max_concurrency: int = 16
+    # Admission control: calls beyond llm_max_concurrency queue by task priority, up to
+    # llm_max_queue waiters for at most llm_max_queue_wait_s; each user gets a token bucket
+    # of llm_user_burst calls refilled at llm_user_rate_per_min (llm_user_burst=0 disables it)
+    llm_max_queue: int = 64
+    llm_max_queue_wait_s: float = 10.0
+    llm_user_rate_per_min: float = 20.0
+    llm_user_burst: int = 10
+    # Fallback providers after the primary, in order, as JSON in LLM_BACKENDS. A reply is
+    # hedged to the next backend once the current one runs past llm_hedge_percentile of its
+    # recent latency; a backend failing llm_backend_failure_threshold times in a row is
+    # skipped for llm_backend_cooldown_s
+    llm_backends: List[LLMBackend] = []
+    llm_hedge_percentile: float = 95.0
+    llm_hedge_initial_delay_ms: float = 2000.0
+    llm_hedge_min_delay_ms: float = 100.0
+    llm_backend_failure_threshold: int = 3
+    llm_backend_cooldown_s: float = 30.0
+    # Reply cache in front of the LLM; set response_cache_db to persist across restarts
+    response_cache_enabled: bool = True
+    response_cache_size: int = 1024
+    response_cache_ttl_s: float = 3600
+    response_cache_db: Optional[str] = None
+    response_cache_max_history: int = 6
+    # History sent to the model: recent turns verbatim up to the budget, older ones summarized
+    history_token_budget: int = 1500
+    history_summary_tokens: int = 300
+    history_min_turns: int = 2
+    conversation_max_count: int = 1000
+    conversation_ttl_s: float = 86400
 
     class Config:
         env_file = ".env"
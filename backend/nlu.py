@@ -1,7 +1,27 @@
+"""
+Intent detection and entity extraction.
+
+Entities always come from the keyword matcher. Intents come from NLU_BACKEND:
+"model" uses the linear classifier in intent_model.py, whose confidence is a
+probability; "keyword" counts keyword hits. The model backend falls back to
+keywords when its weights cannot be loaded. Keywords added through
+register_intent_keywords only affect the keyword backend.
+"""
+import logging
+import os
 import re
-from typing import Dict, List, Tuple
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Pattern, Sequence, Set, Tuple
 from models import Intent
 
+if TYPE_CHECKING:
+    from intent_model import IntentModel
+
+logger = logging.getLogger(__name__)
+
+NLU_BACKENDS = ("model", "keyword")
+NLU_BACKEND = os.getenv("NLU_BACKEND", "model")
+
 INTENT_KEYWORDS = {
     "greeting": ["hello", "hi", "hey", "good morning", "good evening"],
     "qa": ["what is", "explain", "how do", "why"],
@@ -25,13 +45,178 @@ APP_NAMES = ["linkedin", "calendly", "gmail", "slack", "notion", "jira"]
 TOPIC_KEYWORDS = ["race condition", "resume", "interview", "offer", "salary", "voice assistant"]
 
 
-def detect_intent(text: str) -> Tuple[str, float, List[str]]:
-    lowered = text.lower()
+DATE_PATTERN = r"\b\d{4}-\d{2}-\d{2}\b"
+
+# Every keyword also matches its plural ("bug" -> "bugs"); keywords at least this
+# long also match other simple inflections ("remind" -> "reminders")
+PLURALS = r"(?:s|es)?"
+INFLECT_MIN_LEN = 4
+INFLECTIONS = r"(?:s|es|d|ed|ing|er|ers)?"
+
+# keyword -> (keyword, kind, label, priority) for it and every keyword it starts with
+_Hits = Dict[str, List[Tuple[str, str, str, int]]]
+
+
+class ScanResult:
+    __slots__ = ("intent_hits", "entities")
+
+    def __init__(self):
+        # intent -> distinct keywords that matched
+        self.intent_hits: Dict[str, Set[str]] = {}
+        # entity kind -> (table priority, value); lower priority wins
+        self.entities: Dict[str, Tuple[int, str]] = {}
+
+    def add_entity(self, kind: str, priority: int, value: str) -> None:
+        current = self.entities.get(kind)
+        if current is None or priority < current[0]:
+            self.entities[kind] = (priority, value)
+
+
+class KeywordMatcher:
+    """
+    Finds every intent keyword and entity in two regex passes over the lowered text.
+
+    The time and date patterns are compiled into one alternation, and all
+    keyword tables into another. The keyword regex sits in a lookahead, so it
+    is tried at every word start without consuming text, and keywords that
+    overlap ("set a reminder", "reminder") are each found. Keywords that
+    start where a longer one does ("stack", "stack trace") are credited from
+    a table built with the regex. Keywords only match on word boundaries, so
+    "hi" no longer matches inside "this". The tables can be changed at runtime
+    through register_intent_keywords and register_entity_values; the regexes
+    are rebuilt once, on the next scan.
+    """
+
+    def __init__(self):
+        self._version = 0
+        self._compiled: Optional[Tuple[int, Pattern, Optional[Pattern], _Hits]] = None
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        self._version += 1
+
+    def _build(self) -> Tuple[int, Pattern, Optional[Pattern], _Hits]:
+        version = self._version
+        lookup: Dict[str, List[Tuple[str, str, int]]] = {}
+        for intent, keywords in INTENT_KEYWORDS.items():
+            for kw in keywords:
+                lookup.setdefault(kw.lower(), []).append(("intent", intent, 0))
+        for kind, values in (("app", APP_NAMES), ("topic", TOPIC_KEYWORDS)):
+            for priority, value in enumerate(values):
+                lookup.setdefault(value.lower(), []).append((kind, value, priority))
+
+        hits: _Hits = {}
+        for phrase in lookup:
+            starts = [p for p in lookup if p == phrase or (phrase.startswith(p) and not phrase[len(p)].isalnum())]
+            hits[phrase] = [(p, kind, label, priority) for p in starts for kind, label, priority in lookup[p]]
+
+        events = [f"(?P<time{i}>{pattern})" for i, pattern in enumerate(TIME_PATTERNS)]
+        events.append(f"(?P<date>{DATE_PATTERN})")
+
+        # Longest first so each word start yields its longest keyword; hits adds the shorter ones
+        phrases = sorted(lookup, key=len, reverse=True)
+        short = [re.escape(p) for p in phrases if len(p) < INFLECT_MIN_LEN]
+        long = [re.escape(p) for p in phrases if len(p) >= INFLECT_MIN_LEN]
+        keyword_groups = []
+        if long:
+            keyword_groups.append(f"(?P<kwi>{'|'.join(long)}){INFLECTIONS}")
+        if short:
+            keyword_groups.append(f"(?P<kw>{'|'.join(short)}){PLURALS}")
+        keywords = None
+        if keyword_groups:
+            keywords = re.compile(f"(?<!\\w)(?=(?:{'|'.join(keyword_groups)})(?!\\w))")
+
+        return version, re.compile("|".join(events)), keywords, hits
+
+    def _get_compiled(self):
+        compiled = self._compiled
+        if compiled is None or compiled[0] != self._version:
+            with self._lock:
+                compiled = self._compiled
+                if compiled is None or compiled[0] != self._version:
+                    compiled = self._build()
+                    self._compiled = compiled
+        return compiled
+
+    def scan(self, text: str) -> ScanResult:
+        _, events, keywords, hits = self._get_compiled()
+        result = ScanResult()
+        lowered = text.lower()
+        for match in events.finditer(lowered):
+            group = match.lastgroup
+            if group == "date":
+                result.add_entity("date", 0, match.group())
+            else:
+                result.add_entity("time", int(group[4:]), match.group())
+        if keywords is not None:
+            for match in keywords.finditer(lowered):
+                for phrase, kind, label, priority in hits[match.group("kwi") or match.group("kw")]:
+                    if kind == "intent":
+                        result.intent_hits.setdefault(label, set()).add(phrase)
+                    else:
+                        result.add_entity(kind, priority, label)
+        return result
+
+
+_matcher = KeywordMatcher()
+
+
+def register_intent_keywords(intent: str, keywords: List[str]) -> None:
+    """Add keywords for an intent; takes effect on the next call"""
+    INTENT_KEYWORDS.setdefault(intent, []).extend(keywords)
+    _matcher.invalidate()
+
+
+def register_entity_values(kind: str, values: List[str]) -> None:
+    """Add recognised values for the "app" or "topic" entity"""
+    tables = {"app": APP_NAMES, "topic": TOPIC_KEYWORDS}
+    if kind not in tables:
+        raise ValueError(f"Unknown entity kind: {kind}")
+    tables[kind].extend(values)
+    _matcher.invalidate()
+
+
+_model: Optional["IntentModel"] = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+
+def _get_model() -> Optional["IntentModel"]:
+    """The intent model, loaded on first use; None when its weights are unavailable"""
+    global _model, _model_loaded
+    if not _model_loaded:
+        with _model_lock:
+            if not _model_loaded:
+                # Imported here to keep NumPy off the import path of the keyword backend
+                import intent_model
+
+                try:
+                    _model = intent_model.IntentModel.load()
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning("Intent model unavailable (%s); using keyword intents", e)
+                _model_loaded = True
+    return _model
+
+
+def _backend_model(backend: Optional[str]) -> Optional["IntentModel"]:
+    backend = backend or NLU_BACKEND
+    if backend not in NLU_BACKENDS:
+        raise ValueError(f"Unknown NLU backend: {backend}")
+    return _get_model() if backend == "model" else None
+
+
+def warm_up() -> None:
+    """Compile the matcher, and load the intent model, ahead of the first request"""
+    _matcher.scan("")
+    _backend_model(None)
+
+
+def _intent_from_scan(scan: ScanResult) -> Tuple[str, float, List[str]]:
     scores: Dict[str, int] = {}
     trace: List[str] = []
 
-    for intent, keywords in INTENT_KEYWORDS.items():
-        scores[intent] = sum(1 for kw in keywords if kw in lowered)
+    for intent in INTENT_KEYWORDS:
+        scores[intent] = len(scan.intent_hits.get(intent, ()))
         if scores[intent] > 0:
             trace.append(f"intent_hit:{intent}:{scores[intent]}")
 
@@ -44,39 +229,48 @@ def detect_intent(text: str) -> Tuple[str, float, List[str]]:
     return best_intent, confidence, trace
 
 
-def extract_entities(text: str) -> Dict[str, str]:
-    entities: Dict[str, str] = {}
-    lowered = text.lower()
-
-    # Time phrases
-    for pattern in TIME_PATTERNS:
-        match = re.search(pattern, lowered)
-        if match:
-            entities.setdefault("time", match.group())
-            break
-
-    # App names
-    for app in APP_NAMES:
-        if app in lowered:
-            entities.setdefault("app", app)
-            break
-
-    # Topics
-    for topic in TOPIC_KEYWORDS:
-        if topic in lowered:
-            entities.setdefault("topic", topic)
-            break
-
-    # Date-like patterns
-    date_match = re.search(r"\b\d{4}-\d{2}-\d{2}\b", text)
-    if date_match:
-        entities.setdefault("date", date_match.group())
+def _intent_from_model(label: str, probability: float, ranked: List[Tuple[str, float]]) -> Tuple[str, float, List[str]]:
+    return label, probability, [f"intent_model:{name}:{p:.2f}" for name, p in ranked]
 
+
+def _entities_from_scan(scan: ScanResult) -> Dict[str, str]:
+    # Keep the historical key order: time, app, topic, date
+    entities: Dict[str, str] = {}
+    for kind in ("time", "app", "topic", "date"):
+        if kind in scan.entities:
+            entities[kind] = scan.entities[kind][1]
     return entities
 
 
-def run_nlu(text: str) -> Tuple[Intent, Dict[str, str], List[str]]:
-    intent_label, confidence, trace = detect_intent(text)
-    entities = extract_entities(text)
-    intent = Intent(label=intent_label, confidence=round(confidence, 3))
-    return intent, entities, trace
+def detect_intent(text: str, backend: Optional[str] = None) -> Tuple[str, float, List[str]]:
+    model = _backend_model(backend)
+    if model is not None:
+        return _intent_from_model(*model.predict([text])[0])
+    return _intent_from_scan(_matcher.scan(text))
+
+
+def extract_entities(text: str) -> Dict[str, str]:
+    return _entities_from_scan(_matcher.scan(text))
+
+
+def run_nlu(text: str, backend: Optional[str] = None) -> Tuple[Intent, Dict[str, str], List[str]]:
+    return run_nlu_batch([text], backend)[0]
+
+
+def run_nlu_batch(
+    texts: Sequence[str],
+    backend: Optional[str] = None,
+) -> List[Tuple[Intent, Dict[str, str], List[str]]]:
+    """run_nlu over many texts; the model backend scores them all in one matrix product"""
+    model = _backend_model(backend)
+    predictions = model.predict(texts) if model is not None and texts else None
+    results = []
+    for i, text in enumerate(texts):
+        scan = _matcher.scan(text)
+        if predictions is not None:
+            intent_label, confidence, trace = _intent_from_model(*predictions[i])
+        else:
+            intent_label, confidence, trace = _intent_from_scan(scan)
+        intent = Intent(label=intent_label, confidence=round(confidence, 3))
+        results.append((intent, _entities_from_scan(scan), trace))
+    return results
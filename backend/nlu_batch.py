@@ -0,0 +1,196 @@
+"""
+Batch NLU over large transcript exports.
+
+Texts are processed in chunks on a process pool, with a bounded number of
+chunks in flight, so memory stays flat however many texts are fed in and
+throughput scales with the number of cores. Results come back in input order.
+A text that cannot be analysed still gets its line, with an "error" field, so
+one bad text never ends the stream early.
+
+    python nlu_batch.py transcripts.txt > nlu.ndjson
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from models import Intent
+from nlu import run_nlu, run_nlu_batch
+from time_parser import parse_time
+
+CHUNK_SIZE = int(os.getenv("NLU_BATCH_CHUNK_SIZE", "256"))
+WORKERS = int(os.getenv("NLU_BATCH_WORKERS", "0")) or os.cpu_count() or 1
+# Chunks submitted ahead of the one being consumed, per worker
+PREFETCH = 2
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _describe(e: BaseException) -> str:
+    return f"{type(e).__name__}: {e}"
+
+
+def _error_result(text: str, error: str) -> Dict:
+    """The line for a text that could not be analysed"""
+    return {
+        "text": text,
+        "intent": None,
+        "entities": {},
+        "time": None,
+        "time_span": None,
+        "time_confidence": None,
+        "trace": [],
+        "error": error,
+    }
+
+
+def analyze(text: str) -> Dict:
+    try:
+        nlu_result = run_nlu(text)
+    except Exception as e:
+        return _error_result(text, f"nlu: {_describe(e)}")
+    return _result(text, nlu_result)
+
+
+def _result(text: str, nlu_result: Tuple[Intent, Dict[str, str], List[str]]) -> Dict:
+    intent, entities, trace = nlu_result
+    try:
+        parsed = parse_time(text)
+        error = None
+    except Exception as e:
+        parsed, error = None, f"time: {_describe(e)}"
+    result = {
+        "text": text,
+        "intent": intent.model_dump(),
+        "entities": entities,
+        "time": parsed.when.isoformat() if parsed else None,
+        "time_span": list(parsed.span) if parsed else None,
+        "time_confidence": parsed.confidence if parsed else None,
+        "trace": trace,
+    }
+    if error:
+        result["error"] = error
+    return result
+
+
+def analyze_chunk(texts: List[str]) -> List[Dict]:
+    # One batch NLU call, so the intent model scores the chunk in one matrix product
+    try:
+        nlu_results = run_nlu_batch(texts)
+    except Exception:
+        # Fall back to one text at a time, so a bad text only fails its own line
+        return [analyze(text) for text in texts]
+    return [_result(text, nlu_result) for text, nlu_result in zip(texts, nlu_results)]
+
+
+def _failed_chunk(texts: List[str], e: BaseException) -> List[Dict]:
+    """Error lines for a chunk whose worker failed (e.g. a crashed pool process)"""
+    logger.error("Batch NLU chunk of %d texts failed: %s", len(texts), _describe(e))
+    return [_error_result(text, f"batch: {_describe(e)}") for text in texts]
+
+
+def _chunk_results(texts: List[str], future: Any) -> List[Dict]:
+    try:
+        return future.result()
+    except Exception as e:
+        return _failed_chunk(texts, e)
+
+
+async def _await_chunk(texts: List[str], future: Awaitable[List[Dict]]) -> List[Dict]:
+    try:
+        return await future
+    except Exception as e:
+        return _failed_chunk(texts, e)
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn, not fork: the server process has DB and HTTP pool threads running
+        _executor = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+def _chunks(texts: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk: List[str] = []
+    for text in texts:
+        chunk.append(text)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_batch_nlu(
+    texts: Iterable[str],
+    chunk_size: int = CHUNK_SIZE,
+    executor: Optional[Executor] = None,
+) -> Iterator[Dict]:
+    """Run NLU and time parsing over texts, yielding one result per text in order"""
+    executor = executor or get_executor()
+    in_flight = deque()
+    window = WORKERS * PREFETCH
+    for chunk in _chunks(texts, chunk_size):
+        in_flight.append((chunk, executor.submit(analyze_chunk, chunk)))
+        if len(in_flight) >= window:
+            yield from _chunk_results(*in_flight.popleft())
+    while in_flight:
+        yield from _chunk_results(*in_flight.popleft())
+
+
+async def aiter_batch_nlu(
+    texts: AsyncIterable[str],
+    chunk_size: int = CHUNK_SIZE,
+    executor: Optional[Executor] = None,
+) -> AsyncIterator[Dict]:
+    """Async variant of iter_batch_nlu for streaming request bodies"""
+    loop = asyncio.get_running_loop()
+    executor = executor or get_executor()
+    in_flight = deque()
+    window = WORKERS * PREFETCH
+    chunk: List[str] = []
+
+    async for text in texts:
+        chunk.append(text)
+        if len(chunk) >= chunk_size:
+            in_flight.append((chunk, loop.run_in_executor(executor, analyze_chunk, chunk)))
+            chunk = []
+            if len(in_flight) >= window:
+                for result in await _await_chunk(*in_flight.popleft()):
+                    yield result
+    if chunk:
+        in_flight.append((chunk, loop.run_in_executor(executor, analyze_chunk, chunk)))
+    while in_flight:
+        for result in await _await_chunk(*in_flight.popleft()):
+            yield result
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import sys
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", nargs="?", help="one text per line (default: stdin)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    source = open(args.input) if args.input else sys.stdin
+    with source:
+        lines = (line.rstrip("\n") for line in source)
+        for result in iter_batch_nlu((line for line in lines if line.strip()), args.chunk_size):
+            sys.stdout.write(json.dumps(result) + "\n")
+    shutdown()
@@ -0,0 +1,135 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import NamedTuple, Optional, Tuple
+
+# scrypt cost parameters; raise N to make each hash slower and stronger.
+# Size these against login p99 using the kdf duration in the Server-Timing header.
+SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", "16384"))
+SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+# hashlib.scrypt releases the GIL, so threads scale; "process" isolates the
+# memory-hard work from the server process entirely.
+HASH_POOL = os.getenv("PASSWORD_HASH_POOL", "thread")
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+
+_executor: Optional[Executor] = None
+_dummy_hash: Optional[str] = None
+
+
+class KdfTiming(NamedTuple):
+    kdf_ms: float
+    queue_ms: float
+
+    def server_timing(self) -> str:
+        return f"kdf;dur={self.kdf_ms:.1f}, kdf-queue;dur={self.queue_ms:.1f}"
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p, dklen=KEY_BYTES, maxmem=256 * n * r * p
+    )
+
+
+def hash_password_sync(password: str) -> str:
+    """Hash with the current scrypt parameters as scrypt$n$r$p$salt$key"""
+    salt = os.urandom(SALT_BYTES)
+    key = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(key)}"
+
+
+def verify_password_sync(password: str, password_hash: str) -> Tuple[bool, bool]:
+    """
+    Check a password against a stored hash.
+    Returns (matches, needs_rehash); legacy unsalted SHA-256 hashes and
+    scrypt hashes with outdated parameters need a rehash.
+    """
+    if password_hash.startswith("scrypt$"):
+        try:
+            _, n, r, p, salt, key = password_hash.split("$")
+            n, r, p = int(n), int(r), int(p)
+            expected = base64.b64decode(key)
+            candidate = _scrypt(password, base64.b64decode(salt), n, r, p)
+        except ValueError:
+            return False, False
+        matches = hmac.compare_digest(candidate, expected)
+        return matches, matches and (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+    legacy = hashlib.sha256(password.encode()).hexdigest()
+    matches = hmac.compare_digest(legacy, password_hash)
+    # Do the same scrypt work as a current hash, so timing does not single out legacy accounts
+    _scrypt(password, bytes(SALT_BYTES), SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return matches, matches
+
+
+def dummy_hash() -> str:
+    """
+    A hash of a random password with the current parameters. Logins for unknown
+    emails verify against it, so they cost the same as a wrong password.
+    """
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password_sync(_b64(os.urandom(SALT_BYTES)))
+    return _dummy_hash
+
+
+def _timed(func, *args):
+    """Run func in the worker and report its own runtime, excluding queue wait"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if HASH_POOL == "process":
+            _executor = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+    return _executor
+
+
+async def warm_up() -> None:
+    """Start the hash workers ahead of the first signup or login; the process pool is slow to spawn"""
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    await asyncio.gather(*(loop.run_in_executor(executor, os.getpid) for _ in range(HASH_WORKERS)))
+    # Built in this process, where login reads it
+    await loop.run_in_executor(None, dummy_hash)
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+async def hash_password(password: str) -> Tuple[str, KdfTiming]:
+    """Hash on the bounded pool"""
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    password_hash, kdf_ms = await loop.run_in_executor(_get_executor(), _timed, hash_password_sync, password)
+    return password_hash, KdfTiming(kdf_ms, (time.perf_counter() - start) * 1000 - kdf_ms)
+
+
+async def verify_password(password: str, password_hash: str) -> Tuple[bool, bool, KdfTiming]:
+    """Verify on the bounded pool; returns (matches, needs_rehash, timing)"""
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    (matches, needs_rehash), kdf_ms = await loop.run_in_executor(
+        _get_executor(), _timed, verify_password_sync, password, password_hash
+    )
+    return matches, needs_rehash, KdfTiming(kdf_ms, (time.perf_counter() - start) * 1000 - kdf_ms)
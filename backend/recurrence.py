@@ -0,0 +1,154 @@
+"""
+Recurrence rules for repeating reminders.
+
+A recurring reminder is one row: its rule is stored as a short RRULE-style
+string ("FREQ=WEEKLY;BYDAY=MO") and reminder_time holds the next fire time.
+Occurrences are never stored; they are computed from the rule when one comes
+due or when a time window is listed, so the table grows with the number of
+reminders rather than the number of occurrences.
+"""
+import calendar
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterator, Optional, Tuple
+
+FREQUENCIES = ("HOURLY", "DAILY", "WEEKLY", "MONTHLY")
+
+DAY_CODES = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+# Longest rule string accepted from clients
+MAX_RULE_LENGTH = 64
+
+_STEPS = {"HOURLY": timedelta(hours=1), "DAILY": timedelta(days=1), "WEEKLY": timedelta(weeks=1)}
+
+
+@dataclass(frozen=True)
+class Rule:
+    freq: str
+    interval: int = 1
+    # Weekdays (0 = Monday) for WEEKLY rules; empty means the anchor's weekday
+    by_day: Tuple[int, ...] = ()
+    # Day of month for MONTHLY rules, clamped to short months; None means the anchor's day
+    by_month_day: Optional[int] = None
+
+    def __str__(self) -> str:
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.by_day:
+            parts.append("BYDAY=" + ",".join(DAY_CODES[d] for d in self.by_day))
+        if self.by_month_day is not None:
+            parts.append(f"BYMONTHDAY={self.by_month_day}")
+        return ";".join(parts)
+
+
+def parse_rule(value: str) -> Rule:
+    """Parse a rule string; raises ValueError when it is malformed"""
+    if len(value) > MAX_RULE_LENGTH:
+        raise ValueError("rule too long")
+    fields = {}
+    for part in value.upper().split(";"):
+        key, sep, val = part.partition("=")
+        if not sep or key in fields:
+            raise ValueError(f"bad rule part: {part!r}")
+        fields[key.strip()] = val.strip()
+
+    freq = fields.pop("FREQ", None)
+    if freq not in FREQUENCIES:
+        raise ValueError(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+    interval = int(fields.pop("INTERVAL", "1"))
+    if not 1 <= interval <= 1000:
+        raise ValueError("INTERVAL must be between 1 and 1000")
+
+    by_day: Tuple[int, ...] = ()
+    if "BYDAY" in fields:
+        if freq != "WEEKLY":
+            raise ValueError("BYDAY is only supported with FREQ=WEEKLY")
+        codes = fields.pop("BYDAY").split(",")
+        if any(code not in DAY_CODES for code in codes):
+            raise ValueError("BYDAY takes MO,TU,WE,TH,FR,SA,SU")
+        by_day = tuple(sorted({DAY_CODES.index(code) for code in codes}))
+
+    by_month_day = None
+    if "BYMONTHDAY" in fields:
+        if freq != "MONTHLY":
+            raise ValueError("BYMONTHDAY is only supported with FREQ=MONTHLY")
+        by_month_day = int(fields.pop("BYMONTHDAY"))
+        if not 1 <= by_month_day <= 31:
+            raise ValueError("BYMONTHDAY must be between 1 and 31")
+
+    if fields:
+        raise ValueError(f"unsupported rule parts: {', '.join(sorted(fields))}")
+    return Rule(freq, interval, by_day, by_month_day)
+
+
+def _month_occurrence(rule: Rule, start: datetime, months: int) -> datetime:
+    year, month = divmod(start.month - 1 + months, 12)
+    year += start.year
+    day = min(rule.by_month_day or start.day, calendar.monthrange(year, month + 1)[1])
+    return start.replace(year=year, month=month + 1, day=day)
+
+
+def next_after(rule: Rule, start: datetime, after: datetime) -> datetime:
+    """
+    First occurrence of the series anchored at start that is later than after.
+    start is itself an occurrence; the result is never earlier than start.
+    """
+    if after < start:
+        return start
+
+    if rule.freq == "MONTHLY":
+        elapsed = (after.year - start.year) * 12 + after.month - start.month
+        months = max(0, elapsed - elapsed % rule.interval)
+        while True:
+            candidate = _month_occurrence(rule, start, months)
+            if candidate > after:
+                return candidate
+            months += rule.interval
+
+    if rule.freq == "WEEKLY" and rule.by_day:
+        # Weeks are counted from the Monday of the anchor's week
+        week_start = start - timedelta(days=start.weekday())
+        weeks = (after - week_start).days // 7
+        weeks -= weeks % rule.interval
+        while True:
+            for day in rule.by_day:
+                candidate = week_start + timedelta(weeks=weeks, days=day)
+                if candidate >= start and candidate > after:
+                    return candidate
+            weeks += rule.interval
+
+    step = _STEPS[rule.freq] * rule.interval
+    return start + step * ((after - start) // step + 1)
+
+
+def occurrences(
+    rule: Rule,
+    start: datetime,
+    window_start: datetime,
+    window_end: datetime,
+    limit: int,
+) -> Iterator[datetime]:
+    """Occurrences of the series anchored at start within [window_start, window_end], at most limit"""
+    when = start if start >= window_start else next_after(rule, start, window_start - timedelta(microseconds=1))
+    for _ in range(limit):
+        if when > window_end:
+            return
+        yield when
+        when = next_after(rule, start, when)
+
+
+_UNIT_NAMES = {"HOURLY": "hour", "DAILY": "day", "WEEKLY": "week", "MONTHLY": "month"}
+
+
+def describe(rule: Rule) -> str:
+    """Short English form of a rule, e.g. "every Monday and Thursday" or "every 2 hours" """
+    unit = _UNIT_NAMES[rule.freq]
+    every = f"every {unit}" if rule.interval == 1 else f"every {rule.interval} {unit}s"
+    if rule.by_day:
+        names = [calendar.day_name[d] for d in rule.by_day]
+        days = names[0] if len(names) == 1 else ", ".join(names[:-1]) + " and " + names[-1]
+        return f"every {days}" if rule.interval == 1 else f"{every} on {days}"
+    if rule.by_month_day is not None:
+        return f"{every} on day {rule.by_month_day}"
+    return every
@@ -0,0 +1,175 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+from recurrence import next_after, parse_rule
+from reminders import get_pending_reminders, get_reminders_by_ids, run_db
+
+logger = logging.getLogger(__name__)
+
+# Max ids per lookup when a batch of reminders comes due at once
+FETCH_CHUNK = 500
+
+
+class ReminderScheduler:
+    """
+    Keeps upcoming reminders in a min-heap and pushes each one to the owning
+    user's subscribers the moment it comes due.
+
+    Only reminders inside a rolling horizon are held in memory; the window is
+    extended from the database every refresh interval. Completed and deleted
+    reminders are dropped lazily: they are skipped when popped, and the
+    fire-time lookup only returns rows that are still open.
+
+    A recurring reminder is held as its next occurrence only. When that fires,
+    the one after it is pushed if it falls inside the loaded window; later
+    ones are found by the next window load.
+    """
+
+    def __init__(self, horizon: timedelta = timedelta(hours=6), refresh: timedelta = timedelta(minutes=30)):
+        self.horizon = horizon
+        self.refresh = refresh
+        self._heap: List[Tuple[datetime, int, str]] = []
+        # reminder id -> the fire time it is scheduled for; heap entries that disagree are stale
+        self._tracked: Dict[int, datetime] = {}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        # Per-user change counter, bumped by every published event; backs the reminder list ETag
+        self._versions: Dict[str, int] = {}
+        self._loaded_until: Optional[datetime] = None
+        self._next_refresh: Optional[datetime] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._tracked)
+
+    async def start(self) -> None:
+        now = datetime.now()
+        self._loaded_until = now
+        await self._load_window(now)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _load_window(self, now: datetime) -> None:
+        """Pull reminders due between the end of the loaded window and now + horizon"""
+        until = now + self.horizon
+        rows = await run_db(get_pending_reminders, self._loaded_until, until)
+        for row in rows:
+            when = datetime.fromisoformat(row["reminder_time"])
+            if row["recurrence"]:
+                when = next_after(parse_rule(row["recurrence"]), when, self._loaded_until)
+            if when <= until:
+                self._push(when, row["id"], row["user_id"])
+        self._loaded_until = until
+        self._next_refresh = now + self.refresh
+
+    def _push(self, reminder_time: datetime, reminder_id: int, user_id: str) -> None:
+        if reminder_id in self._tracked:
+            return
+        self._tracked[reminder_id] = reminder_time
+        heapq.heappush(self._heap, (reminder_time, reminder_id, user_id))
+
+    def schedule(self, reminder_id: int, user_id: str, reminder_time: datetime) -> None:
+        """Track a newly created reminder if it falls inside the horizon"""
+        if self._loaded_until is None or reminder_time > datetime.now() + self.horizon:
+            return
+        self._push(reminder_time, reminder_id, user_id)
+        self._wakeup.set()
+
+    def cancel(self, reminder_id: int) -> None:
+        """Stop tracking a completed or deleted reminder"""
+        self._tracked.pop(reminder_id, None)
+
+    def reschedule(self, reminder_id: int, user_id: str, reminder_time: datetime) -> None:
+        """Move a recurring reminder to its next occurrence"""
+        self.cancel(reminder_id)
+        self.schedule(reminder_id, user_id, reminder_time)
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[user_id]
+
+    def version(self, user_id: str) -> int:
+        return self._versions.get(user_id, 0)
+
+    def publish(self, user_id: str, event: str, data) -> None:
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        for queue in self._subscribers.get(user_id, ()):
+            queue.put_nowait((event, data))
+
+    def _pop_due(self, now: datetime) -> Dict[int, datetime]:
+        due = {}
+        while self._heap and self._heap[0][0] <= now:
+            when, reminder_id, _ = heapq.heappop(self._heap)
+            if self._tracked.get(reminder_id) != when:
+                continue
+            del self._tracked[reminder_id]
+            due[reminder_id] = when
+        return due
+
+    async def _fire(self, due: Dict[int, datetime]) -> None:
+        reminder_ids = list(due)
+        for i in range(0, len(reminder_ids), FETCH_CHUNK):
+            rows = await run_db(get_reminders_by_ids, reminder_ids[i:i + FETCH_CHUNK])
+            for row in rows:
+                if row["recurrence"]:
+                    when = due[row["id"]]
+                    # The row keeps its current reminder_time until completed; push this occurrence's time
+                    self.publish(row["user_id"], "due", [dict(row, reminder_time=when.isoformat())])
+                    following = next_after(
+                        parse_rule(row["recurrence"]), datetime.fromisoformat(row["reminder_time"]), when
+                    )
+                    if following <= self._loaded_until:
+                        self._push(following, row["id"], row["user_id"])
+                else:
+                    self.publish(row["user_id"], "due", [row])
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            now = datetime.now()
+            if now >= self._next_refresh:
+                try:
+                    await self._load_window(now)
+                except Exception:
+                    logger.exception("Failed to load upcoming reminders")
+                    self._next_refresh = now + self.refresh
+
+            due = self._pop_due(now)
+            if due:
+                try:
+                    await self._fire(due)
+                except Exception:
+                    logger.exception("Failed to deliver due reminders")
+
+            wake_at = self._next_refresh
+            if self._heap and self._heap[0][0] < wake_at:
+                wake_at = self._heap[0][0]
+            timeout = max(0.0, (wake_at - datetime.now()).total_seconds())
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+scheduler = ReminderScheduler()
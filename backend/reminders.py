@@ -1,17 +1,101 @@
+import asyncio
+import heapq
+import itertools
+import os
 import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Optional, Dict
+from functools import partial
+from typing import Any, Callable, List, Optional, Dict, Tuple
 from pathlib import Path
+import metrics
+from recurrence import next_after, occurrences, parse_rule
 
-DB_PATH = Path(__file__).parent / "reminders.db"
+DB_PATH = Path(os.getenv("REMINDERS_DB_PATH", Path(__file__).parent / "reminders.db"))
+
+# Size of the thread pool that runs reminder queries off the event loop.
+# Each pool thread keeps one long-lived connection, so this is also the pool size.
+DB_WORKERS = int(os.getenv("REMINDERS_DB_WORKERS", "4"))
+
+_local = threading.local()
+_executor: Optional[ThreadPoolExecutor] = None
+# Bumped by configure() so threads reopen their connection against the new path
+_generation = 0
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, cached_statements=64)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def _conn() -> sqlite3.Connection:
+    """Return this thread's connection, opening it on first use"""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.generation != _generation:
+        if conn is not None:
+            conn.close()
+        conn = _connect()
+        _local.conn = conn
+        _local.generation = _generation
+    return conn
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="reminders-db")
+    return _executor
+
+
+async def run_db(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a reminder query on the DB thread pool instead of the event loop"""
+    loop = asyncio.get_running_loop()
+    with metrics.STAGE_LATENCY.time("reminder_db"):
+        return await loop.run_in_executor(_get_executor(), partial(func, *args, **kwargs))
+
+
+def configure(db_path: Path) -> None:
+    """Point the store at a different database file (used by benchmarks)"""
+    global DB_PATH, _generation
+    DB_PATH = Path(db_path)
+    _generation += 1
+    init_db()
+
+
+def _open_connection(barrier: threading.Barrier) -> None:
+    _conn()
+    # Hold this thread until every worker has started, so each one opens its own connection
+    barrier.wait(timeout=10)
+
+
+async def open_db() -> None:
+    """Create the schema, then open a connection on every pool thread ahead of the first request"""
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    await loop.run_in_executor(executor, init_db)
+    barrier = threading.Barrier(DB_WORKERS)
+    await asyncio.gather(*(loop.run_in_executor(executor, _open_connection, barrier) for _ in range(DB_WORKERS)))
+
+
+def close_db() -> None:
+    """Stop the DB thread pool; connections are reopened on next use"""
+    global _executor, _generation
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+    _generation += 1
 
 
 def init_db():
     """Initialize the reminders database"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
+    conn = _conn()
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS reminders (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id TEXT NOT NULL,
@@ -19,109 +103,290 @@ def init_db():
             description TEXT,
             reminder_time TEXT NOT NULL,
             created_at TEXT NOT NULL,
-            completed INTEGER DEFAULT 0
+            completed INTEGER DEFAULT 0,
+            recurrence TEXT
         )
     """)
-    
+    # Databases created before recurring reminders lack the rule column
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(reminders)")}
+    if "recurrence" not in columns:
+        conn.execute("ALTER TABLE reminders ADD COLUMN recurrence TEXT")
+    # Covers both the per-user listing and the due-reminder range scan
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reminders_user_completed_time
+        ON reminders (user_id, completed, reminder_time)
+    """)
+    # Cross-user scan of upcoming reminders used by the push scheduler
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reminders_completed_time
+        ON reminders (completed, reminder_time)
+    """)
+    # Open recurring reminders whose next fire time has passed still have future occurrences
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reminders_recurring
+        ON reminders (user_id, reminder_time)
+        WHERE recurrence IS NOT NULL AND completed = 0
+    """)
     conn.commit()
-    conn.close()
 
 
-def create_reminder(user_id: str, title: str, reminder_time: datetime, description: str = "") -> int:
+def _insert(
+    conn: sqlite3.Connection,
+    user_id: str,
+    title: str,
+    reminder_time: datetime,
+    description: str,
+    recurrence: Optional[str] = None,
+) -> Dict:
+    created_at = datetime.now().isoformat()
+    cursor = conn.execute("""
+        INSERT INTO reminders (user_id, title, description, reminder_time, created_at, recurrence)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (user_id, title, description, reminder_time.isoformat(), created_at, recurrence))
+    # Build the row from what was just written instead of reading it back
+    return {
+        "id": cursor.lastrowid,
+        "user_id": user_id,
+        "title": title,
+        "description": description,
+        "reminder_time": reminder_time.isoformat(),
+        "created_at": created_at,
+        "completed": 0,
+        "recurrence": recurrence,
+    }
+
+
+def create_reminder_row(
+    user_id: str,
+    title: str,
+    reminder_time: datetime,
+    description: str = "",
+    recurrence: Optional[str] = None,
+) -> Dict:
+    """
+    Create a new reminder and return its row.
+    For a recurring reminder, reminder_time is the first occurrence of the recurrence rule.
+    """
+    conn = _conn()
+    with conn:
+        return _insert(conn, user_id, title, reminder_time, description, recurrence)
+
+
+def create_reminder(
+    user_id: str,
+    title: str,
+    reminder_time: datetime,
+    description: str = "",
+    recurrence: Optional[str] = None,
+) -> int:
     """Create a new reminder"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        INSERT INTO reminders (user_id, title, description, reminder_time, created_at)
-        VALUES (?, ?, ?, ?, ?)
-    """, (user_id, title, description, reminder_time.isoformat(), datetime.now().isoformat()))
-    
-    reminder_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    
-    return reminder_id
+    return create_reminder_row(user_id, title, reminder_time, description, recurrence)["id"]
 
 
-def get_reminders(user_id: str, include_completed: bool = False) -> List[Dict]:
-    """Get all reminders for a user"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    if include_completed:
-        cursor.execute("""
-            SELECT * FROM reminders 
-            WHERE user_id = ? 
-            ORDER BY reminder_time ASC
-        """, (user_id,))
-    else:
-        cursor.execute("""
-            SELECT * FROM reminders 
-            WHERE user_id = ? AND completed = 0 
-            ORDER BY reminder_time ASC
-        """, (user_id,))
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
+def create_reminders(user_id: str, items: List[Tuple[str, datetime, str, Optional[str]]]) -> List[Dict]:
+    """Create (title, reminder_time, description, recurrence) reminders in one transaction"""
+    conn = _conn()
+    with conn:
+        return [_insert(conn, user_id, *item) for item in items]
+
+
+def _page_clause(limit: Optional[int], after: Optional[Tuple[str, int]], params: list) -> Tuple[str, str]:
+    """SQL fragments for a keyset page ordered by (reminder_time, id)"""
+    where = ""
+    if after is not None:
+        where = " AND (reminder_time, id) > (?, ?)"
+        params.extend(after)
+    tail = " ORDER BY reminder_time ASC, id ASC"
+    if limit is not None:
+        tail += " LIMIT ?"
+    return where, tail
+
+
+def get_reminders(
+    user_id: str,
+    include_completed: bool = False,
+    limit: Optional[int] = None,
+    after: Optional[Tuple[str, int]] = None,
+) -> List[Dict]:
+    """
+    Get reminders for a user, ordered by (reminder_time, id).
+    Pass the (reminder_time, id) of the last row seen as after to get the next page.
+    """
+    conn = _conn()
+
+    params: list = [user_id]
+    completed = "" if include_completed else " AND completed = 0"
+    where, tail = _page_clause(limit, after, params)
+    if limit is not None:
+        params.append(limit)
+    rows = conn.execute(
+        f"SELECT * FROM reminders WHERE user_id = ?{completed}{where}{tail}", params
+    ).fetchall()
+
     return [dict(row) for row in rows]
 
 
-def get_due_reminders(user_id: str) -> List[Dict]:
+def get_due_reminders(
+    user_id: str,
+    limit: Optional[int] = None,
+    after: Optional[Tuple[str, int]] = None,
+) -> List[Dict]:
     """Get reminders that are due (past current time and not completed)"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
+    conn = _conn()
+
     now = datetime.now().isoformat()
-    cursor.execute("""
-        SELECT * FROM reminders 
-        WHERE user_id = ? AND completed = 0 AND reminder_time <= ?
+    params: list = [user_id, now]
+    where, tail = _page_clause(limit, after, params)
+    if limit is not None:
+        params.append(limit)
+    rows = conn.execute(
+        f"SELECT * FROM reminders WHERE user_id = ? AND completed = 0 AND reminder_time <= ?{where}{tail}", params
+    ).fetchall()
+
+    return [dict(row) for row in rows]
+
+
+def get_occurrences(user_id: str, start: datetime, end: datetime, limit: int) -> List[Dict]:
+    """
+    Expand a user's open reminders into occurrences within [start, end], ordered by
+    (reminder_time, id) and capped at limit. Each occurrence is its reminder's row with
+    reminder_time set to the occurrence time.
+    """
+    conn = _conn()
+    rows = conn.execute("""
+        SELECT * FROM reminders
+        WHERE user_id = ? AND completed = 0 AND reminder_time >= ? AND reminder_time <= ?
+        UNION ALL
+        SELECT * FROM reminders
+        WHERE user_id = ? AND recurrence IS NOT NULL AND completed = 0 AND reminder_time < ?
+    """, (user_id, start.isoformat(), end.isoformat(), user_id, start.isoformat())).fetchall()
+
+    def expand(row: sqlite3.Row):
+        row = dict(row)
+        if not row["recurrence"]:
+            yield row["reminder_time"], row["id"], row
+            return
+        anchor = datetime.fromisoformat(row["reminder_time"])
+        for when in occurrences(parse_rule(row["recurrence"]), anchor, start, end, limit):
+            yield when.isoformat(), row["id"], dict(row, reminder_time=when.isoformat())
+
+    merged = heapq.merge(*(expand(row) for row in rows), key=lambda item: item[:2])
+    return [row for _, _, row in itertools.islice(merged, limit)]
+
+
+def get_pending_reminders(start: datetime, end: datetime) -> List[Dict]:
+    """
+    Get uncompleted reminders for all users with start < reminder_time <= end, plus
+    recurring reminders whose next fire time is at or before start, since later
+    occurrences of those can still fall in the window.
+    """
+    conn = _conn()
+    rows = conn.execute("""
+        SELECT id, user_id, reminder_time, recurrence FROM reminders
+        WHERE completed = 0 AND reminder_time > ? AND reminder_time <= ?
+        UNION ALL
+        SELECT id, user_id, reminder_time, recurrence FROM reminders
+        WHERE recurrence IS NOT NULL AND completed = 0 AND reminder_time <= ?
+    """, (start.isoformat(), end.isoformat(), start.isoformat())).fetchall()
+
+    return [dict(row) for row in rows]
+
+
+def get_reminders_by_ids(reminder_ids: List[int]) -> List[Dict]:
+    """Get the uncompleted reminders among the given ids"""
+    if not reminder_ids:
+        return []
+    conn = _conn()
+    placeholders = ",".join("?" * len(reminder_ids))
+    rows = conn.execute(f"""
+        SELECT * FROM reminders
+        WHERE id IN ({placeholders}) AND completed = 0
         ORDER BY reminder_time ASC
-    """, (user_id, now))
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
+    """, list(reminder_ids)).fetchall()
+
     return [dict(row) for row in rows]
 
 
+def next_occurrence(row: Dict, now: datetime) -> datetime:
+    """Next fire time of a recurring reminder once its current occurrence is done"""
+    current = datetime.fromisoformat(row["reminder_time"])
+    # Occurrences missed while the reminder sat due collapse into this one
+    return next_after(parse_rule(row["recurrence"]), current, max(current, now))
+
+
 def complete_reminder(reminder_id: int, user_id: str) -> bool:
     """Mark a reminder as completed"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        UPDATE reminders 
-        SET completed = 1 
-        WHERE id = ? AND user_id = ?
-    """, (reminder_id, user_id))
-    
-    success = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
-    
-    return success
+    return bool(complete_reminder_rows([reminder_id], user_id))
 
 
 def delete_reminder(reminder_id: int, user_id: str) -> bool:
     """Delete a reminder"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        DELETE FROM reminders 
+    conn = _conn()
+    cursor = conn.execute("""
+        DELETE FROM reminders
         WHERE id = ? AND user_id = ?
     """, (reminder_id, user_id))
-    
-    success = cursor.rowcount > 0
     conn.commit()
-    conn.close()
-    
-    return success
 
+    return cursor.rowcount > 0
+
+
+def complete_reminder_rows(reminder_ids: List[int], user_id: str) -> List[Dict]:
+    """
+    Complete reminders in one transaction. Recurring reminders stay open; their
+    reminder_time advances in place to the next occurrence instead. Returns
+    {id, reminder_time, recurrence, completed} for every id that matched.
+    """
+    if not reminder_ids:
+        return []
+    conn = _conn()
+    placeholders = ",".join("?" * len(reminder_ids))
+    now = datetime.now()
+    with conn:
+        recurring = conn.execute(f"""
+            SELECT id, reminder_time, recurrence FROM reminders
+            WHERE user_id = ? AND id IN ({placeholders}) AND recurrence IS NOT NULL
+        """, [user_id, *reminder_ids]).fetchall()
+        advanced = [
+            {
+                "id": row["id"],
+                "reminder_time": next_occurrence(row, now).isoformat(),
+                "recurrence": row["recurrence"],
+                "completed": 0,
+            }
+            for row in recurring
+        ]
+        conn.executemany(
+            "UPDATE reminders SET reminder_time = ? WHERE id = ?",
+            [(row["reminder_time"], row["id"]) for row in advanced],
+        )
+        rows = conn.execute(f"""
+            UPDATE reminders
+            SET completed = 1
+            WHERE user_id = ? AND id IN ({placeholders}) AND recurrence IS NULL
+            RETURNING id, reminder_time, recurrence, completed
+        """, [user_id, *reminder_ids]).fetchall()
+
+    return advanced + [dict(row) for row in rows]
+
+
+def complete_reminders(reminder_ids: List[int], user_id: str) -> List[int]:
+    """Mark many reminders completed in one transaction; returns the ids that matched"""
+    return [row["id"] for row in complete_reminder_rows(reminder_ids, user_id)]
+
+
+def delete_reminders(reminder_ids: List[int], user_id: str) -> List[int]:
+    """Delete many reminders in one statement; returns the ids that existed"""
+    if not reminder_ids:
+        return []
+    conn = _conn()
+    placeholders = ",".join("?" * len(reminder_ids))
+    with conn:
+        rows = conn.execute(f"""
+            DELETE FROM reminders
+            WHERE user_id = ? AND id IN ({placeholders})
+            RETURNING id
+        """, [user_id, *reminder_ids]).fetchall()
+
+    return [row["id"] for row in rows]
 
-# Initialize DB on import
-init_db()
@@ -0,0 +1,109 @@
+"""
+Deterministic fast path between NLU and the LLM.
+
+Messages whose intent can be answered exactly without a model (setting a
+reminder, a bare greeting, opening a known app) are resolved locally in a few
+milliseconds, as are near-duplicates of a question in the FAQ corpus.
+Everything else, and anything a handler is unsure about, falls through to the
+LLM.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+import faq_engine
+from models import Intent
+
+LLM_ROUTE = "llm"
+
+# Handlers only run when NLU is at least this sure of the intent
+MIN_CONFIDENCE = 0.5
+
+
+@dataclass
+class RouteResult:
+    route: str
+    reply: str
+    reminder_id: Optional[int] = None
+    trace: List[str] = field(default_factory=list)
+
+
+# A handler takes (text, entities, user_id) and returns None to fall through to the LLM
+Handler = Callable[[str, Dict[str, str], str], Awaitable[Optional[RouteResult]]]
+
+_handlers: Dict[str, Handler] = {}
+
+
+def register_route(intent: str, handler: Handler) -> None:
+    """Resolve messages with this intent locally when the handler accepts them"""
+    _handlers[intent] = handler
+
+
+GREETING_ONLY = re.compile(
+    r"^\s*(?:hello|hi|hey|good\s+(?:morning|afternoon|evening))(?:\s+(?:there|again))?[\s!.,]*$",
+    re.IGNORECASE,
+)
+
+GREETING_REPLY = (
+    "Hi! I can set reminders, summarize, explain technical topics in plain language, "
+    "or help prep for interviews. What do you need?"
+)
+
+APP_URLS = {
+    "linkedin": ("LinkedIn", "https://www.linkedin.com"),
+    "calendly": ("Calendly", "https://calendly.com"),
+    "gmail": ("Gmail", "https://mail.google.com"),
+    "slack": ("Slack", "https://app.slack.com"),
+    "notion": ("Notion", "https://www.notion.so"),
+    "jira": ("Jira", "https://www.atlassian.com/software/jira"),
+}
+
+OPEN_APP_ONLY = re.compile(
+    r"^\s*(?:please\s+)?(?:open|launch|go\s+to|pull\s+up|show(?:\s+me)?)\s+(?:my\s+|the\s+)?"
+    rf"(?P<app>{'|'.join(APP_URLS)})(?:\s+(?:app|for\s+me))?(?:\s+please)?[\s!.]*$",
+    re.IGNORECASE,
+)
+
+
+async def _greeting(text: str, entities: Dict[str, str], user_id: str) -> Optional[RouteResult]:
+    # "hi, can you explain X?" is a question, not a greeting
+    if not GREETING_ONLY.match(text):
+        return None
+    return RouteResult("greeting", GREETING_REPLY)
+
+
+async def _open_app(text: str, entities: Dict[str, str], user_id: str) -> Optional[RouteResult]:
+    match = OPEN_APP_ONLY.match(text)
+    if not match:
+        return None
+    name, url = APP_URLS[match.group("app").lower()]
+    return RouteResult("open_app", f"Opening {name}: {url}")
+
+
+register_route("greeting", _greeting)
+register_route("open_app", _open_app)
+
+
+async def route(
+    text: str,
+    intent: Intent,
+    entities: Dict[str, str],
+    task: Optional[str] = None,
+    user_id: str = "default_user",
+) -> Optional[RouteResult]:
+    """
+    Resolve the message locally, on behalf of user_id, if a handler accepts it
+    or it closely matches an FAQ question. Returns None when the message should
+    go to the LLM. Task modes (mock interview, cover letter...) always go to the LLM.
+    """
+    if task:
+        return None
+    handler = _handlers.get(intent.label)
+    if handler is not None and intent.confidence >= MIN_CONFIDENCE:
+        result = await handler(text, entities, user_id)
+        if result is not None:
+            return result
+
+    match = faq_engine.answer(text, faq_engine.MIN_SCORE)
+    if match is None:
+        return None
+    return RouteResult("faq", match.answer, trace=[f"faq:id={match.id}", f"faq:score={match.score:.2f}"])
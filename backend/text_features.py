@@ -0,0 +1,37 @@
+"""
+Hashed n-gram features shared by the FAQ index and the intent model.
+
+Word unigrams and bigrams, plus character trigrams of each word so typos and
+inflections still overlap, are hashed into a fixed number of buckets with
+crc32 (stable across processes, unlike hash()). No vocabulary is stored.
+"""
+import re
+import zlib
+from typing import Dict, FrozenSet, List
+
+TOKEN = re.compile(r"[a-z0-9+#]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN.findall(text.lower().replace("'", ""))
+
+
+def hashed_ngrams(text: str, dim: int, stopwords: FrozenSet[str] = frozenset()) -> Dict[int, int]:
+    """
+    Bucket -> count for text; dim must be a power of two.
+    Stopwords are left out of unigrams and trigrams but kept in bigrams, so "how do" still counts.
+    """
+    tokens = tokenize(text)
+    counts: Dict[int, int] = {}
+    grams = [f"b:{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    for token in tokens:
+        if token in stopwords:
+            continue
+        grams.append(f"w:{token}")
+        padded = f"<{token}>"
+        grams.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    mask = dim - 1
+    for gram in grams:
+        bucket = zlib.crc32(gram.encode()) & mask
+        counts[bucket] = counts.get(bucket, 0) + 1
+    return counts
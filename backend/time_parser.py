@@ -1,120 +1,303 @@
+import calendar
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 import re
-from typing import Optional
+from typing import Optional, Tuple
 
+from recurrence import Rule, next_after
 
-def parse_natural_time(text: str) -> Optional[datetime]:
+MONTHS = {
+    'january': 1, 'jan': 1, 'february': 2, 'feb': 2, 'march': 3, 'mar': 3,
+    'april': 4, 'apr': 4, 'may': 5, 'june': 6, 'jun': 6,
+    'july': 7, 'jul': 7, 'august': 8, 'aug': 8, 'september': 9, 'sept': 9, 'sep': 9,
+    'october': 10, 'oct': 10, 'november': 11, 'nov': 11, 'december': 12, 'dec': 12
+}
+
+WEEKDAYS = {
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
+    'friday': 4, 'saturday': 5, 'sunday': 6
+}
+
+UNITS = {
+    'minute': timedelta(minutes=1), 'min': timedelta(minutes=1),
+    'hour': timedelta(hours=1), 'hr': timedelta(hours=1),
+    'day': timedelta(days=1), 'week': timedelta(weeks=1),
+}
+
+DEFAULT_HOUR = 9  # date without a time of day -> 9am
+TONIGHT_HOUR = 20
+
+_MONTH_ALT = '|'.join(sorted(MONTHS, key=len, reverse=True))
+_WEEKDAY_ALT = '|'.join(WEEKDAYS)
+_UNIT_ALT = '|'.join(sorted(UNITS, key=len, reverse=True))
+
+# Every recognised token in one alternation, compiled once at import.
+# Order matters where alternatives can start at the same position: dates
+# that begin with digits are tried before clock times, and "at 3:30pm" is
+# tried before the bare "at 3".
+_TOKENS = re.compile(rf"""
+    \bin\s+(?P<rel_n>\d+|an?|one)\s*(?P<rel_unit>{_UNIT_ALT})s?\b
+  | \b(?P<iso>\d{{4}}-\d{{2}}-\d{{2}})(?:[t\s](?P<iso_h>\d{{2}}):(?P<iso_m>\d{{2}}))?\b
+  | \b(?P<md_month>{_MONTH_ALT})\.?\s+(?P<md_day>\d{{1,2}})(?:st|nd|rd|th)?\b
+  | \b(?P<dm_day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<dm_month>{_MONTH_ALT})\b
+  | \b(?P<day_word>today|tonight|tomorrow)\b
+  | \bnext\s+(?P<next_unit>week|month)\b
+  | \b(?:next\s+|this\s+|on\s+)?(?P<weekday>{_WEEKDAY_ALT})\b
+  | \b(?:at\s+)?(?P<clock_h>\d{{1,2}})(?::(?P<clock_m>\d{{2}}))?\s*(?P<meridiem>am|pm|a\.m\.|p\.m\.)
+  | \b(?:at\s+)?(?P<hm_h>\d{{1,2}}):(?P<hm_m>\d{{2}})\b
+  | \bat\s+(?P<at_h>\d{{1,2}})\b
+  | \b(?P<named_time>noon|midday|midnight)\b
+""", re.VERBOSE)
+
+
+@dataclass
+class TimeParseResult:
+    when: datetime
+    # (start, end) character offsets of the time expression in the input
+    span: Tuple[int, int]
+    # 0-1; explicit dates with times score highest, bare clock times lowest
+    confidence: float
+
+
+def _valid_clock(hour: int, minute: int) -> bool:
+    return 0 <= hour <= 23 and 0 <= minute <= 59
+
+
+def _is_clock(match: re.Match) -> bool:
+    return bool(match.group('meridiem') or match.group('hm_h') or match.group('at_h') or match.group('named_time'))
+
+
+def _clock(match: re.Match) -> Optional[Tuple[int, int, bool]]:
+    """Return (hour, minute, explicit) for a time-of-day token, or None when it is not a real time ("25:30", "13pm")"""
+    if match.group('clock_h'):
+        hour = int(match.group('clock_h'))
+        minute = int(match.group('clock_m') or 0)
+        if not 1 <= hour <= 12 or not _valid_clock(hour, minute):
+            return None
+        meridiem = match.group('meridiem')[0]
+        if meridiem == 'p' and hour != 12:
+            hour += 12
+        elif meridiem == 'a' and hour == 12:
+            hour = 0
+        return hour, minute, True
+    if match.group('hm_h'):
+        hour, minute = int(match.group('hm_h')), int(match.group('hm_m'))
+        return (hour, minute, True) if _valid_clock(hour, minute) else None
+    if match.group('named_time'):
+        return (0 if match.group('named_time') == 'midnight' else 12), 0, True
+    # "at 3" with no am/pm: assume working hours, so 1-7 means afternoon
+    hour = int(match.group('at_h'))
+    if not _valid_clock(hour, 0):
+        return None
+    if 1 <= hour <= 7:
+        hour += 12
+    return hour, 0, False
+
+
+def _anchor(match: re.Match, now: datetime) -> Tuple[Optional[datetime], float]:
+    """Resolve a date token to a day (time of day not yet applied) and a confidence"""
+    if match.group('iso'):
+        try:
+            return datetime.strptime(match.group('iso'), '%Y-%m-%d'), 0.95
+        except ValueError:
+            return None, 0.0
+    month_name = match.group('md_month') or match.group('dm_month')
+    if month_name:
+        month = MONTHS[month_name]
+        day = int(match.group('md_day') or match.group('dm_day'))
+        try:
+            target = datetime(now.year, month, day)
+            # If the date has passed this year, assume next year
+            if target.date() < now.date():
+                target = datetime(now.year + 1, month, day)
+            return target, 0.9
+        except ValueError:
+            return None, 0.0
+    day_word = match.group('day_word')
+    if day_word:
+        return (now + timedelta(days=1) if day_word == 'tomorrow' else now), 0.9
+    next_unit = match.group('next_unit')
+    if next_unit == 'week':
+        return now + timedelta(weeks=1), 0.8
+    if next_unit == 'month':
+        # Approximate next month as +30 days
+        return now + timedelta(days=30), 0.8
+    days_ahead = WEEKDAYS[match.group('weekday')] - now.weekday()
+    if days_ahead <= 0:  # Target day already happened this week
+        days_ahead += 7
+    return now + timedelta(days=days_ahead), 0.9
+
+
+def parse_time(text: str, now: Optional[datetime] = None) -> Optional[TimeParseResult]:
     """
-    Parse natural language time expressions into datetime objects.
+    Find the time expression in text with a single pass over the input.
+    Returns None when no time is mentioned. Tokens that are not real times,
+    such as "25:30" or "in 999999999 days", are skipped rather than raising.
     Examples:
     - "tomorrow at 2pm" -> tomorrow at 14:00
     - "next monday" -> next monday at 09:00
     - "in 3 hours" -> current time + 3 hours
     - "january 15 at 3:30pm" -> Jan 15 at 15:30
     """
-    text = text.lower().strip()
-    now = datetime.now()
-    
-    # "in X minutes/hours/days/weeks"
-    match = re.search(r'in (\d+)\s*(minute|hour|day|week)s?', text)
-    if match:
-        amount = int(match.group(1))
-        unit = match.group(2)
-        
-        if unit == 'minute':
-            return now + timedelta(minutes=amount)
-        elif unit == 'hour':
-            return now + timedelta(hours=amount)
-        elif unit == 'day':
-            return now + timedelta(days=amount)
-        elif unit == 'week':
-            return now + timedelta(weeks=amount)
-    
-    # Extract time if present (e.g., "2pm", "14:30", "3:45 pm")
-    time_match = re.search(r'(\d{1,2})(?::(\d{2}))?\s*(am|pm)?', text)
-    target_hour = 9  # default to 9am
-    target_minute = 0
-    
-    if time_match:
-        hour = int(time_match.group(1))
-        minute = int(time_match.group(2)) if time_match.group(2) else 0
-        meridiem = time_match.group(3)
-        
-        if meridiem == 'pm' and hour != 12:
-            hour += 12
-        elif meridiem == 'am' and hour == 12:
-            hour = 0
-        
-        target_hour = hour
-        target_minute = minute
-    
-    # "tomorrow"
-    if 'tomorrow' in text:
-        target = now + timedelta(days=1)
-        return target.replace(hour=target_hour, minute=target_minute, second=0, microsecond=0)
-    
-    # "today"
-    if 'today' in text:
-        target = now.replace(hour=target_hour, minute=target_minute, second=0, microsecond=0)
-        if target < now:  # if time already passed today, assume tomorrow
-            target += timedelta(days=1)
-        return target
-    
-    # Days of the week
-    weekdays = {
-        'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
-        'friday': 4, 'saturday': 5, 'sunday': 6
-    }
-    
-    for day_name, day_num in weekdays.items():
-        if day_name in text:
-            days_ahead = day_num - now.weekday()
-            if days_ahead <= 0:  # Target day already happened this week
-                days_ahead += 7
-            target = now + timedelta(days=days_ahead)
-            return target.replace(hour=target_hour, minute=target_minute, second=0, microsecond=0)
-    
-    # "next week", "next month"
-    if 'next week' in text:
-        target = now + timedelta(weeks=1)
-        return target.replace(hour=target_hour, minute=target_minute, second=0, microsecond=0)
-    
-    if 'next month' in text:
-        # Approximate next month as +30 days
-        target = now + timedelta(days=30)
-        return target.replace(hour=target_hour, minute=target_minute, second=0, microsecond=0)
-    
-    # Specific date patterns (e.g., "january 15", "jan 15")
-    month_names = {
-        'january': 1, 'jan': 1, 'february': 2, 'feb': 2, 'march': 3, 'mar': 3,
-        'april': 4, 'apr': 4, 'may': 5, 'june': 6, 'jun': 6,
-        'july': 7, 'jul': 7, 'august': 8, 'aug': 8, 'september': 9, 'sep': 9,
-        'october': 10, 'oct': 10, 'november': 11, 'nov': 11, 'december': 12, 'dec': 12
-    }
-    
-    for month_name, month_num in month_names.items():
-        pattern = rf'{month_name}\s+(\d{{1,2}})'
-        match = re.search(pattern, text)
-        if match:
-            day = int(match.group(1))
-            year = now.year
-            # If the date has passed this year, assume next year
+    lowered = text.lower()
+    now = now or datetime.now()
+
+    anchor = anchor_match = None
+    anchor_confidence = 0.0
+    clock_match = clock = None
+    day_word = None
+
+    for match in _TOKENS.finditer(lowered):
+        if match.group('rel_unit'):
+            amount = match.group('rel_n')
+            amount = int(amount) if amount.isdigit() else 1
             try:
-                target = datetime(year, month_num, day, target_hour, target_minute)
-                if target < now:
-                    target = datetime(year + 1, month_num, day, target_hour, target_minute)
-                return target
-            except ValueError:
+                return TimeParseResult(now + amount * UNITS[match.group('rel_unit')], match.span(), 0.95)
+            except OverflowError:
                 continue
-    
-    # ISO date format "2026-01-15"
-    iso_match = re.search(r'(\d{4})-(\d{2})-(\d{2})', text)
-    if iso_match:
-        year, month, day = map(int, iso_match.groups())
-        try:
-            return datetime(year, month, day, target_hour, target_minute)
-        except ValueError:
-            pass
-    
-    # Default: if we couldn't parse, return tomorrow at 9am
-    return (now + timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
+        if match.group('iso_h'):
+            date, _ = _anchor(match, now)
+            hour, minute = int(match.group('iso_h')), int(match.group('iso_m'))
+            if date is not None and _valid_clock(hour, minute):
+                return TimeParseResult(date.replace(hour=hour, minute=minute), match.span(), 0.95)
+        elif _is_clock(match):
+            if clock_match is None:
+                clock = _clock(match)
+                if clock is not None:
+                    clock_match = match
+        elif anchor_match is None:
+            anchor, anchor_confidence = _anchor(match, now)
+            if anchor is not None:
+                anchor_match = match
+                day_word = match.group('day_word')
+
+    if anchor_match is None and clock_match is None:
+        return None
+
+    spans = [m.span() for m in (anchor_match, clock_match) if m is not None]
+    span = (min(s[0] for s in spans), max(s[1] for s in spans))
+
+    if clock is not None:
+        hour, minute, explicit = clock
+        if day_word == 'tonight' and hour < 12:
+            hour += 12
+    else:
+        hour, minute, explicit = (TONIGHT_HOUR if day_word == 'tonight' else DEFAULT_HOUR), 0, False
+
+    if anchor_match is None:
+        # A time with no date means the next occurrence of that time
+        target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if target < now:
+            target += timedelta(days=1)
+        return TimeParseResult(target, span, 0.7 if explicit else 0.5)
+
+    target = anchor.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if day_word in ('today', 'tonight') and target < now:  # if time already passed today, assume tomorrow
+        target += timedelta(days=1)
+    confidence = anchor_confidence if explicit else anchor_confidence - 0.1
+    return TimeParseResult(target, span, round(confidence, 2))
+
+
+def parse_natural_time(text: str, now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Parse natural language time expressions into datetime objects.
+    Returns None when the text does not mention a time.
+    """
+    result = parse_time(text, now)
+    return result.when if result else None
+
+
+_WEEKDAY_NAME = rf"(?:{_WEEKDAY_ALT})s?"
+
+_RECURRENCE = re.compile(rf"""
+    \b(?:every|each)\s+(?:(?P<every_n>\d+|other)\s+)?(?P<every_unit>hour|day|week|month)s?\b
+  | \b(?:every|each|on)\s+(?P<day_group>weekday|weekend)s?\b
+  | \b(?:every|each)\s+(?P<days>{_WEEKDAY_NAME}(?:\s*(?:,|and|&|or)\s*{_WEEKDAY_NAME})*)
+  | \bon\s+(?P<plural_day>(?:{_WEEKDAY_ALT})s)\b
+  | \b(?P<adverb>hourly|daily|weekly|monthly)\b
+""", re.VERBOSE)
+
+_MONTH_DAY = re.compile(r"\bon\s+the\s+(?P<day>\d{1,2})(?:st|nd|rd|th)\b")
+
+_DAY_GROUPS = {'weekday': (0, 1, 2, 3, 4), 'weekend': (5, 6)}
+_ADVERB_FREQ = {'hourly': 'HOURLY', 'daily': 'DAILY', 'weekly': 'WEEKLY', 'monthly': 'MONTHLY'}
+
+
+@dataclass
+class RecurrenceParseResult:
+    rule: Rule
+    # First occurrence after now
+    first: datetime
+    span: Tuple[int, int]
+    confidence: float
+
+
+def _recurrence_rule(match: re.Match) -> Rule:
+    if match.group('every_unit'):
+        amount = match.group('every_n')
+        interval = 2 if amount == 'other' else int(amount or 1)
+        freq = {'hour': 'HOURLY', 'day': 'DAILY', 'week': 'WEEKLY', 'month': 'MONTHLY'}[match.group('every_unit')]
+        return Rule(freq, min(max(interval, 1), 1000))
+    if match.group('day_group'):
+        return Rule('WEEKLY', by_day=_DAY_GROUPS[match.group('day_group')])
+    names = match.group('days') or match.group('plural_day')
+    if names:
+        days = {WEEKDAYS[name] for name in re.findall(_WEEKDAY_ALT, names)}
+        return Rule('WEEKLY', by_day=tuple(sorted(days)))
+    return Rule(_ADVERB_FREQ[match.group('adverb')])
+
+
+def parse_recurrence(text: str, now: Optional[datetime] = None) -> Optional[RecurrenceParseResult]:
+    """
+    Find a repeating time expression in text. Returns None when there is none.
+    Examples:
+    - "every monday at 9" -> FREQ=WEEKLY;BYDAY=MO, first at the next Monday 09:00
+    - "every weekday at 8:30am" -> FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR
+    - "every 2 hours" -> FREQ=HOURLY;INTERVAL=2
+    - "every month on the 1st" -> FREQ=MONTHLY;BYMONTHDAY=1
+    """
+    lowered = text.lower()
+    now = now or datetime.now()
+
+    match = _RECURRENCE.search(lowered)
+    if match is None:
+        return None
+    rule = _recurrence_rule(match)
+    spans = [match.span()]
+
+    if rule.freq == 'MONTHLY':
+        month_day = _MONTH_DAY.search(lowered)
+        if month_day and 1 <= int(month_day.group('day')) <= 31:
+            rule = Rule('MONTHLY', rule.interval, by_month_day=int(month_day.group('day')))
+            spans.append(month_day.span())
+
+    clock = None
+    for token in _TOKENS.finditer(lowered):
+        overlaps = any(token.start() < end and start < token.end() for start, end in spans)
+        if not overlaps and _is_clock(token):
+            clock = _clock(token)
+            if clock is not None:
+                spans.append(token.span())
+                break
+
+    span = (min(s[0] for s in spans), max(s[1] for s in spans))
+    today = now.replace(second=0, microsecond=0)
+
+    if rule.freq == 'HOURLY':
+        return RecurrenceParseResult(rule, today + timedelta(hours=rule.interval), span, 0.9)
+
+    if clock is not None:
+        hour, minute, explicit = clock
+    else:
+        hour, minute, explicit = DEFAULT_HOUR, 0, False
+    base = today.replace(hour=hour, minute=minute)
+
+    if rule.by_day:
+        # The anchor has to be an occurrence itself: the first listed weekday from today on
+        while base.weekday() not in rule.by_day:
+            base += timedelta(days=1)
+    elif rule.by_month_day is not None:
+        base = base.replace(day=min(rule.by_month_day, calendar.monthrange(base.year, base.month)[1]))
+
+    first = base if base > now else next_after(rule, base, now)
+    return RecurrenceParseResult(rule, first, span, 0.9 if explicit else 0.8)
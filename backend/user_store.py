@@ -0,0 +1,211 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+import metrics
+
+DB_PATH = Path(os.getenv("USERS_DB_PATH", Path(__file__).parent / "users.db"))
+DB_WORKERS = int(os.getenv("USERS_DB_WORKERS", "4"))
+
+# Read-through cache of user rows. Entries expire so changes made by other
+# worker processes become visible within CACHE_TTL_S.
+CACHE_SIZE = int(os.getenv("USERS_CACHE_SIZE", "10000"))
+CACHE_TTL_S = float(os.getenv("USERS_CACHE_TTL_S", "60"))
+
+_local = threading.local()
+_executor: Optional[ThreadPoolExecutor] = None
+_generation = 0
+_cache: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+
+
+class UserExistsError(Exception):
+    pass
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, cached_statements=32)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+def _conn() -> sqlite3.Connection:
+    """Return this thread's connection, opening it on first use"""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.generation != _generation:
+        if conn is not None:
+            conn.close()
+        conn = _connect()
+        _local.conn = conn
+        _local.generation = _generation
+    return conn
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="users-db")
+    return _executor
+
+
+async def _run_db(func: Callable[..., Any], *args, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    with metrics.STAGE_LATENCY.time("user_db"):
+        return await loop.run_in_executor(_get_executor(), partial(func, *args, **kwargs))
+
+
+def configure(db_path: Path) -> None:
+    """Point the store at a different database file (used by benchmarks)"""
+    global DB_PATH, _generation
+    DB_PATH = Path(db_path)
+    _generation += 1
+    _cache.clear()
+    init_db()
+
+
+def _open_connection(barrier: threading.Barrier) -> None:
+    _conn()
+    # Hold this thread until every worker has started, so each one opens its own connection
+    barrier.wait(timeout=10)
+
+
+async def open_db() -> None:
+    """Create the schema, then open a connection on every pool thread ahead of the first request"""
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    await loop.run_in_executor(executor, init_db)
+    barrier = threading.Barrier(DB_WORKERS)
+    await asyncio.gather(*(loop.run_in_executor(executor, _open_connection, barrier) for _ in range(DB_WORKERS)))
+
+
+def close_db() -> None:
+    global _executor, _generation
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+    _generation += 1
+
+
+def init_db() -> None:
+    conn = _conn()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            email TEXT PRIMARY KEY,
+            id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conn.commit()
+
+
+def _select_user(email: str) -> Optional[Dict]:
+    row = _conn().execute(
+        "SELECT email, id, name, password_hash FROM users WHERE email = ?", (email,)
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def _insert_user(user: Dict) -> None:
+    conn = _conn()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO users (email, id, name, password_hash, created_at) VALUES (?, ?, ?, ?, ?)",
+                (user["email"], user["id"], user["name"], user["password_hash"], datetime.now().isoformat()),
+            )
+    except sqlite3.IntegrityError:
+        raise UserExistsError(user["email"])
+
+
+def _update_password_hash(email: str, password_hash: str) -> None:
+    conn = _conn()
+    with conn:
+        conn.execute("UPDATE users SET password_hash = ? WHERE email = ?", (password_hash, email))
+
+
+def _cache_get(email: str) -> Optional[Dict]:
+    entry = _cache.get(email)
+    if entry is None:
+        return None
+    expires_at, user = entry
+    if expires_at < time.monotonic():
+        _cache.pop(email, None)
+        return None
+    _cache.move_to_end(email)
+    return user
+
+
+def _cache_put(email: str, user: Dict) -> None:
+    _cache[email] = (time.monotonic() + CACHE_TTL_S, user)
+    _cache.move_to_end(email)
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+async def get_user(email: str) -> Optional[Dict]:
+    """Look up a user by email, serving repeat lookups from memory"""
+    user = _cache_get(email)
+    if user is not None:
+        return user
+    user = await _run_db(_select_user, email)
+    if user is not None:
+        _cache_put(email, user)
+    return user
+
+
+async def create_user(user: Dict) -> None:
+    """Insert a user atomically; raises UserExistsError if the email is taken"""
+    await _run_db(_insert_user, user)
+    _cache_put(user["email"], user)
+
+
+async def update_password_hash(email: str, password_hash: str) -> None:
+    await _run_db(_update_password_hash, email, password_hash)
+    user = _cache_get(email)
+    if user is not None:
+        _cache_put(email, {**user, "password_hash": password_hash})
+
+
+def migrate_from_json(json_path: Path) -> int:
+    """
+    Import users from the legacy users.json file in one transaction.
+    Existing emails are left untouched, so the migration is safe to re-run.
+    Returns the number of users imported.
+    """
+    with open(json_path, "r") as f:
+        users = json.load(f)
+
+    conn = _conn()
+    now = datetime.now().isoformat()
+    with conn:
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO users (email, id, name, password_hash, created_at) VALUES (?, ?, ?, ?, ?)",
+            (
+                (email, user["id"], user["name"], user["password_hash"], now)
+                for email, user in users.items()
+            ),
+        )
+        return conn.total_changes - before
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import a legacy users.json into the SQLite user store")
+    parser.add_argument("json_path", type=Path)
+    args = parser.parse_args()
+    init_db()
+    print(f"Imported {migrate_from_json(args.json_path)} users into {DB_PATH}")
@@ -3,7 +3,7 @@
 import { useEffect, useRef, useState } from 'react'
 import { useRouter } from 'next/navigation'
 import { useChatStore } from '@/lib/store'
-import { respond, apiClient } from '@/lib/api'
+import { respond } from '@/lib/api'
 import { useThemeStore } from '@/lib/theme-store'
 import { useChatHistoryStore } from '@/lib/chat-history'
 import MessageBubble from './MessageBubble'
@@ -12,6 +12,7 @@ import ChatHistoryPanel from './ChatHistoryPanel'
 import ExportMenu from './ExportMenu'
 import { useAuth, UserButton } from '@clerk/nextjs'
 import { requestNotificationPermission, checkAndNotifyReminders } from '@/lib/notifications'
+import { subscribeReminderEvents } from '@/lib/reminder-events'
 import { startSpeechRecognition, stopSpeechRecognition, speakText, stopSpeech, isSpeaking } from '@/lib/voice'
 
 interface Reminder {
@@ -52,21 +53,13 @@ export default function ChatInterface() {
     loadFromStorage()
   }, [])
 
-  // Poll for due reminders
+  // Due reminders are pushed by the backend as they come due
   useEffect(() => {
-    const checkReminders = async () => {
-      try {
-        const { data } = await apiClient.get<Reminder[]>('/api/reminders/due')
-        await checkAndNotifyReminders(data)
-      } catch (error) {
-        console.error('Failed to check reminders:', error)
-      }
-    }
-
-    // Check immediately and then every minute
-    checkReminders()
-    const interval = setInterval(checkReminders, 60000)
-    return () => clearInterval(interval)
+    return subscribeReminderEvents({
+      onDue: (due) => {
+        checkAndNotifyReminders(due)
+      },
+    })
   }, [])
 
   const handleMicClick = () => {
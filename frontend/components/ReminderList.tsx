@@ -2,6 +2,7 @@
 
 import { useEffect, useState } from 'react'
 import { apiClient } from '@/lib/api'
+import { subscribeReminderEvents } from '@/lib/reminder-events'
 import { formatDistanceToNow } from 'date-fns'
 
 interface Reminder {
@@ -31,9 +32,8 @@ export default function ReminderList() {
 
   useEffect(() => {
     fetchReminders()
-    // Refresh every 30 seconds
-    const interval = setInterval(fetchReminders, 30000)
-    return () => clearInterval(interval)
+    // Refresh only when the backend reports a change
+    return subscribeReminderEvents({ onChanged: fetchReminders })
   }, [])
 
   const handleComplete = async (id: number) => {
@@ -11,6 +11,7 @@ import ChatHistoryPanel from './ChatHistoryPanel'
 import ExportMenu from './ExportMenu'
 import { useAuth, UserButton } from '@clerk/nextjs'
 import { requestNotificationPermission, checkAndNotifyReminders } from '@/lib/notifications'
+import { subscribeReminderEvents } from '@/lib/reminder-events'
 import { startSpeechRecognition, stopSpeechRecognition, speakText, stopSpeech, isSpeaking } from '@/lib/voice'
 
 interface Reminder {
@@ -52,17 +53,22 @@ export default function VirtualAssistant() {
   }, [loadFromStorage])
 
   useEffect(() => {
-    const interval = setInterval(async () => {
+    const fetchReminders = async () => {
       try {
         const response = await apiClient.get('/api/reminders')
         setReminders(response.data)
-        checkAndNotifyReminders(response.data)
       } catch (error) {
         console.error('Error fetching reminders:', error)
       }
-    }, 60000)
+    }
 
-    return () => clearInterval(interval)
+    fetchReminders()
+    return subscribeReminderEvents({
+      onDue: (due) => {
+        checkAndNotifyReminders(due)
+      },
+      onChanged: fetchReminders,
+    })
   }, [])
 
   const handleMicClick = () => {
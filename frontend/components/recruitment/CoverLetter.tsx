@@ -1,7 +1,7 @@
 'use client'
 
 import React, { useState } from 'react'
-import { respond } from '@/lib/api'
+import { runJob } from '@/lib/api'
 
 export default function CoverLetter({ isDark, recruiterMode, onReply }: { isDark: boolean; recruiterMode: boolean; onReply: (text: string) => void }) {
   const [role, setRole] = useState('')
@@ -17,8 +17,8 @@ export default function CoverLetter({ isDark, recruiterMode, onReply }: { isDark
     setError(null)
     const text = `Create a tailored cover letter.\nRole: ${role}\nCompany: ${company}\nHighlights: ${highlights}\nJob Description: ${jobDescription}`
     try {
-      const res = await respond(text, recruiterMode, 'cover_letter')
-      onReply(res.reply)
+      const reply = await runJob('cover_letter', text, recruiterMode)
+      onReply(reply)
     } catch (e: any) {
       console.error(e)
       setError(e?.message || 'Failed to generate cover letter. Please try again.')
@@ -1,7 +1,7 @@
 'use client'
 
 import React, { useState } from 'react'
-import { respond } from '@/lib/api'
+import { runJob } from '@/lib/api'
 import { speakText, stopSpeech } from '@/lib/voice'
 
 export default function MockInterview({ isDark, recruiterMode, onReply }: { isDark: boolean; recruiterMode: boolean; onReply: (text: string) => void }) {
@@ -16,10 +16,10 @@ export default function MockInterview({ isDark, recruiterMode, onReply }: { isDa
     setError(null)
     const text = `${lastQuestion}\nUser Answer: ${userAnswer || ''}\nPlease provide brief feedback and the next question.`
     try {
-      const res = await respond(text, recruiterMode, 'mock_interview')
-      setLastQuestion(res.reply)
-      onReply(res.reply)
-      speakText(res.reply, () => {})
+      const reply = await runJob('mock_interview', text, recruiterMode)
+      setLastQuestion(reply)
+      onReply(reply)
+      speakText(reply, () => {})
     } catch (e: any) {
       console.error(e)
       setError(e?.message || 'Failed to get next question. Please try again.')
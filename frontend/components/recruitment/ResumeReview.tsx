@@ -1,7 +1,7 @@
 'use client'
 
 import React, { useState } from 'react'
-import { respond } from '@/lib/api'
+import { runJob } from '@/lib/api'
 
 export default function ResumeReview({ isDark, recruiterMode, onReply }: { isDark: boolean; recruiterMode: boolean; onReply: (text: string) => void }) {
   const [resumeText, setResumeText] = useState('')
@@ -14,8 +14,8 @@ export default function ResumeReview({ isDark, recruiterMode, onReply }: { isDar
     setError(null)
     const text = `Review my resume and provide concise feedback and improved bullet suggestions.\nResume:\n${resumeText}`
     try {
-      const res = await respond(text, recruiterMode, 'resume_review')
-      onReply(res.reply)
+      const reply = await runJob('resume_review', text, recruiterMode)
+      onReply(reply)
     } catch (e: any) {
       console.error(e)
       setError(e?.message || 'Failed to review resume. Please try again.')
@@ -16,22 +16,33 @@ export const apiClient: AxiosInstance = axios.create({
   timeout: 15000,
 })
 
+export function getApiBaseURL(): string {
+  return currentBaseURL
+}
+
 function switchBaseURL(newBase: string) {
   currentBaseURL = newBase
   apiClient.defaults.baseURL = newBase
 }
 
+// The signed-in user's token for backend calls, or null when there is none
+export async function getAuthToken(): Promise<string | null> {
+  try {
+    const response = await fetch('/api/auth/token')
+    const data = await response.json()
+    return data.token || null
+  } catch (error) {
+    console.error('Failed to get auth token:', error)
+    return null
+  }
+}
+
 // Add Clerk token to requests (client-side)
 if (typeof window !== 'undefined') {
   apiClient.interceptors.request.use(async (config) => {
-    try {
-      const response = await fetch('/api/auth/token')
-      const data = await response.json()
-      if (data.token) {
-        config.headers.Authorization = `Bearer ${data.token}`
-      }
-    } catch (error) {
-      console.error('Failed to get auth token:', error)
+    const token = await getAuthToken()
+    if (token) {
+      config.headers.Authorization = `Bearer ${token}`
     }
     return config
   })
@@ -42,6 +53,8 @@ export interface RespondRequest {
   history?: Array<{ role: 'user' | 'assistant'; content: string }>
   recruiter_mode: boolean
   task?: string
+  // Server keeps the history for this id; send only the new turn
+  conversation_id?: string
 }
 
 export interface RespondResponse {
@@ -49,7 +62,8 @@ export interface RespondResponse {
   intent: { label: string; confidence: number }
   entities: Record<string, string>
   tool_trace: string[]
-  latency_ms: { nlu: number; llm: number; total: number }
+  latency_ms: { nlu: number; llm: number; total: number; router?: number; route?: string; queue?: number }
+  conversation_id?: string | null
 }
 
 // Overloads to support both legacy payload-based calls and new param-style calls
@@ -91,6 +105,171 @@ export async function respond(
   }
 }
 
+export interface RespondStreamHandlers {
+  onNlu?: (data: { intent: RespondResponse['intent']; entities: Record<string, string> }) => void
+  onToken: (text: string) => void
+  onDone?: (data: {
+    reply: string
+    tool_trace: string[]
+    latency_ms: RespondResponse['latency_ms'] & { first_token?: number | null }
+    reminder_id?: number | null
+  }) => void
+}
+
+// Streams /api/respond/stream (Server-Sent Events over POST) and dispatches each event
+export async function respondStream(body: RespondRequest, handlers: RespondStreamHandlers): Promise<void> {
+  const headers: Record<string, string> = { 'Content-Type': 'application/json' }
+  const token = await getAuthToken()
+  if (token) headers.Authorization = `Bearer ${token}`
+
+  const response = await fetch(`${currentBaseURL}/api/respond/stream`, {
+    method: 'POST',
+    headers,
+    body: JSON.stringify(body),
+  })
+  if (!response.ok || !response.body) {
+    throw new Error(`API error: ${response.status}`)
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  while (true) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    let boundary = buffer.indexOf('\n\n')
+    while (boundary !== -1) {
+      const frame = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      boundary = buffer.indexOf('\n\n')
+
+      let event = 'message'
+      let data = ''
+      for (const line of frame.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7)
+        else if (line.startsWith('data: ')) data += line.slice(6)
+      }
+      if (!data) continue
+      const parsed = JSON.parse(data)
+      if (event === 'nlu') handlers.onNlu?.(parsed)
+      else if (event === 'token') handlers.onToken(parsed.text)
+      else if (event === 'done') handlers.onDone?.(parsed)
+    }
+  }
+}
+
+export interface ArchivedConversation {
+  conversation_id: string
+  title: string
+  created_at: string
+  updated_at: string
+  message_count: number
+}
+
+export interface ArchiveSearchHit {
+  message_id: number
+  conversation_id: string
+  title: string
+  role: 'user' | 'assistant'
+  created_at: string
+  snippet: string
+}
+
+// A page of results; pass nextCursor back to get the next one
+export interface Page<T> {
+  items: T[]
+  nextCursor: string | null
+}
+
+async function getPage<T>(url: string, params: Record<string, any>): Promise<Page<T>> {
+  const response = await apiClient.get<T[]>(url, { params })
+  return { items: response.data, nextCursor: response.headers['x-next-cursor'] ?? null }
+}
+
+export function listConversations(cursor?: string, limit = 50): Promise<Page<ArchivedConversation>> {
+  return getPage('/api/conversations', { cursor, limit })
+}
+
+export function searchConversations(q: string, cursor?: string, limit = 20): Promise<Page<ArchiveSearchHit>> {
+  return getPage('/api/conversations/search', { q, cursor, limit })
+}
+
+export function getArchivedMessages(
+  conversationId: string,
+  cursor?: string
+): Promise<Page<{ id: number; role: 'user' | 'assistant'; content: string; created_at: string }>> {
+  return getPage(`/api/conversations/${encodeURIComponent(conversationId)}/messages`, { cursor })
+}
+
+// Upload a conversation kept in local storage, so it becomes searchable from other devices
+export async function archiveMessages(
+  conversationId: string,
+  messages: Array<{ role: 'user' | 'assistant'; content: string }>,
+  title?: string
+): Promise<void> {
+  await apiClient.post(`/api/conversations/${encodeURIComponent(conversationId)}/messages`, { messages, title })
+}
+
+export interface Job {
+  id: string
+  task: string
+  status: 'queued' | 'running' | 'succeeded' | 'failed'
+  attempts: number
+  result: string | null
+  error: string | null
+  tool_trace: string[]
+  created_at: string
+  updated_at: string
+}
+
+export async function submitJob(
+  task: string,
+  text: string,
+  recruiterMode: boolean = true,
+  history: Array<{ role: 'user' | 'assistant'; content: string }> = []
+): Promise<Job> {
+  const { data } = await apiClient.post<Job>('/api/jobs', { task, text, recruiter_mode: recruiterMode, history })
+  return data
+}
+
+export async function getJob(id: string): Promise<Job> {
+  const { data } = await apiClient.get<Job>(`/api/jobs/${id}`)
+  return data
+}
+
+// Runs a long-form task as a background job and resolves with its result.
+// Each poll is a short request, so slow generations never hit the client timeout.
+// Jobs need a verified sign-in; without one (401) the task runs as a plain request.
+export async function runJob(
+  task: string,
+  text: string,
+  recruiterMode: boolean = true,
+  history: Array<{ role: 'user' | 'assistant'; content: string }> = [],
+  pollMs = 1000,
+  maxWaitMs = 5 * 60 * 1000
+): Promise<string> {
+  let job: Job
+  try {
+    job = await submitJob(task, text, recruiterMode, history)
+  } catch (err: any) {
+    if (err?.response?.status === 401) {
+      const response = await respond({ text, task, recruiter_mode: recruiterMode, history })
+      return response.reply
+    }
+    throw new Error(`API error: ${err?.response?.data?.detail || err?.message || 'Unknown error'}`)
+  }
+  const deadline = Date.now() + maxWaitMs
+  while (job.status === 'queued' || job.status === 'running') {
+    if (Date.now() > deadline) throw new Error('The request is taking too long. Please try again later.')
+    await new Promise((resolve) => setTimeout(resolve, pollMs))
+    job = await getJob(job.id)
+  }
+  if (job.status === 'failed') throw new Error(`Generation failed: ${job.error || 'unknown error'}`)
+  return job.result || ''
+}
+
 export async function health(): Promise<any> {
   try {
     const { data } = await apiClient.get('/health')
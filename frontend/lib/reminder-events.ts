@@ -0,0 +1,59 @@
+import { getApiBaseURL, getAuthToken } from './api'
+
+export interface ReminderEvent {
+  id: number
+  title: string
+  reminder_time: string
+  recurrence?: string | null
+  [key: string]: any
+}
+
+export interface ReminderEventHandlers {
+  // Receives the currently due reminders on connect, then each reminder as it comes due
+  onDue?: (reminders: ReminderEvent[]) => void
+  // Fired when reminders are created, completed or deleted; batch operations send ids
+  onChanged?: (change: { id?: number; ids?: number[]; action: 'created' | 'completed' | 'deleted' }) => void
+}
+
+// Wait before reopening a stream the server refused (e.g. 401 after the token expired)
+const RECONNECT_DELAY_MS = 5000
+
+// Subscribes to /api/reminders/events. EventSource cannot send headers, so the
+// token goes in ?access_token=. EventSource reconnects on its own after drops;
+// when it gives up, the stream is reopened with a fresh token.
+// Returns an unsubscribe function.
+export function subscribeReminderEvents(handlers: ReminderEventHandlers): () => void {
+  if (typeof window === 'undefined' || !('EventSource' in window)) {
+    return () => {}
+  }
+
+  let source: EventSource | null = null
+  let retry: ReturnType<typeof setTimeout> | null = null
+  let closed = false
+
+  const connect = async () => {
+    const token = await getAuthToken()
+    if (closed) return
+    const query = token ? `?access_token=${encodeURIComponent(token)}` : ''
+    source = new EventSource(`${getApiBaseURL()}/api/reminders/events${query}`)
+    source.addEventListener('due', (event) => {
+      handlers.onDue?.(JSON.parse((event as MessageEvent).data))
+    })
+    source.addEventListener('changed', (event) => {
+      handlers.onChanged?.(JSON.parse((event as MessageEvent).data))
+    })
+    source.onerror = (error) => {
+      console.error('Reminder event stream error:', error)
+      if (source?.readyState === EventSource.CLOSED && !closed) {
+        retry = setTimeout(connect, RECONNECT_DELAY_MS)
+      }
+    }
+  }
+  connect()
+
+  return () => {
+    closed = true
+    if (retry) clearTimeout(retry)
+    source?.close()
+  }
+}